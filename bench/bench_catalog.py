@@ -0,0 +1,90 @@
+"""
+Catalog benchmark: bulk scan and query latency on a synthetic archive.
+
+Writes N session manifests (chunks per session as configured, a few
+failed chunks and errors sprinkled in) to a temp folder, indexes them with
+Catalog.scan() and times typical queries.
+
+    python bench/bench_catalog.py [--sessions 5000] [--chunks 24] [--workers N]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stroad.catalog import Catalog  # noqa: E402
+
+STATIONS = [("Jazz24 (128k MP3)", "J24"), ("Radio Paradise", "RP"), ("SomaFM Groove Salad", "SGS"), ("FIP", "FIP"), ("KEXP", "KEXP")]
+
+
+def write_manifest(folder: str, n: int, start: datetime, chunks: int, rnd: random.Random) -> None:
+    preset, code = STATIONS[n % len(STATIONS)]
+    sid = start.strftime("%Y%m%d_%H%M%S") + f"_{n}"
+    items, errors = [], []
+    for i in range(1, chunks + 1):
+        t0 = start + timedelta(minutes=15 * (i - 1))
+        if rnd.random() < 0.01:
+            errors.append({"t": t0.isoformat(), "message": f"Capture failed chunk {i}", "exit_code": 1})
+            continue
+        items.append({"index": i, "start_local": t0.isoformat(timespec="seconds"), "end_local": (t0 + timedelta(minutes=15)).isoformat(timespec="seconds"),
+                      "planned_seconds": 900, "actual_seconds": 900.0, "output_file": f"STROAD_Rec_{sid}_{i:03d}.mp3",
+                      "bytes": rnd.randint(8_000_000, 16_000_000), "ffmpeg_exit_code": 0})
+    data = {"manifest_version": 1, "session": {"id": sid, "start_local": start.isoformat(timespec="seconds"),
+                                               "end_local": (start + timedelta(minutes=15 * chunks)).isoformat(timespec="seconds"),
+                                               "status": "completed" if items else "aborted"},
+            "station": {"url": f"https://stream.example/{code.lower()}", "short_code": code, "preset_name": preset, "format": "MP3 (encoded)"},
+            "settings": {"chunk_seconds": 900, "capture_mode": "Per-chunk (reconnect)", "output_dir": folder},
+            "events": [], "chunks": items, "errors": errors, "journal_seq": 0}
+    with open(os.path.join(folder, f"STROAD_Rec_{sid}.session.json"), "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def timed(label: str, fn, repeat: int = 5) -> None:
+    best, rows = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = fn()
+        dt = (time.perf_counter() - t0) * 1000
+        best = dt if best is None else min(best, dt)
+    print(f"{label:<48} {len(rows):>7} rows {best:>9.2f} ms")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sessions", type=int, default=5000)
+    ap.add_argument("--chunks", type=int, default=24)
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+    rnd = random.Random(1)
+
+    with tempfile.TemporaryDirectory(prefix="stroad_bench_") as tmp:
+        archive = os.path.join(tmp, "archive")
+        os.makedirs(archive)
+        base = datetime(2025, 1, 1).astimezone()
+        for n in range(args.sessions):
+            write_manifest(archive, n, base + timedelta(hours=7 * n), args.chunks, rnd)
+
+        cat = Catalog(os.path.join(tmp, "catalog.sqlite"))
+        st = cat.scan([archive], workers=args.workers)
+        print(f"scan: {st['ingested']} manifests, {st['chunks']} chunks in {st['seconds']:.2f}s")
+        st = cat.scan([archive], workers=args.workers)
+        print(f"rescan (unchanged): {st['skipped']} skipped in {st['seconds']:.2f}s")
+
+        timed("station=Jazz24, March 2025", lambda: cat.query_chunks(station="Jazz24", since="2025-03", until="2025-04", limit=0))
+        timed("station=Jazz24, March 2025, failed", lambda: cat.query_chunks(station="Jazz24", since="2025-03", until="2025-04", status="failed", limit=0))
+        timed("all failed chunks", lambda: cat.query_chunks(status="failed", limit=0))
+        timed("chunks > 15.9 MB", lambda: cat.query_chunks(min_bytes=15_900_000, limit=0))
+        timed("latest 200 chunks", lambda: cat.query_chunks(limit=200))
+        timed("sessions with errors", lambda: cat.query_sessions(with_errors=True, limit=0))
+        cat.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Fade filter benchmark: legacy areverse chain vs. single-pass afade in/out.
+
+Generates synthetic 128k MP3-in-Matroska chunks (like the capture stage
+writes), encodes each with both filters the way worker_process does and
+reports wall time and peak RSS of the ffmpeg child.
+
+    python bench/bench_fade.py [--ffmpeg PATH] [--minutes 15 60 180] [--fade 3]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stroad.encode import encode_cmd, fade_filter, legacy_fade_filter  # noqa: E402
+
+
+def make_chunk(ffmpeg: str, path: str, seconds: int) -> None:
+    cmd = [ffmpeg, "-y", "-v", "error", "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={seconds}",
+           "-ac", "2", "-c:a", "libmp3lame", "-b:a", "128k", "-f", "matroska", path]
+    subprocess.run(cmd, check=True)
+
+
+def run_measured(cmd) -> tuple:
+    t0 = time.perf_counter()
+    p = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(p.pid, 0)
+    p.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - t0
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss_mb = usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    return p.returncode, wall, rss_mb
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--ffmpeg", default=shutil.which("ffmpeg") or "")
+    ap.add_argument("--minutes", type=int, nargs="+", default=[15, 60, 180])
+    ap.add_argument("--fade", type=int, default=3)
+    args = ap.parse_args()
+    if not args.ffmpeg or not os.path.exists(args.ffmpeg):
+        print("ffmpeg not found (use --ffmpeg)", file=sys.stderr)
+        return 2
+
+    print(f"{'chunk':>7} {'filter':>8} {'wall s':>9} {'peak MB':>9} {'rc':>3}")
+    with tempfile.TemporaryDirectory(prefix="stroad_bench_") as tmp:
+        for minutes in args.minutes:
+            seconds = minutes * 60
+            src = os.path.join(tmp, f"chunk_{minutes}m.mka")
+            make_chunk(args.ffmpeg, src, seconds)
+            variants = [("areverse", legacy_fade_filter(args.fade)), ("stream", fade_filter(args.fade, float(seconds)))]
+            for name, af in variants:
+                dst = os.path.join(tmp, f"out_{minutes}m_{name}.mp3")
+                rc, wall, rss = run_measured(encode_cmd(args.ffmpeg, src, dst, af, {"title": "bench"}))
+                print(f"{minutes:>6}m {name:>8} {wall:>9.2f} {rss:>9.1f} {rc:>3}")
+                if os.path.exists(dst):
+                    os.remove(dst)
+            os.remove(src)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Silence analysis benchmark: analyser cost against encode time.
+
+1. Analyser alone: synthetic 8 kHz PCM (tone with silent stretches) fed in
+   64 KiB pieces, the way the ffmpeg pipe delivers it.
+2. With ffmpeg: synthetic 128k MP3-in-Matroska chunks (like the capture
+   stage writes); decode + analysis (analyse_file) vs. the MP3 encode that
+   worker_process runs anyway.
+
+    python bench/bench_silence.py [--ffmpeg PATH] [--minutes 15 60] [--block-sec 8]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stroad.encode import encode_cmd, fade_filter  # noqa: E402
+from stroad.silence import RATE, SilenceAnalyser, analyse_file, available  # noqa: E402
+
+
+def synthetic_pcm(seconds: int) -> bytes:
+    import numpy as np
+    t = np.arange(seconds * RATE, dtype=np.float32) / RATE
+    x = 8000 * np.sin(2 * np.pi * 440 * t)
+    # 20 s of silence every 5 minutes
+    x[(t % 300) > 280] = 0
+    return x.astype("<i2").tobytes()
+
+
+def bench_analyser(minutes: int, block_sec: float) -> None:
+    data = synthetic_pcm(minutes * 60)
+    best = None
+    for _ in range(3):
+        an = SilenceAnalyser(block_sec=block_sec)
+        t0 = time.perf_counter()
+        for k in range(0, len(data), 65536):
+            an.feed(data[k:k + 65536])
+        res = an.finish()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    print(f"{minutes:>6}m analyser only {best * 1000:>10.1f} ms {minutes * 60 / best:>10.0f}x realtime  {len(res['regions'])} regions")
+
+
+def make_chunk(ffmpeg: str, path: str, seconds: int) -> None:
+    # Tone with 20 s of silence every 5 minutes.
+    expr = "if(gt(mod(t\\,300)\\,280)\\,0\\,0.3*sin(2*PI*440*t))"
+    cmd = [ffmpeg, "-y", "-v", "error", "-f", "lavfi", "-i", f"aevalsrc={expr}:s=44100:d={seconds}",
+           "-ac", "2", "-c:a", "libmp3lame", "-b:a", "128k", "-f", "matroska", path]
+    subprocess.run(cmd, check=True)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--ffmpeg", default=shutil.which("ffmpeg") or "")
+    ap.add_argument("--minutes", type=int, nargs="+", default=[15, 60])
+    ap.add_argument("--block-sec", type=float, default=8.0)
+    args = ap.parse_args()
+    if not available():
+        print("NumPy not installed (pip install numpy)", file=sys.stderr)
+        return 2
+
+    for minutes in args.minutes:
+        bench_analyser(minutes, args.block_sec)
+    if not args.ffmpeg or not os.path.exists(args.ffmpeg):
+        print("ffmpeg not found (use --ffmpeg): skipping decode/encode comparison")
+        return 0
+
+    print(f"\n{'chunk':>7} {'analyse s':>10} {'encode s':>9} {'overhead':>9} {'silent s':>9}")
+    with tempfile.TemporaryDirectory(prefix="stroad_bench_") as tmp:
+        for minutes in args.minutes:
+            seconds = minutes * 60
+            src = os.path.join(tmp, f"chunk_{minutes}m.mka")
+            make_chunk(args.ffmpeg, src, seconds)
+            t0 = time.perf_counter()
+            res = analyse_file(args.ffmpeg, src)
+            analyse = time.perf_counter() - t0
+            dst = os.path.join(tmp, f"out_{minutes}m.mp3")
+            t0 = time.perf_counter()
+            subprocess.run(encode_cmd(args.ffmpeg, src, dst, fade_filter(3, float(seconds)), {"title": "bench"}), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            encode = time.perf_counter() - t0
+            print(f"{minutes:>6}m {analyse:>10.2f} {encode:>9.2f} {analyse / encode:>8.1%} {res['silent_seconds'] if res else 0:>9.0f}")
+            os.remove(src)
+            if os.path.exists(dst):
+                os.remove(dst)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,65 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext, messagebox
-import subprocess
-import threading
 import os
+import threading
 import time
-import datetime
-import queue
-import uuid
-import json
-import shutil
-from typing import Tuple, List, Deque
-from collections import deque
-
-from .constants import APP_TITLE, APP_NAME, APP_VERSION
+
+from .constants import APP_TITLE
 from .settings import load_settings, save_settings
 from .themes import apply_theme, THEMES
-from .utils import parse_time_string, safe_int, fmt_mmss, fmt_title_range, log_line
-from .ffprobe import ffprobe_tags, station_name_from_tags, station_short_code
-from .manifest import SessionManifest
+from .utils import safe_int, fmt_mmss, log_line, find_bin
+from .streams import load_streams, save_streams
+from .metaprobe import MetadataProber
+from .capture import CAPTURE_MODES
+from .supervisor import get_supervisor
+from .engine import RecordingEngine, EngineListener
+from .tap import StreamTap, TapServer
+from .recovery import find_unfinished, plan_recovery, recovery_config
+from .peaks import read_peaks
+from .waveview import WaveformView, recent_chunks
+from .health import HealthCache, check_streams, describe
+from .uilog import UiBatcher, open_log
+
+
+class _TkListener(EngineListener):
+    # Marshals engine callbacks (worker threads) onto the Tk main loop.
+    def __init__(self, app: "StroadApp"):
+        self.app = app
+
+    def log(self, line: str) -> None:
+        self.app.ui.log(line)
+
+    # Updates go through the app's UiBatcher: only the latest of each kind is drawn per frame.
+    def status(self, text: str) -> None:
+        self.app.ui.post("status", lambda: self.app.status_text.set(text))
+
+    def chunk_started(self, i: int, num_chunks: int, dur: int) -> None:
+        a = self.app
+        a.ui.post("chunk", lambda: [a.chunk_progress_text.set("Chunk: %d/%d" % (i, num_chunks)), a.time_progress_text.set("Time: 00:00 / %s" % fmt_mmss(dur)), a.pb_chunk.configure(maximum=max(1, dur), value=0), a.pb_total.configure(value=i-1)])
+
+    def chunk_time(self, elapsed: int, dur: int) -> None:
+        a = self.app
+        a.ui.post("chunk_time", lambda: [a.pb_chunk.configure(maximum=max(1, dur), value=elapsed), a.time_progress_text.set(f"Time: {fmt_mmss(elapsed)} / {fmt_mmss(dur)}")])
+
+    def total_progress(self, done: int, num_chunks: int) -> None:
+        a = self.app
+        a.ui.post("total", lambda: a.pb_total.configure(maximum=max(1, num_chunks), value=done))
+
+    def finished(self, status: str) -> None:
+        self.app.ui.post("finished", self.app.reset_buttons)
+
+
+class _LogListener(EngineListener):
+    # Background sessions (crash recovery) only write to the log.
+    def __init__(self, app: "StroadApp"):
+        self.app = app
+
+    def log(self, line: str) -> None:
+        self.app.ui.log(line)
 
 
 class StroadApp:
+    UI_FRAME_MS = 100  # log/progress redraw interval
     def __init__(self, root: tk.Tk):
         self.root = root
         self.root.title(APP_TITLE)
@@ -57,27 +96,29 @@ class StroadApp:
 
         self.output_format = tk.StringVar(value=self.cfg.get("output_format", "MP3 (encoded)"))
         self.output_format_options = ["MP3 (encoded)", "M4A (AAC encoded)"]
+        self.encode_workers = tk.StringVar(value=str(self.cfg.get("encode_workers", "auto")))
+        self.handover_overlap = tk.StringVar(value=str(self.cfg.get("handover_overlap_sec", 0)))
+        self.extra_outputs = tk.StringVar(value=str(self.cfg.get("extra_outputs", "")))
+        self.capture_mode = tk.StringVar(value=self.cfg.get("capture_mode", CAPTURE_MODES[0]))
 
         self.theme_name = tk.StringVar(value=self.cfg.get("theme", "Dark"))
 
         # --- Runtime state ---
-        self.is_running = False
-        self.stop_requested = False
-        self.current_process = None
-        self.manifest = None
-        self.session_id = None
+        self.engine = None
         self.play_process = None
-
-        # Track outcome
-        self._chunks_ok = 0
-        self._chunks_fail = 0
-        self._user_stopped = False
-
-        # Thread-safe UI logging
-        self.log_q = queue.Queue()
-        self.job_q = queue.Queue()
-        self.capture_thread = None
-        self.process_thread = None
+        self.tap = None  # shared StreamTap (playback / time-shift / recording)
+        self.tap_server = None
+        self.timeshift_on = False
+        # Shared across sessions so the metadata cache survives between recordings
+        self.meta = MetadataProber(ttl=safe_int(self.cfg.get("metadata_ttl_sec"), default=300))
+        self.health = HealthCache((self.cfg.get("health_cache_path") or "").strip() or None)
+        self.health_text = tk.StringVar()
+        self.checking = False
+
+        # Thread-safe UI updates (log lines + progress), drawn once per frame
+        self.ui = UiBatcher()
+        self.scrollback = max(100, safe_int(self.cfg.get("log_scrollback_lines"), default=5000))
+        self.log_file = open_log(self.cfg.get("log_dir"), max_mb=safe_int(self.cfg.get("log_max_mb"), default=10), backups=safe_int(self.cfg.get("log_backups"), default=5))
 
         # UI vars
         self.status_text = tk.StringVar(value="Idle.")
@@ -87,29 +128,16 @@ class StroadApp:
         self.palette = apply_theme(self.root, self.theme_name.get())
 
         self.build_ui()
-        self.root.after(80, self._pump_log_queue)
+        self._show_health()
+        self.root.after(self.UI_FRAME_MS, self._flush_ui)
+        self.root.after(500, self._recover_on_start)
 
     # -------------------- Stream Management --------------------
     def load_streams(self):
-        defaults = {
-            "Jazz24 (128k MP3)": "https://knkx-live-a.edge.audiocdn.com/6285_128k",
-            "Jazz24 (256k AAC)": "https://knkx-live-a.edge.audiocdn.com/6285_256k",
-            "BBC Radio 1 (HLS)": "http://as-hls-ww-live.akamaized.net/pool_904/live/ww/bbc_radio_one/bbc_radio_one.isml/bbc_radio_one-audio=96000.norewind.m3u8",
-            "SomaFM Groove Salad": "http://ice1.somafm.com/groovesalad-128-mp3",
-            "Custom URL": ""
-        }
-        if os.path.exists(self.streams_path):
-            try:
-                with open(self.streams_path, 'r') as f:
-                    loaded = json.load(f)
-                    if "Custom URL" not in loaded: loaded["Custom URL"] = ""
-                    return loaded
-            except Exception: pass
-        return defaults
+        return load_streams(self.streams_path)
 
     def save_streams(self):
-        with open(self.streams_path, 'w') as f:
-            json.dump(self.presets, f, indent=4)
+        save_streams(self.presets, self.streams_path)
 
     def open_stream_editor(self):
         win = tk.Toplevel(self.root)
@@ -173,8 +201,8 @@ class StroadApp:
         self.preset_combo['values'] = list(self.presets.keys())
 
     # -------------------- Theme & settings --------------------
-    def persist_defaults_from_ui(self):
-        values = {
+    def _values_from_ui(self) -> dict:
+        return {
             "theme": self.theme_name.get(),
             "ffmpeg_path": self.ffmpeg_path.get().strip(),
             "ffprobe_path": self.ffprobe_path.get().strip(),
@@ -187,7 +215,15 @@ class StroadApp:
             "filename_prefix": self.filename_prefix.get(),
             "output_path": self.output_path.get(),
             "output_format": self.output_format.get(),
+            "capture_mode": self.capture_mode.get(),
+            "encode_workers": self.encode_workers.get().strip() or "auto",
+            "handover_overlap_sec": safe_int(self.handover_overlap.get(), default=0),
+            "extra_outputs": self.extra_outputs.get().strip(),
         }
+
+    def persist_defaults_from_ui(self):
+        values = dict(self.cfg)
+        values.update(self._values_from_ui())
         save_settings(values)
         self.cfg = load_settings()
 
@@ -224,6 +260,18 @@ class StroadApp:
         ttk.Entry(frm, textvariable=self.output_path).grid(row=6, column=1, sticky="ew", pady=4)
         ttk.Button(frm, text="...", width=3, command=lambda: self._pick_dir(self.output_path)).grid(row=6, column=2, padx=6)
 
+        ttk.Label(frm, text="Encoder threads:").grid(row=7, column=0, sticky="w", pady=4)
+        ttk.Entry(frm, textvariable=self.encode_workers, width=8).grid(row=7, column=1, sticky="w", pady=4)
+        ttk.Label(frm, text="number or 'auto'").grid(row=7, column=2, sticky="w", padx=6)
+
+        ttk.Label(frm, text="Handover overlap (s):").grid(row=8, column=0, sticky="w", pady=4)
+        ttk.Entry(frm, textvariable=self.handover_overlap, width=8).grid(row=8, column=1, sticky="w", pady=4)
+        ttk.Label(frm, text="per-chunk mode, 0 = off").grid(row=8, column=2, sticky="w", padx=6)
+
+        ttk.Label(frm, text="Extra outputs:").grid(row=9, column=0, sticky="w", pady=4)
+        ttk.Entry(frm, textvariable=self.extra_outputs, width=18).grid(row=9, column=1, sticky="w", pady=4)
+        ttk.Label(frm, text="e.g. FLAC or M4A, FLAC").grid(row=9, column=2, sticky="w", padx=6)
+
         btns = ttk.Frame(frm)
         btns.grid(row=10, column=0, columnspan=3, sticky="e", pady=16)
         ttk.Button(btns, text="Save Defaults", command=lambda: [self.persist_defaults_from_ui(), messagebox.showinfo("Saved", "Settings saved.")]).pack(side="right", padx=6)
@@ -239,24 +287,36 @@ class StroadApp:
         if picked: var.set(picked)
 
     def find_bin(self, name: str) -> str:
-        return shutil.which(name) or ""
+        return find_bin(name)
 
     def log(self, msg: str):
-        self.log_q.put(log_line(msg))
-
-    def _pump_log_queue(self):
-        try:
-            while True:
-                line = self.log_q.get_nowait()
-                self.log_area.insert("end", f"> {line}\n")
-                self.log_area.see("end")
-        except queue.Empty: pass
-        self.root.after(80, self._pump_log_queue)
+        self.ui.log(log_line(msg))
+
+    def _flush_ui(self):
+        # One pass per frame: every pending line in a single insert (the widget
+        # keeps the last `scrollback` lines, the log file all of them), then
+        # the latest of each progress update.
+        lines, updates = self.ui.drain()
+        if lines:
+            if self.log_file:
+                day = time.strftime("%Y-%m-%d ")
+                try: self.log_file.write([day + l for l in lines])
+                except OSError: self.log_file = None
+            at_end = self.log_area.yview()[1] >= 0.999  # don't yank the view while someone reads back
+            self.log_area.insert("end", "".join(f"> {l}\n" for l in lines[-self.scrollback:]))
+            excess = int(self.log_area.index("end-1c").split(".")[0]) - 1 - self.scrollback
+            if excess > 0: self.log_area.delete("1.0", f"{excess + 1}.0")
+            if at_end: self.log_area.see("end")
+        for fn in updates:
+            try: fn()
+            except tk.TclError: pass
+        self.root.after(self.UI_FRAME_MS, self._flush_ui)
 
     # -------------------- UI --------------------
     def on_preset_change(self, event=None):
         choice = self.selected_preset.get()
         if choice != "Custom URL": self.url.set(self.presets.get(choice, ""))
+        self._show_health()
 
     def build_ui(self):
         # 1. Configuration
@@ -268,6 +328,9 @@ class StroadApp:
         self.preset_combo = ttk.Combobox(stream_row, textvariable=self.selected_preset, values=list(self.presets.keys()), state="readonly")
         self.preset_combo.pack(side="left", fill="x", expand=True)
         self.preset_combo.bind("<<ComboboxSelected>>", self.on_preset_change)
+        self.preset_combo.configure(postcommand=lambda: self.root.after_idle(self._mark_presets))
+        self.btn_check = ttk.Button(stream_row, text="Check", command=self.check_streams, width=7)
+        self.btn_check.pack(side="left", padx=(5,0))
         ttk.Button(stream_row, text="Manage", command=self.open_stream_editor, width=8).pack(side="left", padx=(5,0))
         ttk.Label(f_conf, text="Stream:").grid(row=0, column=0, sticky="w", padx=5)
 
@@ -277,7 +340,13 @@ class StroadApp:
         
         ttk.Label(f_conf, text="Output:").grid(row=3, column=0, sticky="w", padx=5)
         ttk.Combobox(f_conf, textvariable=self.output_format, values=self.output_format_options, state="readonly").grid(row=3, column=1, sticky="ew", padx=5, pady=5)
-        ttk.Button(f_conf, text="Preferences…", command=self.open_preferences).grid(row=4, column=1, sticky="e", padx=5, pady=(8, 5))
+        ttk.Label(f_conf, text="Capture:").grid(row=4, column=0, sticky="w", padx=5)
+        ttk.Combobox(f_conf, textvariable=self.capture_mode, values=CAPTURE_MODES, state="readonly").grid(row=4, column=1, sticky="ew", padx=5, pady=5)
+        conf_btns = ttk.Frame(f_conf)
+        conf_btns.grid(row=5, column=1, sticky="ew", padx=5, pady=(8, 5))
+        ttk.Label(conf_btns, textvariable=self.health_text).pack(side="left")
+        ttk.Button(conf_btns, text="Preferences…", command=self.open_preferences).pack(side="right")
+        ttk.Button(conf_btns, text="Waveforms…", command=self.open_waveform_viewer).pack(side="right", padx=(0, 5))
         f_conf.columnconfigure(1, weight=1)
 
         # 2. Timing
@@ -298,6 +367,8 @@ class StroadApp:
         f_act.pack(fill="x", padx=10, pady=8)
         self.btn_play = ttk.Button(f_act, text="▶ PLAY STREAM", command=self.toggle_play)
         self.btn_play.pack(side="left", fill="x", expand=True, padx=5)
+        self.btn_tap = ttk.Button(f_act, text="⏪ TIME-SHIFT", command=self.toggle_timeshift)
+        self.btn_tap.pack(side="left", fill="x", expand=True, padx=5)
         self.btn_start = ttk.Button(f_act, text="🔴 RECORD", command=self.start_process)
         self.btn_start.pack(side="left", fill="x", expand=True, padx=5)
         self.btn_stop = ttk.Button(f_act, text="⏹ STOP & FADE", command=self.stop_process, state="disabled")
@@ -332,6 +403,41 @@ class StroadApp:
             cmd = lambda: var.set(filedialog.askdirectory() if browse_dir else filedialog.askopenfilename() or var.get())
             ttk.Button(parent, text="...", width=3, command=cmd).grid(row=row, column=2, padx=5)
 
+    # -------------------- STREAM TAP --------------------
+    # Playback, time-shift and recording all read one StreamTap per URL, so
+    # listening while recording never opens a second upstream connection.
+    # RECORD keeps its capture mode and reads the tap's local re-stream; only
+    # time-shift (history) and track split (titles) cut chunks from the ring.
+    def _tap_for(self, url: str):
+        """The shared connection for `url`, started on demand (None if unavailable)."""
+        if self.tap and self.tap.url != url:
+            if self._tap_in_use(): return None
+            self._close_tap()
+        if not self.tap:
+            ffmpeg = self.ffmpeg_path.get().strip() or find_bin("ffmpeg")
+            if not ffmpeg or not os.path.exists(ffmpeg): return None
+            max_mb = safe_int(self.cfg.get("timeshift_max_mb"), default=64)
+            self.tap = StreamTap(ffmpeg, url, seconds=0, max_bytes=max_mb << 20, log=self.log, stall_sec=safe_int(self.cfg.get("stall_timeout_sec"), default=20),
+                                 icy=self.cfg.get("track_metadata") != "off")
+            self.tap.start()
+            self.tap_server = TapServer(self.tap)
+            self.tap_server.start()
+            self.log(f"TAP: sharing one connection to {url} (local re-stream {self.tap_server.url})")
+        return self.tap
+
+    def _tap_in_use(self) -> bool:
+        recording = self.is_running and (self.engine.tap is self.tap or (self.tap_server is not None and self.engine.source_url == self.tap_server.record_url))
+        return self.timeshift_on or self.play_process is not None or recording
+
+    def _release_tap(self):
+        if self.tap and not self._tap_in_use(): self._close_tap()
+
+    def _close_tap(self):
+        self.tap_server.stop()
+        self.tap.stop()
+        self.tap, self.tap_server = None, None
+        self.log("TAP: connection closed.")
+
     # -------------------- PLAYBACK --------------------
     def toggle_play(self):
         if self.play_process: self.stop_playback()
@@ -342,12 +448,28 @@ class StroadApp:
         ffplay = self.ffplay_path.get().strip()
         if not url: return messagebox.showerror("Error", "No URL to play!")
         if not ffplay or not os.path.exists(ffplay): return messagebox.showerror("Error", "FFplay not found. Check Preferences.")
-        self.log(f"PLAYBACK: Starting stream {url}")
-        cmd = [ffplay, "-nodisp", "-autoexit", url]
-        try:
-            self.play_process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            self.btn_play.config(text="⏹ STOP STREAM")
-        except Exception as e: self.log(f"PLAYBACK ERROR: {e}")
+        tap = self._tap_for(url)
+        if tap:
+            self.log(f"PLAYBACK: Starting stream {url} (shared connection)")
+            source = self.tap_server.url
+        else:
+            self.log(f"PLAYBACK: Starting stream {url}")
+            source = url
+        cmd = [ffplay, "-nodisp", "-autoexit", source]
+        child = get_supervisor().spawn(cmd)
+        self.play_process = child
+        self.btn_play.config(text="⏹ STOP STREAM")
+        # ffplay may exit on its own (-autoexit, network error); reset the button then.
+        child.future.add_done_callback(lambda f: self.root.after(0, lambda: self._on_playback_exit(child, f.result())))
+
+    def _on_playback_exit(self, child, res):
+        if self.play_process is not child: return
+        self.play_process = None
+        self.btn_play.config(text="▶ PLAY STREAM")
+        if res.returncode not in (0, -15) and not res.cancelled:
+            self.log(f"PLAYBACK ERROR: ffplay exited with {res.returncode}")
+            for l in res.stderr_lines[-5:]: self.log("  " + l)
+        self._release_tap()
 
     def stop_playback(self):
         if self.play_process:
@@ -355,63 +477,219 @@ class StroadApp:
             self.play_process.terminate()
             self.play_process = None
         self.btn_play.config(text="▶ PLAY STREAM")
+        self._release_tap()
+
+    # -------------------- TIME-SHIFT --------------------
+    def toggle_timeshift(self):
+        if self.timeshift_on: self.stop_timeshift()
+        else: self.start_timeshift()
+
+    def start_timeshift(self):
+        url = self.url.get().strip()
+        if not url: return messagebox.showerror("Error", "No URL to buffer!")
+        tap = self._tap_for(url)
+        if not tap: return messagebox.showerror("Error", "FFmpeg not found, or another stream is being recorded.")
+        minutes = safe_int(self.cfg.get("timeshift_minutes"), default=10)
+        tap.seconds = minutes * 60
+        self.timeshift_on = True
+        self.log(f"TIME-SHIFT: buffering up to {minutes} min ({tap.ring.capacity >> 20} MB) of {url}")
+        self._update_timeshift_button()
+
+    def stop_timeshift(self):
+        self.timeshift_on = False
+        if self.tap: self.tap.seconds = 0
+        self.log("TIME-SHIFT: stopped.")
+        self.btn_tap.config(text="⏪ TIME-SHIFT")
+        self._release_tap()
+
+    def _update_timeshift_button(self):
+        if not self.timeshift_on or not self.tap: return
+        self.btn_tap.config(text=f"⏹ BUFFER {fmt_mmss(self.tap.buffered_seconds())}")
+        self.root.after(1000, self._update_timeshift_button)
+
+    # -------------------- STREAM HEALTH --------------------
+    # Every preset probed at once (bounded, see health.py); results are cached
+    # so the dropdown can mark dead/stale streams as soon as it opens.
+    _HEALTH_COLORS = {"dead": "#d9534f", "stale": "#999999", "unknown": None}
+
+    def _show_health(self):
+        url = self.url.get().strip()
+        st = self.health.state(url, float(self.cfg.get("health_stale_hours", 24)))
+        r = self.health.get(url)
+        when = f" ({r['checked'][5:16].replace('T', ' ')})" if r else ""
+        self.health_text.set("" if not url else f"{'✓' if st == 'ok' else '✗' if st == 'dead' else '?'} {describe(r)}{when}")
+
+    def _mark_presets(self):
+        # Runs after the dropdown is posted (ttk refills its listbox on post).
+        try:
+            lb = str(self.preset_combo.tk.call("ttk::combobox::PopdownWindow", self.preset_combo)) + ".f.l"
+            stale = float(self.cfg.get("health_stale_hours", 24))
+            for k, name in enumerate(self.preset_combo["values"]):
+                color = self._HEALTH_COLORS.get(self.health.state(self.presets.get(name, ""), stale))
+                self.root.tk.call(lb, "itemconfigure", k, "-foreground", color or "")  # "" = listbox default
+        except tk.TclError:
+            pass
+
+    def check_streams(self):
+        if self.checking: return
+        self.checking = True
+        self.btn_check.config(state="disabled")
+        self.health_text.set("Checking streams…")
+        presets = dict(self.presets)
+        ffprobe = self.ffprobe_path.get().strip()
+        timeout = float(self.cfg.get("health_timeout_sec") or 8)
+
+        def report(r):
+            self.log(f"CHECK: {r['name']}: {'ok' if r['ok'] else 'DEAD'} - {describe(r)}")
+
+        def run():
+            try: results = check_streams(presets, ffprobe, timeout=timeout, on_result=report)
+            except Exception as e:
+                self.log(f"CHECK: failed: {e}")
+                results = []
+            self.health.update(results)
+            self.root.after(0, lambda: done(results))
+
+        def done(results):
+            self.checking = False
+            self.btn_check.config(state="normal")
+            self.log(f"CHECK: {sum(r['ok'] for r in results)}/{len(results)} streams reachable.")
+            self._show_health()
+        threading.Thread(target=run, daemon=True).start()
+
+    # -------------------- WAVEFORMS --------------------
+    # Recorded chunks drawn from their .peaks files (written while processing);
+    # clicking the waveform plays the chunk from there.
+    def open_waveform_viewer(self):
+        win = tk.Toplevel(self.root)
+        win.title("Waveforms")
+        win.geometry("900x420")
+        folder = self.output_path.get().strip()
+
+        left = ttk.Frame(win)
+        left.pack(side="left", fill="y", padx=(10, 5), pady=10)
+        lb = tk.Listbox(left, width=34, bg=self.palette["field"], fg=self.palette["text"], exportselection=False)
+        lb.pack(side="left", fill="y")
+        scroll = ttk.Scrollbar(left, command=lb.yview)
+        scroll.pack(side="right", fill="y")
+        lb.config(yscrollcommand=scroll.set)
+
+        right = ttk.Frame(win)
+        right.pack(side="left", fill="both", expand=True, padx=(5, 10), pady=10)
+        info = tk.StringVar(value="Loading…")
+        state = {"chunks": [], "child": None, "chunk": None}
+
+        def play_from(t):
+            c = state["chunk"]
+            ffplay = self.ffplay_path.get().strip()
+            info.set(f"{os.path.basename(c['audio'])}  @ {fmt_mmss(t)}")
+            if not ffplay or not os.path.exists(ffplay) or not os.path.exists(c["audio"]): return
+            if state["child"]: state["child"].terminate()
+            state["child"] = get_supervisor().spawn([ffplay, "-nodisp", "-autoexit", "-loglevel", "error", "-ss", "%.2f" % t, c["audio"]])
+
+        view = WaveformView(right, self.palette, on_seek=play_from, height=300)
+        view.pack(fill="both", expand=True)
+        ttk.Label(right, textvariable=info).pack(anchor="w", pady=(6, 0))
+
+        def show(event=None):
+            sel = lb.curselection()
+            if not sel: return
+            c = state["chunk"] = state["chunks"][sel[0]]
+            peaks = read_peaks(c["peaks"])
+            sil = c.get("silence") or {}
+            view.load(peaks, cues=c.get("cues"), silence=[] if sil.get("trimmed_seconds") else sil.get("regions"))
+            info.set(f"{os.path.basename(c['audio'])}  {fmt_mmss(peaks.duration)}" if peaks else f"{c['peaks_file']}: missing or unreadable")
+
+        def fill(chunks):
+            if not win.winfo_exists(): return
+            state["chunks"] = chunks
+            for c in chunks: lb.insert("end", f"{c['start_local'][5:16].replace('T', ' ')}  #{c['index']}  {c['station']}")
+            info.set(f"{len(chunks)} chunk(s) with waveforms in {folder}" if chunks else f"No chunks with waveforms in {folder}")
+
+        def close():
+            if state["child"]: state["child"].terminate()
+            win.destroy()
+
+        lb.bind("<<ListboxSelect>>", show)
+        win.protocol("WM_DELETE_WINDOW", close)
+        def load():
+            chunks = recent_chunks(folder)
+            self.root.after(0, lambda: fill(chunks))
+        # Reading manifests can take a moment on a big folder: off the Tk thread.
+        threading.Thread(target=load, daemon=True).start()
+
+    # -------------------- RECOVERY --------------------
+    # Sessions left at "recording" by a crash are finished through the normal
+    # engine path (see recovery.py); the scan runs off the Tk thread.
+    def _recover_on_start(self):
+        mode = (self.cfg.get("recover_on_start") or "encode").strip().lower()
+        if mode == "off": return
+        folder = self.output_path.get().strip()
+        max_age = safe_int(self.cfg.get("recovery_max_age_hours"), default=48)
+        threading.Thread(target=self._find_unfinished, args=(folder, max_age, mode == "resume"), daemon=True).start()
+
+    def _find_unfinished(self, folder: str, max_age: int, resume: bool):
+        plans = []
+        for path in find_unfinished(folder, max_age):
+            try: plans.append(plan_recovery(path))
+            except (OSError, ValueError, KeyError) as e: self.log(f"RECOVERY: skipping {path.name}: {e}")
+        if plans: self.root.after(0, lambda: self._start_recovery(plans, resume))
+
+    def _start_recovery(self, plans: list, resume: bool):
+        cfg = dict(self.cfg)
+        cfg.update(self._values_from_ui())
+        for n, plan in enumerate(plans):
+            # Only the latest session resumes, as the current recording (STOP works
+            # on it); the others just get their leftovers saved in the background.
+            adopt = resume and not self.is_running and n == len(plans) - 1 and plan["remaining_seconds"] >= 5
+            listener = _TkListener(self) if adopt else _LogListener(self)
+            engine = RecordingEngine(recovery_config(cfg, plan), plan["url"], listener=listener, meta=self.meta)
+            try: engine.recover(plan, resume=adopt)
+            except ValueError as e:
+                self.log(f"RECOVERY {plan['session_id']}: {e}")
+                continue
+            if adopt:
+                self.engine = engine
+                self.btn_start.config(state="disabled")
+                self.btn_stop.config(state="normal")
 
     # -------------------- Control --------------------
-    def start_process(self):
-        ffmpeg = self.ffmpeg_path.get().strip()
-        if not ffmpeg or not os.path.exists(ffmpeg): return messagebox.showerror("Error", "FFmpeg not found!")
-        out_dir = self.output_path.get().strip()
-        if not out_dir or not os.path.isdir(out_dir): return messagebox.showerror("Error", "Output folder does not exist.")
-        
-        # Debug parsing
-        raw_total = self.total_time_str.get()
-        raw_chunk = self.chunk_time_str.get()
-        total_sec = parse_time_string(raw_total)
-        chunk_sec = parse_time_string(raw_chunk)
-        
-        self.log(f"DEBUG: Parsed Total='{raw_total}'->{total_sec}s, Chunk='{raw_chunk}'->{chunk_sec}s")
+    @property
+    def is_running(self) -> bool:
+        return bool(self.engine and self.engine.is_running)
 
-        if total_sec <= 0 or chunk_sec <= 0: return messagebox.showerror("Error", "Total time and chunk length must be > 0.")
-        
-        self.persist_defaults_from_ui() 
-        stream_url = self.url.get().strip()
-        self._chunks_ok = 0
-        self._chunks_fail = 0
-        self._user_stopped = False
-        now = datetime.datetime.now()
-        self.session_id = now.strftime("%Y%m%d_%H%M%S")
-        preset_name = self.selected_preset.get()
-        short_code = station_short_code(station_name=preset_name, preset_name=preset_name)
-
-        self.manifest = SessionManifest(
-            out_dir=out_dir, session_id=self.session_id, app_name=APP_NAME, app_version=APP_VERSION,
-            station_url=stream_url, preset_name=preset_name, short_code=short_code,
-            chunk_seconds=chunk_sec, tape_mode=False, output_format=self.output_format.get(),
-        )
-        self.log(f"Session manifest: STROAD_Rec_{self.session_id}.session.json")
-        self.stop_requested = False
-        self.is_running = True
+    def start_process(self):
+        if self.is_running: return
+        cfg = dict(self.cfg)
+        cfg.update(self._values_from_ui())
+        url = self.url.get().strip()
+        # Record through the shared connection so PLAY can join later. With
+        # time-shift or track split the chunks are cut from the tap's ring,
+        # otherwise the capture mode reads its local re-stream.
+        tap = self._tap_for(url) if url else None
+        source = ""
+        if tap is not None and not self.timeshift_on and (cfg.get("track_metadata") or "off").strip().lower() != "split":
+            tap, source = None, self.tap_server.record_url
+        engine = RecordingEngine(cfg, url, listener=_TkListener(self), meta=self.meta, tap=tap, source_url=source)
+        try: engine.validate()
+        except ValueError as e:
+            self._release_tap()
+            return messagebox.showerror("Error", str(e))
+
+        self.persist_defaults_from_ui()
+        self.engine = engine
         self.btn_start.config(state="disabled")
         self.btn_stop.config(state="normal")
         self.pb_chunk["value"] = 0
         self.pb_total["value"] = 0
-        self.status_text.set("Starting pipeline…")
-        self.process_thread = threading.Thread(target=self.worker_process, daemon=True)
-        self.capture_thread = threading.Thread(target=self.worker_capture, daemon=True)
-        self.process_thread.start()
-        self.capture_thread.start()
+        self.engine.start()
 
     def stop_process(self):
         if not self.is_running: return
-        self._user_stopped = True
-        self.log("STOP requested...")
-        if self.manifest: self.manifest.event("stop_requested")
-        self.stop_requested = True
-        if self.current_process:
-            try: self.current_process.terminate()
-            except Exception: pass
+        self.engine.stop()
 
     def reset_buttons(self):
+        self._release_tap()
         self.btn_start.config(state="normal")
         self.btn_stop.config(state="disabled")
         self.status_text.set("Idle.")
@@ -419,160 +697,3 @@ class StroadApp:
         self.time_progress_text.set("Time: 00:00 / 00:00")
         self.pb_chunk["value"] = 0
         self.pb_total["value"] = 0
-
-    # -------------------- Capture Workers --------------------
-    def _stderr_tail(self, lines: List[str], max_lines: int = 12) -> List[str]:
-        if not lines: return []
-        return lines[-max_lines:]
-
-    def _looks_like_transient_http(self, stderr_text: str) -> bool:
-        t = (stderr_text or "").lower()
-        return any(n in t for n in ["http error 503", "server returned 5xx", "error opening input", "service unavailable", "connection refused", "connection reset", "timed out", "temporary failure"])
-
-    def _run_capture_ffmpeg_with_progress(self, ffmpeg: str, stream_url: str, dur: int, temp_file: str) -> Tuple[int, str]:
-        cmd = [ffmpeg, "-y", "-re", "-i", stream_url, "-t", str(dur), "-map_metadata", "0", "-vn", "-c", "copy", "-f", "matroska", "-nostats", temp_file]
-        p = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, bufsize=1)
-        self.current_process = p
-        stderr_lines = deque(maxlen=400)
-        stop_reader = threading.Event()
-        def _reader():
-            try:
-                if p.stderr:
-                    for line in p.stderr:
-                        if stop_reader.is_set(): break
-                        stderr_lines.append(line.rstrip("\n"))
-            except Exception: pass
-        t_reader = threading.Thread(target=_reader, daemon=True)
-        t_reader.start()
-        start_wall = time.time()
-        last_ui_sec = -1
-        try:
-            while True:
-                if self.stop_requested:
-                    try: p.terminate()
-                    except Exception: pass
-                    break
-                rc = p.poll()
-                elapsed = int(time.time() - start_wall)
-                if elapsed != last_ui_sec:
-                    last_ui_sec = elapsed
-                    self.root.after(0, lambda e=elapsed: [self.pb_chunk.configure(value=min(dur, max(0, e))), self.time_progress_text.set(f"Time: {fmt_mmss(min(dur, max(0, e)))} / {fmt_mmss(dur)}")])
-                if rc is not None or elapsed >= dur: break
-                time.sleep(0.2)
-            try: p.wait(timeout=2.0)
-            except Exception: 
-                try: p.terminate(); p.wait(timeout=2.0)
-                except Exception: pass
-        finally:
-            stop_reader.set()
-            try: p.stderr.close()
-            except Exception: pass
-            t_reader.join(timeout=0.5)
-            self.current_process = None
-        return (p.returncode if p.returncode is not None else -1, "\n".join(list(stderr_lines)))
-
-    def worker_capture(self):
-        try:
-            total_sec = parse_time_string(self.total_time_str.get())
-            chunk_sec = parse_time_string(self.chunk_time_str.get())
-            ffmpeg = self.ffmpeg_path.get().strip()
-            out_dir = self.output_path.get().strip()
-            prefix = (self.filename_prefix.get().strip() or "STROAD_Rec")
-            stream_url = self.url.get().strip()
-            num_chunks = (total_sec + chunk_sec - 1) // chunk_sec
-            self.root.after(0, lambda: self.pb_total.configure(maximum=max(1, num_chunks)))
-            self.log(f"CAPTURE: {num_chunks} chunks planned.")
-            self.root.after(0, lambda: self.status_text.set("Capturing…"))
-            if self.manifest: self.manifest.event("capture_start", planned_chunks=num_chunks)
-
-            for i in range(1, num_chunks + 1):
-                if self.stop_requested: break
-                dur = chunk_sec
-                if i == num_chunks:
-                    rem = total_sec % chunk_sec
-                    if rem > 0: dur = rem
-                start_dt = datetime.datetime.now()
-                start_iso = start_dt.astimezone().isoformat(timespec="seconds")
-                title_range = fmt_title_range(start_dt, dur)
-                tags = ffprobe_tags(self.ffprobe_path.get().strip(), stream_url)
-                station = station_name_from_tags(tags, self.selected_preset.get())
-                temp_file = os.path.join(out_dir, "stroad_raw_%s_%s.mka" % (os.getpid(), uuid.uuid4().hex[:8]))
-                ts = start_dt.strftime("%Y%m%d_%H%M%S")
-                out_ext = ".mp3" if "MP3" in self.output_format.get() else ".m4a"
-                final_file = os.path.join(out_dir, "%s_%s_%03d%s" % (prefix, ts, i, out_ext))
-                self.root.after(0, lambda: [self.chunk_progress_text.set("Chunk: %d/%d" % (i, num_chunks)), self.time_progress_text.set("Time: 00:00 / %s" % fmt_mmss(dur)), self.pb_chunk.configure(maximum=max(1, dur), value=0), self.pb_total.configure(value=i-1)])
-                self.log("CAPTURE %d/%d: %ds | album='%s' | title='%s'" % (i, num_chunks, dur, station, title_range))
-                
-                # Retry loop
-                max_retries = 3
-                ok_temp = False
-                rc = -1
-                err = ""
-                for attempt in range(max_retries + 1):
-                    if self.stop_requested: break
-                    if attempt > 0:
-                        wait = [1, 2, 4][min(attempt-1, 2)]
-                        self.log(f"CAPTURE retry {attempt}/{max_retries} after {wait}s...")
-                        if self.manifest: self.manifest.event("retry_connect", chunk=i, attempt=attempt)
-                        time.sleep(wait)
-                    if os.path.exists(temp_file): os.remove(temp_file)
-                    rc, err = self._run_capture_ffmpeg_with_progress(ffmpeg, stream_url, dur, temp_file)
-                    if os.path.exists(temp_file) and os.path.getsize(temp_file) >= 20000:
-                        ok_temp = True; break
-                    if not self._looks_like_transient_http(err): break
-                
-                if self.stop_requested: 
-                    if os.path.exists(temp_file): os.remove(temp_file)
-                    break
-                if not ok_temp:
-                    self.log("CAPTURE FAILED. Stderr tail:"); 
-                    for l in self._stderr_tail(err.splitlines()): self.log("  "+l)
-                    self._chunks_fail += 1
-                    if self.manifest: self.manifest.error(f"Capture failed chunk {i}", exit_code=rc)
-                    if os.path.exists(temp_file): os.remove(temp_file)
-                    continue
-
-                end_dt = datetime.datetime.now()
-                job = {"i": i, "num_chunks": num_chunks, "dur": dur, "actual_seconds": float(dur), "start_iso": start_iso, "end_iso": end_dt.astimezone().isoformat(timespec="seconds"), "temp_file": temp_file, "final_file": final_file, "album": station, "artist": prefix, "title": title_range, "year": start_dt.year}
-                self.job_q.put(job)
-                self.log(f"ENQUEUED: {os.path.basename(final_file)}")
-
-            self.log("CAPTURE: finished (or stopped).")
-            if self.manifest: self.manifest.event("capture_end")
-        except Exception as e:
-            self.log(f"CAPTURE CRITICAL ERROR: {e}")
-            if self.manifest: self.manifest.error(f"Capture critical: {e}")
-        finally: self.job_q.put(None)
-
-    def worker_process(self):
-        try:
-            ffmpeg = self.ffmpeg_path.get().strip()
-            fade_sec = safe_int(self.fade_duration.get(), default=0)
-            self.log("PROCESSOR: ready.")
-            if self.manifest: self.manifest.event("processor_ready")
-            while True:
-                job = self.job_q.get()
-                if job is None: break
-                i = job["i"]
-                self.root.after(0, lambda: self.status_text.set("Processing…"))
-                self.log(f"PROCESS {i}: tagging -> {os.path.basename(job['final_file'])}")
-                fade_filter = "anull"
-                if fade_sec > 0: fade_filter = f"afade=t=in:ss=0:d={fade_sec},areverse,afade=t=in:ss=0:d={fade_sec},areverse"
-                out_ext = os.path.splitext(job['final_file'])[1].lower()
-                acodec = ["-c:a", "libmp3lame", "-q:a", "4"] if out_ext == ".mp3" else ["-c:a", "aac", "-b:a", "192k"]
-                cmd = [ffmpeg, "-y", "-i", job['temp_file'], "-af", fade_filter, "-metadata", f"album={job['album']}", "-metadata", f"artist={job['artist']}", "-metadata", f"title={job['title']}", "-metadata", f"date={job['year']}"] + acodec + [job['final_file']]
-                res = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                try: os.remove(job['temp_file'])
-                except: pass
-                if res.returncode == 0 and os.path.exists(job['final_file']):
-                    self._chunks_ok += 1
-                    self.log(f"SAVED: {os.path.basename(job['final_file'])}")
-                    if self.manifest: self.manifest.add_chunk(index=i, start_local=job['start_iso'], end_local=job['end_iso'], planned_seconds=job['dur'], actual_seconds=job['actual_seconds'], output_file=os.path.basename(job['final_file']), bytes_written=os.path.getsize(job['final_file']), ffmpeg_exit_code=0)
-                else: self._chunks_fail += 1
-                self.root.after(0, lambda v=i: self.pb_total.configure(value=v))
-            self.log("PROCESSOR: finished.")
-        except Exception as e: self.log(f"PROCESS ERROR: {e}")
-        finally:
-            self.is_running = False; self.current_process = None
-            if self.manifest: self.manifest.finalize("completed" if self._chunks_ok > 0 else "aborted")
-            self.root.after(0, self.reset_buttons)
\ No newline at end of file
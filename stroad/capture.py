@@ -0,0 +1,170 @@
+import os
+import csv
+import time
+from typing import Dict, List, Tuple, Optional
+
+from .encode import codec_args, tag_args
+from .pcm import PCM_FILTER, pcm_output_args
+
+CAPTURE_MODES = ["Per-chunk (reconnect)", "Continuous (gapless)", "Per-chunk (single-pass encode)"]
+
+def is_gapless(mode: str) -> bool:
+    return (mode or "").startswith("Continuous")
+
+def is_single_pass(mode: str) -> bool:
+    return "single-pass" in (mode or "")
+
+def chunk_capture_cmd(ffmpeg: str, stream_url: str, dur: int, temp_file: str) -> List[str]:
+    return [ffmpeg, "-y", "-re", "-i", stream_url, "-t", str(dur), "-map_metadata", "0", "-vn", "-c", "copy", "-f", "matroska", "-nostats", "-progress", "pipe:1", temp_file]
+
+def direct_capture_cmd(ffmpeg: str, stream_url: str, dur: int, dst: str, af: str, tags: Dict[str, object], pcm_file: Optional[str] = None) -> List[str]:
+    # Capture and encode in one process: no intermediate .mka, the fade is
+    # placed from the planned length and tags are written up front. stdout
+    # carries -progress, so the PCM side branch (peaks, silence) goes to a file.
+    ext = os.path.splitext(dst)[1]
+    if not pcm_file:
+        return [ffmpeg, "-y", "-re", "-i", stream_url, "-t", str(dur), "-map", "0:a", "-vn", "-af", af] + tag_args(tags) + codec_args(ext) + ["-nostats", "-progress", "pipe:1", dst]
+    graph = f"[0:a]asplit=2[a][p];[a]{af}[out];[p]{PCM_FILTER}[pcm]"
+    return ([ffmpeg, "-y", "-re", "-i", stream_url, "-filter_complex", graph, "-t", str(dur), "-map", "[out]"] + tag_args(tags) + codec_args(ext)
+            + ["-nostats", "-progress", "pipe:1", dst, "-t", str(dur)] + pcm_output_args("pcm", pcm_file))
+
+def tap_cmd(ffmpeg: str, stream_url: str) -> List[str]:
+    # Open-ended copy of the stream to stdout as MPEG-TS (fixed 188-byte
+    # packets), flushed per packet so arrival time tracks media time. A pipe
+    # (ICY ingest) already arrives in real time, so it is read as it comes.
+    realtime = [] if stream_url.startswith("pipe:") else ["-re"]
+    return [ffmpeg, *realtime, "-i", stream_url, "-map", "0:a", "-vn", "-c", "copy", "-f", "mpegts", "-flush_packets", "1", "pipe:1"]
+
+def segment_capture_cmd(ffmpeg: str, stream_url: str, total: float, chunk_sec: int, pattern: str, list_file: str, start_number: int = 1) -> List[str]:
+    # One connection for the whole session; the segment muxer cuts on packet
+    # boundaries so consecutive chunks share no gap and no overlap.
+    return [
+        ffmpeg, "-y", "-re", "-i", stream_url,
+        "-t", "%.3f" % total,
+        "-map", "0:a", "-map_metadata", "0", "-vn", "-c", "copy",
+        "-f", "segment",
+        "-segment_time", str(chunk_sec),
+        "-segment_format", "matroska",
+        "-segment_start_number", str(start_number),
+        "-segment_list", list_file,
+        "-segment_list_type", "csv",
+        "-segment_list_size", "0",
+        "-reset_timestamps", "1",
+        "-nostats", "-progress", "pipe:1", pattern,
+    ]
+
+def read_segment_list(list_file: str) -> List[Tuple[str, float, float]]:
+    """Completed segments as (path, start_s, end_s); paths resolved next to the list."""
+    if not os.path.exists(list_file):
+        return []
+    base = os.path.dirname(list_file)
+    out = []
+    try:
+        with open(list_file, newline="", encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        return []
+    # ffmpeg may be mid-write; only trust newline-terminated rows
+    lines = text.splitlines(keepends=True)
+    for row in csv.reader(l for l in lines if l.endswith("\n")):
+        if len(row) < 3:
+            continue
+        try:
+            start, end = float(row[1]), float(row[2])
+        except ValueError:
+            continue
+        path = row[0] if os.path.isabs(row[0]) else os.path.join(base, row[0])
+        out.append((path, start, end))
+    return out
+
+def concat_cmd(ffmpeg: str, list_file: str, out_file: str, fmt: str = "matroska") -> List[str]:
+    return [ffmpeg, "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_file, "-map", "0", "-c", "copy", "-f", fmt, out_file]
+
+def write_concat_list(paths: List[str], list_file: str) -> None:
+    with open(list_file, "w", encoding="utf-8") as f:
+        for p in paths:
+            f.write("file '%s'\n" % os.path.abspath(p).replace("'", "'\\''"))
+
+
+class ProgressReader:
+    """
+    Parses ffmpeg `-progress` key=value blocks (fed line by line) and keeps the
+    latest snapshot: out_time (s), total_size (bytes), bitrate_kbps, speed,
+    plus when data last advanced so callers can spot a stalled input. The
+    stall clock starts with the first data: until then the run is still
+    connecting (see connecting_for()).
+    """
+
+    def __init__(self):
+        self._block = {}
+        self.started = time.monotonic()
+        self.first_data: Optional[float] = None
+        self.last_growth: Optional[float] = None
+        self.longest_stall = 0.0
+        self.updates = 0
+        # origin: monotonic time of media t=0, known once the first audio arrives
+        self.snapshot = {"out_time": 0.0, "total_size": 0, "bitrate_kbps": None, "speed": None, "ended": False, "origin": None}
+
+    def feed(self, line: str) -> None:
+        key, sep, val = line.partition("=")
+        if not sep:
+            return
+        key, val = key.strip(), val.strip()
+        if key != "progress":
+            self._block[key] = val
+            return
+        b, self._block = self._block, {}
+        snap = dict(self.snapshot)
+        grew = False
+        us = _num(b.get("out_time_us")) or _num(b.get("out_time_ms"))  # both are microseconds
+        if us is not None and us >= 0:
+            grew = us / 1e6 > snap["out_time"]
+            snap["out_time"] = us / 1e6
+            if snap["origin"] is None and us > 0:
+                snap["origin"] = time.monotonic() - us / 1e6
+        size = _num(b.get("total_size"))
+        if size is not None:
+            grew = grew or size > snap["total_size"]
+            snap["total_size"] = int(size)
+        now = time.monotonic()
+        if grew:
+            if self.last_growth is None:
+                self.first_data = now
+            else:
+                self.longest_stall = max(self.longest_stall, now - self.last_growth)
+            self.last_growth = now
+        br = (b.get("bitrate") or "").replace("kbits/s", "")
+        snap["bitrate_kbps"] = _num(br) if _num(br) is not None else snap["bitrate_kbps"]
+        sp = (b.get("speed") or "").rstrip("x")
+        snap["speed"] = _num(sp) if _num(sp) is not None else snap["speed"]
+        snap["ended"] = val == "end"
+        self.updates += 1
+        self.snapshot = snap
+
+    def stalled_for(self) -> float:
+        return time.monotonic() - self.last_growth if self.last_growth is not None else 0.0
+
+    def connecting_for(self) -> float:
+        """Seconds since spawn without any data yet (0 once audio arrives)."""
+        return time.monotonic() - self.started if self.first_data is None else 0.0
+
+    def stats(self) -> dict:
+        s = self.snapshot
+        wall = max(1e-6, time.monotonic() - self.started)
+        return {
+            "out_seconds": round(s["out_time"], 3),
+            "bytes_in": s["total_size"],
+            "avg_kbps": round(s["total_size"] * 8 / 1000 / max(s["out_time"], 1e-6), 1) if s["out_time"] > 0 else None,
+            "last_kbps": s["bitrate_kbps"],
+            "speed": s["speed"],
+            "wall_seconds": round(wall, 3),
+            "connect_seconds": round(self.first_data - self.started, 3) if self.first_data is not None else None,
+            "longest_stall_seconds": round(max(self.longest_stall, self.stalled_for() if not s["ended"] else 0.0), 1),
+        }
+
+
+def _num(v) -> Optional[float]:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
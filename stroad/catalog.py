@@ -0,0 +1,408 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from .manifest import read_manifest, journal_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    manifest_path TEXT NOT NULL UNIQUE,
+    session_id TEXT NOT NULL,
+    output_dir TEXT,
+    preset TEXT,
+    short_code TEXT,
+    url TEXT,
+    format TEXT,
+    capture_mode TEXT,
+    chunk_seconds INTEGER,
+    status TEXT,
+    start_ts REAL,
+    end_ts REAL,
+    start_local TEXT,
+    end_local TEXT,
+    chunks INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL DEFAULT 0,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_start ON sessions(start_ts);
+CREATE INDEX IF NOT EXISTS sessions_status ON sessions(status);
+
+CREATE TABLE IF NOT EXISTS chunks (
+    session INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    start_ts REAL,
+    end_ts REAL,
+    start_local TEXT,
+    planned_seconds REAL,
+    actual_seconds REAL,
+    output_file TEXT,
+    bytes INTEGER,
+    exit_code INTEGER,
+    encode_seconds REAL,
+    PRIMARY KEY (session, idx)
+);
+CREATE INDEX IF NOT EXISTS chunks_start ON chunks(start_ts);
+CREATE INDEX IF NOT EXISTS chunks_status ON chunks(status, start_ts);
+CREATE INDEX IF NOT EXISTS chunks_bytes ON chunks(bytes);
+
+CREATE TABLE IF NOT EXISTS errors (
+    session INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    t_ts REAL,
+    chunk INTEGER,
+    message TEXT,
+    exit_code INTEGER
+);
+CREATE INDEX IF NOT EXISTS errors_session ON errors(session);
+"""
+
+_SESSION_COLS = ("manifest_path", "session_id", "output_dir", "preset", "short_code", "url", "format", "capture_mode",
+                 "chunk_seconds", "status", "start_ts", "end_ts", "start_local", "end_local",
+                 "chunks", "failed", "errors", "bytes", "seconds", "mtime")
+_CHUNK_COLS = ("idx", "status", "start_ts", "end_ts", "start_local", "planned_seconds", "actual_seconds",
+               "output_file", "bytes", "exit_code", "encode_seconds")
+_ERROR_COLS = ("t_ts", "chunk", "message", "exit_code")
+
+_CHUNK_IN_MESSAGE = re.compile(r"\bchunk (\d+)")
+
+
+def default_catalog_path() -> Path:
+    return Path.home() / ".stroad2_catalog.sqlite"
+
+
+def to_ts(value: Union[None, str, float, datetime]) -> Optional[float]:
+    """Epoch seconds from an ISO date/time ("2026-03", "2026-03-01", "2026-03-01T12:00"), datetime or number."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    s = str(value).strip()
+    if re.fullmatch(r"\d{4}-\d{2}", s):
+        s += "-01"
+    try:
+        return datetime.fromisoformat(s).timestamp()
+    except ValueError:
+        return None
+
+
+def _mtime(path: str) -> float:
+    m = os.path.getmtime(path)
+    jp = journal_path(path)
+    if jp.exists():
+        m = max(m, jp.stat().st_mtime)
+    return m
+
+
+def chunk_row(item: Dict[str, Any]) -> tuple:
+    return (item.get("index"), "ok", to_ts(item.get("start_local")), to_ts(item.get("end_local")), item.get("start_local"),
+            item.get("planned_seconds"), item.get("actual_seconds"), item.get("output_file"), item.get("bytes"),
+            item.get("ffmpeg_exit_code"), item.get("encode_seconds"))
+
+
+def error_row(item: Dict[str, Any]) -> tuple:
+    m = _CHUNK_IN_MESSAGE.search(item.get("message") or "")
+    return (to_ts(item.get("t")), int(m.group(1)) if m else None, item.get("message"), item.get("exit_code"))
+
+
+def manifest_rows(path: str) -> Tuple[str, Optional[dict], List[tuple], List[tuple], Optional[str]]:
+    """Parse one manifest into catalog rows: (path, session, chunks, errors, error). Runs in scan workers."""
+    try:
+        data = read_manifest(path)
+        mtime = _mtime(path)
+    except (OSError, ValueError) as e:
+        return path, None, [], [], str(e)
+    sess, st, cfg = data.get("session") or {}, data.get("station") or {}, data.get("settings") or {}
+    chunks = [chunk_row(c) for c in data.get("chunks") or []]
+    errors = [error_row(e) for e in data.get("errors") or []]
+    ok = {c[0] for c in chunks}
+    failed = sorted({e[1] for e in errors if e[1] is not None and e[1] not in ok})
+    session = {
+        "manifest_path": os.path.abspath(path),
+        "session_id": sess.get("id") or Path(path).name,
+        "output_dir": cfg.get("output_dir") or os.path.dirname(os.path.abspath(path)),
+        "preset": st.get("preset_name"),
+        "short_code": st.get("short_code"),
+        "url": st.get("url"),
+        "format": st.get("format"),
+        "capture_mode": cfg.get("capture_mode"),
+        "chunk_seconds": cfg.get("chunk_seconds"),
+        "status": sess.get("status"),
+        "start_ts": to_ts(sess.get("start_local")),
+        "end_ts": to_ts(sess.get("end_local")),
+        "start_local": sess.get("start_local"),
+        "end_local": sess.get("end_local"),
+        "chunks": len(chunks),
+        "failed": len(failed),
+        "errors": len(errors),
+        "bytes": sum(c[8] or 0 for c in chunks),
+        "seconds": sum(c[6] or 0 for c in chunks),
+        "mtime": mtime,
+    }
+    # Failed chunks get their planned start so time-range queries find them.
+    t0, step = session["start_ts"], session["chunk_seconds"] or 0
+    chunks += [(i, "failed", t0 + (i - 1) * step if t0 else None, None, None, None, None, None, 0, None, None) for i in failed]
+    return path, session, chunks, errors, None
+
+
+def find_manifests(roots: Iterable[str]) -> List[str]:
+    out = []
+    stack = [str(r) for r in roots]
+    while stack:
+        d = stack.pop()
+        try:
+            with os.scandir(d) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(e.path)
+                    elif e.name.endswith(".session.json"):
+                        out.append(os.path.abspath(e.path))
+        except OSError:
+            continue
+    return out
+
+
+class Catalog:
+    """
+    SQLite index of sessions, chunks and errors across output folders.
+    SessionManifest feeds it as a session runs; scan() ingests existing
+    manifests. One connection, serialised by a lock (WAL, so readers in
+    other processes are not blocked).
+    """
+
+    def __init__(self, path: Union[None, str, Path] = None):
+        self.path = str(path or default_catalog_path())
+        self._lock = threading.RLock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self.db.close()
+
+    # -------------------- ingest --------------------
+    def _put_session(self, session: dict) -> int:
+        cols = ", ".join(_SESSION_COLS)
+        marks = ", ".join("?" for _ in _SESSION_COLS)
+        updates = ", ".join(f"{c}=excluded.{c}" for c in _SESSION_COLS[1:])
+        self.db.execute(f"INSERT INTO sessions ({cols}) VALUES ({marks}) ON CONFLICT(manifest_path) DO UPDATE SET {updates}",
+                        [session.get(c) for c in _SESSION_COLS])
+        return self.db.execute("SELECT id FROM sessions WHERE manifest_path=?", (session["manifest_path"],)).fetchone()[0]
+
+    def _put_rows(self, sid: int, chunks: List[tuple], errors: List[tuple]) -> None:
+        self.db.execute("DELETE FROM chunks WHERE session=?", (sid,))
+        self.db.execute("DELETE FROM errors WHERE session=?", (sid,))
+        self.db.executemany(f"INSERT OR REPLACE INTO chunks (session, {', '.join(_CHUNK_COLS)}) VALUES (?{', ?' * len(_CHUNK_COLS)})",
+                            [(sid,) + c for c in chunks])
+        self.db.executemany(f"INSERT INTO errors (session, {', '.join(_ERROR_COLS)}) VALUES (?{', ?' * len(_ERROR_COLS)})",
+                            [(sid,) + e for e in errors])
+
+    def ingest(self, path: str) -> bool:
+        """(Re)index one manifest file."""
+        _, session, chunks, errors, err = manifest_rows(path)
+        if session is None:
+            return False
+        with self._lock, self.db:
+            self._put_rows(self._put_session(session), chunks, errors)
+        return True
+
+    def scan(self, roots: Iterable[str], workers: Optional[int] = None, force: bool = False) -> dict:
+        """
+        Index every *.session.json under `roots`. Unchanged manifests (same
+        mtime) are skipped unless `force`; parsing runs in a process pool and
+        rows are written in one transaction per batch.
+        """
+        t0 = time.monotonic()
+        paths = find_manifests(roots)
+        with self._lock:
+            known = dict(self.db.execute("SELECT manifest_path, mtime FROM sessions").fetchall())
+        todo = [p for p in paths if force or known.get(p) is None or abs(known[p] - _mtime(p)) > 1e-6]
+        stats = {"files": len(paths), "ingested": 0, "skipped": len(paths) - len(todo), "failed": 0, "chunks": 0}
+        if len(todo) < 64 or workers == 1:
+            results = map(manifest_rows, todo)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(manifest_rows, todo, chunksize=32)
+        try:
+            batch = []
+            for res in results:
+                batch.append(res)
+                if len(batch) >= 500:
+                    self._write_batch(batch, stats)
+                    batch = []
+            self._write_batch(batch, stats)
+        finally:
+            if pool: pool.shutdown()
+        if stats["ingested"]:
+            with self._lock:
+                self.db.execute("ANALYZE")  # index statistics for the query planner
+        stats["seconds"] = round(time.monotonic() - t0, 3)
+        return stats
+
+    def _write_batch(self, batch: list, stats: dict) -> None:
+        with self._lock, self.db:
+            for path, session, chunks, errors, err in batch:
+                if session is None:
+                    stats["failed"] += 1
+                    continue
+                self._put_rows(self._put_session(session), chunks, errors)
+                stats["ingested"] += 1
+                stats["chunks"] += len(chunks)
+
+    # Incremental updates from a running SessionManifest
+    def session_started(self, manifest_path: str, data: dict) -> int:
+        sess, st, cfg = data["session"], data["station"], data["settings"]
+        session = {
+            "manifest_path": os.path.abspath(manifest_path), "session_id": sess["id"], "output_dir": cfg.get("output_dir"),
+            "preset": st.get("preset_name"), "short_code": st.get("short_code"), "url": st.get("url"), "format": st.get("format"),
+            "capture_mode": cfg.get("capture_mode"), "chunk_seconds": cfg.get("chunk_seconds"), "status": sess.get("status"),
+            "start_ts": to_ts(sess.get("start_local")), "end_ts": None, "start_local": sess.get("start_local"), "end_local": None,
+            "chunks": 0, "failed": 0, "errors": 0, "bytes": 0, "seconds": 0, "mtime": None,
+        }
+        with self._lock, self.db:
+            sid = self._put_session(session)
+            self._put_rows(sid, [], [])
+        return sid
+
+    def session_resumed(self, manifest_path: str) -> Optional[int]:
+        """Re-index a reopened (recovered) session; returns its id for further updates."""
+        self.ingest(manifest_path)
+        with self._lock:
+            row = self.db.execute("SELECT id FROM sessions WHERE manifest_path=?", (os.path.abspath(manifest_path),)).fetchone()
+        return row[0] if row else None
+
+    def chunk_added(self, sid: int, item: dict) -> None:
+        row = chunk_row(item)
+        with self._lock, self.db:
+            self.db.execute(f"INSERT OR REPLACE INTO chunks (session, {', '.join(_CHUNK_COLS)}) VALUES (?{', ?' * len(_CHUNK_COLS)})", (sid,) + row)
+            self.db.execute("UPDATE sessions SET chunks=chunks+1, bytes=bytes+?, seconds=seconds+? WHERE id=?", (row[8] or 0, row[6] or 0, sid))
+
+    def error_added(self, sid: int, item: dict) -> None:
+        row = error_row(item)
+        with self._lock, self.db:
+            self.db.execute(f"INSERT INTO errors (session, {', '.join(_ERROR_COLS)}) VALUES (?{', ?' * len(_ERROR_COLS)})", (sid,) + row)
+            failed = 0
+            if row[1] is not None:
+                failed = self.db.execute("INSERT OR IGNORE INTO chunks (session, idx, status, bytes, start_ts) "
+                                         "SELECT id, ?, 'failed', 0, start_ts + (? - 1) * COALESCE(chunk_seconds, 0) FROM sessions WHERE id=?",
+                                         (row[1], row[1], sid)).rowcount
+            self.db.execute("UPDATE sessions SET errors=errors+1, failed=failed+? WHERE id=?", (failed, sid))
+
+    def session_updated(self, sid: int, status: str, end_local: Optional[str], manifest_path: str) -> None:
+        with self._lock, self.db:
+            self.db.execute("UPDATE sessions SET status=?, end_local=?, end_ts=?, mtime=? WHERE id=?",
+                            (status, end_local, to_ts(end_local), _mtime(manifest_path), sid))
+
+    # -------------------- queries --------------------
+    @staticmethod
+    def _session_filter(station: Optional[str], session_status: Optional[str], with_errors: Optional[bool]) -> Tuple[List[str], list]:
+        where, args = [], []
+        if station:
+            where.append("(s.preset LIKE ? OR s.short_code LIKE ? OR s.url LIKE ?)")
+            args += [f"%{station}%", station, f"%{station}%"]
+        if session_status:
+            where.append("s.status = ?")
+            args.append(session_status)
+        if with_errors is not None:
+            where.append("s.errors > 0" if with_errors else "s.errors = 0")
+        return where, args
+
+    def query_chunks(
+        self,
+        station: Optional[str] = None,
+        since=None,
+        until=None,
+        status: Optional[str] = None,
+        session_status: Optional[str] = None,
+        with_errors: Optional[bool] = None,
+        min_bytes: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        limit: Optional[int] = 1000,
+    ) -> List[Dict[str, Any]]:
+        """Chunks (newest first) matching every given filter. since/until: see to_ts()."""
+        swhere, args = self._session_filter(station, session_status, with_errors)
+        # Session filters select a (small) set of session ids; chunk filters use the chunk indexes.
+        where = ["c.session IN (SELECT s.id FROM sessions s WHERE " + " AND ".join(swhere) + ")"] if swhere else []
+        if since is not None:
+            where.append("c.start_ts >= ?")
+            args.append(to_ts(since))
+        if until is not None:
+            where.append("c.start_ts < ?")
+            args.append(to_ts(until))
+        if status:
+            where.append("c.status = ?")
+            args.append(status)
+        if min_bytes is not None:
+            where.append("c.bytes >= ?")
+            args.append(int(min_bytes))
+        if max_bytes is not None:
+            where.append("c.bytes <= ?")
+            args.append(int(max_bytes))
+        sql = ("SELECT s.session_id, s.preset, s.short_code, s.status AS session_status, s.output_dir, c.* "
+               "FROM chunks c JOIN sessions s ON s.id = c.session"
+               + (" WHERE " + " AND ".join(where) if where else "")
+               # A size filter is usually more selective than walking the time index in order.
+               + (" ORDER BY c.start_ts + 0 DESC" if min_bytes is not None or max_bytes is not None else " ORDER BY c.start_ts DESC")
+               + (" LIMIT ?" if limit else ""))
+        if limit: args.append(int(limit))
+        with self._lock:
+            return [dict(r) for r in self.db.execute(sql, args)]
+
+    def query_sessions(
+        self,
+        station: Optional[str] = None,
+        since=None,
+        until=None,
+        status: Optional[str] = None,
+        with_errors: Optional[bool] = None,
+        limit: Optional[int] = 1000,
+    ) -> List[Dict[str, Any]]:
+        where, args = self._session_filter(station, status, with_errors)
+        if since is not None:
+            where.append("s.start_ts >= ?")
+            args.append(to_ts(since))
+        if until is not None:
+            where.append("s.start_ts < ?")
+            args.append(to_ts(until))
+        sql = ("SELECT s.* FROM sessions s" + (" WHERE " + " AND ".join(where) if where else "")
+               + " ORDER BY s.start_ts DESC" + (" LIMIT ?" if limit else ""))
+        if limit: args.append(int(limit))
+        with self._lock:
+            return [dict(r) for r in self.db.execute(sql, args)]
+
+    def totals(self) -> Dict[str, Any]:
+        with self._lock:
+            r = self.db.execute("SELECT COUNT(*), COALESCE(SUM(chunks), 0), COALESCE(SUM(failed), 0), COALESCE(SUM(bytes), 0), COALESCE(SUM(seconds), 0) FROM sessions").fetchone()
+        return {"sessions": r[0], "chunks": r[1], "failed_chunks": r[2], "bytes": r[3], "seconds": round(r[4], 1)}
+
+
+_open: Dict[str, Catalog] = {}
+_open_lock = threading.Lock()
+
+
+def open_catalog(path: Union[None, str, Path] = None) -> Optional[Catalog]:
+    """Process-wide Catalog per path; None (and no error) if it cannot be opened."""
+    key = str(path or default_catalog_path())
+    with _open_lock:
+        if key not in _open:
+            try:
+                _open[key] = Catalog(key)
+            except sqlite3.Error:
+                return None
+        return _open[key]
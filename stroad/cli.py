@@ -0,0 +1,399 @@
+import argparse
+import signal
+import sys
+import time
+from typing import List, Optional
+
+from .constants import APP_TITLE
+from .settings import DEFAULTS, load_settings
+from .streams import load_streams, resolve_stream_url
+from .engine import RecordingEngine, EngineListener
+from .utils import safe_int
+
+# Settings that only make sense in the GUI
+_GUI_ONLY = {"theme", "ffplay_path"}
+
+
+class _ConsoleListener(EngineListener):
+    def __init__(self, quiet: bool = False):
+        self.quiet = quiet
+
+    def log(self, line: str) -> None:
+        if not self.quiet:
+            print(line, flush=True)
+
+    def finished(self, status: str) -> None:
+        print(f"Session {status}.", flush=True)
+
+
+def _add_settings_options(p: argparse.ArgumentParser) -> None:
+    # Every persisted setting is also a command-line option (--chunk-time-str 15m ...).
+    g = p.add_argument_group("settings (override ~/.stroad2.json)")
+    for key, default in DEFAULTS.items():
+        if key in _GUI_ONLY:
+            continue
+        g.add_argument("--" + key.replace("_", "-"), dest=key, default=None, metavar="N" if isinstance(default, int) else "VALUE",
+                       type=type(default) if isinstance(default, (int, float)) and not isinstance(default, bool) else str)
+
+
+def build_config(args: argparse.Namespace) -> dict:
+    cfg = dict(DEFAULTS) if args.no_settings else load_settings()
+    for key in DEFAULTS:
+        v = getattr(args, key, None)
+        if v is not None:
+            cfg[key] = v
+    return cfg
+
+
+def cmd_record(args: argparse.Namespace) -> int:
+    cfg = build_config(args)
+    url = (args.url or "").strip() or resolve_stream_url(cfg, load_streams(args.streams))
+    engine = RecordingEngine(cfg, url, listener=_ConsoleListener(quiet=args.quiet))
+    try:
+        engine.start()
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    def _stop(signum, frame):
+        engine.stop()
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    while not engine.wait(0.5):
+        pass
+    return 0 if engine.status == "completed" else 1
+
+
+def cmd_record_many(args: argparse.Namespace) -> int:
+    from .multi import MultiRecorder, load_sessions_file
+    cfg = build_config(args)
+    sink = None if args.quiet else (lambda line: print(line, flush=True))
+    rec = MultiRecorder(cfg, load_streams(args.streams), max_encoders=args.max_encoders, per_host=args.per_host, log_sink=sink)
+    for spec in load_sessions_file(args.sessions):
+        rec.add(spec)
+    for err in rec.start_all():
+        print(f"error: {err}", file=sys.stderr)
+    if not rec.running():
+        return 2
+
+    def _stop(signum, frame):
+        rec.stop_all()
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    last = time.monotonic()
+    while not rec.wait(0.5):
+        if args.status_every > 0 and time.monotonic() - last >= args.status_every:
+            last = time.monotonic()
+            print(rec.status_table(), flush=True)
+    print(rec.status_table(), flush=True)
+    return 0 if all(r["state"] == "completed" for r in rec.status()) else 1
+
+
+def cmd_recover(args: argparse.Namespace) -> int:
+    from .recovery import find_unfinished, plan_recovery, recovery_config
+    cfg = build_config(args)
+    max_age = safe_int(cfg.get("recovery_max_age_hours"), default=48)
+    engines = []
+    for folder in args.folders or [cfg["output_path"]]:
+        for path in find_unfinished(folder, max_age):
+            try:
+                plan = plan_recovery(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"error: {path}: {e}", file=sys.stderr)
+                continue
+            engine = RecordingEngine(recovery_config(cfg, plan), plan["url"], listener=_ConsoleListener(quiet=args.quiet))
+            try:
+                engine.recover(plan, resume=args.resume)
+            except ValueError as e:
+                print(f"error: {path}: {e}", file=sys.stderr)
+                continue
+            engines.append(engine)
+    if not engines:
+        print("Nothing to recover.")
+        return 0
+
+    def _stop(signum, frame):
+        for e in engines:
+            e.stop()
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    while not all(e.wait(0.5) for e in engines):
+        pass
+    return 0 if all(e.status == "completed" for e in engines) else 1
+
+
+def _schedule_path(args: argparse.Namespace) -> str:
+    from .scheduler import default_schedule_path
+    return args.file or (load_settings().get("schedule_path") or "").strip() or str(default_schedule_path())
+
+
+def cmd_schedule_run(args: argparse.Namespace) -> int:
+    from .scheduler import Scheduler
+    cfg = build_config(args)
+    sink = None if args.quiet else (lambda line: print(line, flush=True))
+    sched = Scheduler(cfg, load_streams(args.streams), path=args.file, log=sink, max_encoders=args.max_encoders, per_host=args.per_host)
+
+    def _stop(signum, frame):
+        sched.stop()
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        sched.run()
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def cmd_schedule_list(args: argparse.Namespace) -> int:
+    from datetime import datetime
+    from .scheduler import load_schedule_file, occurrence, parse_entries
+    path = _schedule_path(args)
+    entries = parse_entries(load_schedule_file(path), safe_int(load_settings().get("schedule_lead_sec"), default=30))
+    now = datetime.now()
+    for start, end, e in sorted((occurrence(e, now) + (e,) for e in entries), key=lambda r: r[0]):
+        days = ",".join(d for i, d in enumerate(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]) if i in e["days"])
+        print(f"{start:%a %Y-%m-%d %H:%M}–{end:%H:%M}  {e['name'][:32]:<32} {days:<27} lead {e['lead']}s")
+    print(f"{len(entries)} entries in {path}", file=sys.stderr)
+    return 0
+
+
+def cmd_schedule_add(args: argparse.Namespace) -> int:
+    from .scheduler import load_schedule_file, parse_entries, save_schedule_file
+    path = _schedule_path(args)
+    data = load_schedule_file(path)
+    item = {"name": args.name, "days": args.days, "start": args.start}
+    for key in ("station", "url", "end", "duration", "lead_sec"):
+        if getattr(args, key) is not None:
+            item[key] = getattr(args, key)
+    data["entries"] = [e for e in data["entries"] if e.get("name") != args.name] + [item]
+    try:
+        parse_entries(data)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    save_schedule_file(data, path)
+    print(f"Saved '{args.name}' to {path}.")
+    return 0
+
+
+def cmd_schedule_remove(args: argparse.Namespace) -> int:
+    from .scheduler import load_schedule_file, save_schedule_file
+    path = _schedule_path(args)
+    data = load_schedule_file(path)
+    keep = [e for e in data["entries"] if e.get("name") != args.name]
+    if len(keep) == len(data["entries"]):
+        print(f"error: no entry named '{args.name}'", file=sys.stderr)
+        return 1
+    data["entries"] = keep
+    save_schedule_file(data, path)
+    print(f"Removed '{args.name}'.")
+    return 0
+
+
+def _open_catalog(args: argparse.Namespace):
+    from .catalog import Catalog
+    path = args.db or (load_settings().get("catalog_path") or "").strip()
+    return Catalog(path if path and path.lower() != "off" else None)
+
+
+def _fmt_bytes(n) -> str:
+    n = float(n or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+
+
+def cmd_catalog_scan(args: argparse.Namespace) -> int:
+    cat = _open_catalog(args)
+    st = cat.scan(args.folders or [load_settings()["output_path"]], workers=args.workers, force=args.force)
+    print(f"{st['files']} manifests: {st['ingested']} indexed ({st['chunks']} chunks), {st['skipped']} unchanged, {st['failed']} unreadable in {st['seconds']:.2f}s")
+    return 0 if not st["failed"] else 1
+
+
+def cmd_catalog_query(args: argparse.Namespace) -> int:
+    import json
+    cat = _open_catalog(args)
+    t0 = time.perf_counter()
+    errors = True if args.errors else None
+    if args.sessions:
+        rows = cat.query_sessions(station=args.station, since=args.since, until=args.until, status=args.session_status, with_errors=errors, limit=args.limit)
+    else:
+        rows = cat.query_chunks(station=args.station, since=args.since, until=args.until, status=args.status, session_status=args.session_status,
+                                with_errors=errors, min_bytes=args.min_bytes, max_bytes=args.max_bytes, limit=args.limit)
+    ms = (time.perf_counter() - t0) * 1000
+    if args.json:
+        print(json.dumps(rows, indent=1, ensure_ascii=False))
+        return 0
+    for r in rows:
+        if args.sessions:
+            print(f"{r['session_id']:<28} {(r['preset'] or r['short_code'] or '')[:24]:<24} {r['status'] or '':<10} {r['chunks']:>4} ok {r['failed']:>3} failed {r['errors']:>3} err {_fmt_bytes(r['bytes']):>9}")
+        else:
+            name = r["output_file"] or "-"
+            print(f"{(r['start_local'] or '')[:19]:<19} {(r['preset'] or r['short_code'] or '')[:24]:<24} #{r['idx']:<4} {r['status']:<6} {_fmt_bytes(r['bytes']):>9}  {name}")
+    print(f"{len(rows)} {'sessions' if args.sessions else 'chunks'} in {ms:.1f} ms", file=sys.stderr)
+    return 0
+
+
+def cmd_catalog_stats(args: argparse.Namespace) -> int:
+    t = _open_catalog(args).totals()
+    print(f"{t['sessions']} sessions, {t['chunks']} chunks ({t['failed_chunks']} failed), {_fmt_bytes(t['bytes'])}, {t['seconds'] / 3600:.1f} h")
+    return 0
+
+
+def cmd_compact(args: argparse.Namespace) -> int:
+    from .compact import compact
+    from .utils import find_bin
+    cfg = load_settings()
+    ffmpeg = (args.ffmpeg_path or cfg.get("ffmpeg_path") or "").strip() or find_bin("ffmpeg")
+    try:
+        st = compact(ffmpeg, args.folders or [cfg["output_path"]], by=args.by, jobs=args.jobs,
+                     delete_chunks=args.delete_chunks, force=args.force, dry_run=args.dry_run)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    print(f"{st['archives']} archives from {st['chunks']} chunks ({_fmt_bytes(st['bytes'])}), {st['failed']} chunks failed, {st['deleted']} chunk files removed")
+    return 0 if not st["failed"] else 1
+
+
+def cmd_check(args: argparse.Namespace) -> int:
+    import json
+    from .health import HealthCache, check_streams, describe
+    from .utils import find_bin
+    cfg = load_settings()
+    presets = load_streams(args.streams)
+    if args.names:
+        missing = [n for n in args.names if n not in presets]
+        if missing:
+            print(f"error: no preset named {', '.join(repr(n) for n in missing)}", file=sys.stderr)
+            return 2
+        presets = {n: presets[n] for n in args.names}
+    ffprobe = (cfg.get("ffprobe_path") or "").strip() or find_bin("ffprobe")
+    timeout = args.timeout or float(cfg.get("health_timeout_sec") or 8)
+    show = None if args.json else (lambda r: print(f"{'OK  ' if r['ok'] else 'DEAD'} {r['name'][:32]:<32} {describe(r)}", flush=True))
+    results = check_streams(presets, ffprobe, workers=args.workers, timeout=timeout, per_host=args.per_host, on_result=show)
+    HealthCache((cfg.get("health_cache_path") or "").strip() or None).update(results)
+    if args.json:
+        print(json.dumps(results, indent=1, ensure_ascii=False))
+    else:
+        print(f"{sum(r['ok'] for r in results)}/{len(results)} streams reachable", file=sys.stderr)
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="python -m stroad", description=f"{APP_TITLE} stream recorder")
+    sub = p.add_subparsers(dest="command")
+
+    rec = sub.add_parser("record", help="record a stream without the GUI")
+    rec.add_argument("--url", help="stream URL (default: selected preset / custom URL from settings)")
+    rec.add_argument("--streams", default="streams.json", help="preset file (default: %(default)s)")
+    rec.add_argument("--no-settings", action="store_true", help="ignore ~/.stroad2.json, start from defaults")
+    rec.add_argument("-q", "--quiet", action="store_true", help="only print the final status")
+    _add_settings_options(rec)
+    rec.set_defaults(func=cmd_record)
+
+    many = sub.add_parser("record-many", help="record several stations at once in one process")
+    many.add_argument("sessions", help="JSON file: list of sessions, or {\"defaults\": {...}, \"sessions\": [...]}")
+    many.add_argument("--streams", default="streams.json", help="preset file (default: %(default)s)")
+    many.add_argument("--no-settings", action="store_true", help="ignore ~/.stroad2.json, start from defaults")
+    many.add_argument("--max-encoders", default=None, help="encodes running at once over all sessions (default: encode_workers)")
+    many.add_argument("--per-host", type=int, default=2, help="max simultaneous connections per stream host (default: %(default)s)")
+    many.add_argument("--status-every", type=float, default=60, help="print the status table every N seconds (0 = only at the end)")
+    many.add_argument("-q", "--quiet", action="store_true", help="no log lines, status table only")
+    _add_settings_options(many)
+    many.set_defaults(func=cmd_record_many)
+
+    rcv = sub.add_parser("recover", help="finish sessions left unfinished by a crash (encode leftovers, optionally resume)")
+    rcv.add_argument("folders", nargs="*", help="folders to check (default: output_path setting)")
+    rcv.add_argument("--resume", action="store_true", help="also record the rest of each session's planned time")
+    rcv.add_argument("--no-settings", action="store_true", help="ignore ~/.stroad2.json, start from defaults")
+    rcv.add_argument("-q", "--quiet", action="store_true", help="only print the final status")
+    _add_settings_options(rcv)
+    rcv.set_defaults(func=cmd_recover)
+
+    sch = sub.add_parser("schedule", help="recurring recordings (schedule file)")
+    sch.add_argument("--file", default=None, help="schedule file (default: schedule_path setting or ~/.stroad2_schedule.json)")
+    ssub = sch.add_subparsers(dest="schedule_command", required=True)
+    run = ssub.add_parser("run", help="run the scheduler in the foreground until interrupted")
+    run.add_argument("--streams", default="streams.json", help="preset file (default: %(default)s)")
+    run.add_argument("--no-settings", action="store_true", help="ignore ~/.stroad2.json, start from defaults")
+    run.add_argument("--max-encoders", default=None, help="encodes running at once over all sessions (default: encode_workers)")
+    run.add_argument("--per-host", type=int, default=2, help="max simultaneous connections per stream host (default: %(default)s)")
+    run.add_argument("-q", "--quiet", action="store_true", help="no log lines")
+    _add_settings_options(run)
+    run.set_defaults(func=cmd_schedule_run)
+    ls = ssub.add_parser("list", help="show the next slot of every entry")
+    ls.set_defaults(func=cmd_schedule_list)
+    add = ssub.add_parser("add", help="add or replace an entry")
+    add.add_argument("name")
+    add.add_argument("--station", help="preset name from streams.json")
+    add.add_argument("--url", help="stream URL (instead of a preset)")
+    add.add_argument("--days", default="daily", help="mon-fri, sat,sun, weekdays, daily ... (default: %(default)s)")
+    add.add_argument("--start", required=True, help="HH:MM")
+    add.add_argument("--end", help="HH:MM (may be after midnight)")
+    add.add_argument("--duration", help="instead of --end: 2h, 90m ...")
+    add.add_argument("--lead-sec", type=int, default=None, help="connect this many seconds early (default: per station / schedule_lead_sec)")
+    add.set_defaults(func=cmd_schedule_add)
+    rm = ssub.add_parser("remove", help="delete an entry")
+    rm.add_argument("name")
+    rm.set_defaults(func=cmd_schedule_remove)
+
+    cat = sub.add_parser("catalog", help="index and search all sessions/chunks (SQLite)")
+    cat.add_argument("--db", default=None, help="catalog file (default: catalog_path setting or ~/.stroad2_catalog.sqlite)")
+    csub = cat.add_subparsers(dest="catalog_command", required=True)
+    scan = csub.add_parser("scan", help="index existing *.session.json files (recursively)")
+    scan.add_argument("folders", nargs="*", help="folders to scan (default: output_path setting)")
+    scan.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    scan.add_argument("--force", action="store_true", help="re-read manifests even if unchanged")
+    scan.set_defaults(func=cmd_catalog_scan)
+    q = csub.add_parser("query", help="list chunks (or sessions) matching filters")
+    q.add_argument("--station", help="preset name / short code / URL (substring)")
+    q.add_argument("--since", help="start on or after (2026-03, 2026-03-01, 2026-03-01T12:00)")
+    q.add_argument("--until", help="start before (same formats)")
+    q.add_argument("--status", choices=["ok", "failed"], help="chunk status")
+    q.add_argument("--session-status", help="completed / aborted / recording")
+    q.add_argument("--errors", action="store_true", help="only sessions that logged errors")
+    q.add_argument("--min-bytes", type=int, default=None)
+    q.add_argument("--max-bytes", type=int, default=None)
+    q.add_argument("--sessions", action="store_true", help="list sessions instead of chunks")
+    q.add_argument("--limit", type=int, default=200, help="max rows, 0 = all (default: %(default)s)")
+    q.add_argument("--json", action="store_true", help="print rows as JSON")
+    q.set_defaults(func=cmd_catalog_query)
+    stats = csub.add_parser("stats", help="totals over the whole catalog")
+    stats.set_defaults(func=cmd_catalog_stats)
+
+    cmp = sub.add_parser("compact", help="join finished sessions' chunks into one file per session/day (no re-encode)")
+    cmp.add_argument("folders", nargs="*", help="folders with *.session.json, searched recursively (default: output_path setting)")
+    cmp.add_argument("--by", choices=["session", "day"], default="session", help="one archive per session or per station and day (default: %(default)s)")
+    cmp.add_argument("--jobs", type=int, default=4, help="archives built at once (default: %(default)s)")
+    cmp.add_argument("--delete-chunks", action="store_true", help="remove chunk files once they are in an archive")
+    cmp.add_argument("--force", action="store_true", help="also take chunks that are already in an archive")
+    cmp.add_argument("--ffmpeg-path", default=None, help="ffmpeg binary (default: ffmpeg_path setting / PATH)")
+    cmp.add_argument("--dry-run", action="store_true", help="only list the archives that would be written")
+    cmp.set_defaults(func=cmd_compact)
+
+    chk = sub.add_parser("check", help="probe every preset (reachability, codec, bitrate, time to first byte, ICY name)")
+    chk.add_argument("names", nargs="*", help="presets to check (default: all)")
+    chk.add_argument("--streams", default="streams.json", help="preset file (default: %(default)s)")
+    chk.add_argument("--workers", type=int, default=8, help="streams probed at once (default: %(default)s)")
+    chk.add_argument("--per-host", type=int, default=2, help="max simultaneous connections per stream host (default: %(default)s)")
+    chk.add_argument("--timeout", type=float, default=None, help="seconds per probe step (default: health_timeout_sec setting)")
+    chk.add_argument("--json", action="store_true", help="print the results as JSON")
+    chk.set_defaults(func=cmd_check)
+
+    sub.add_parser("gui", help="start the Tk app (default)")
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command in (None, "gui"):
+        # Imported lazily so headless commands never load tkinter.
+        import tkinter as tk
+        from .app import StroadApp
+        root = tk.Tk()
+        StroadApp(root)
+        root.mainloop()
+        return 0
+    return args.func(args)
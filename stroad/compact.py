@@ -0,0 +1,292 @@
+"""
+Archive compaction: join a session's chunks (or a day's) into one file at
+the stream level, without re-encoding, driven by the manifests' `chunks`.
+
+Each chunk's audio is copied out as a bare elementary stream (MP3 frames,
+or ADTS for AAC chunks; no per-file tags or Xing header) and appended, so
+the byte offset of every chunk in the archive is known exactly. The file
+starts with an ID3v2.4 tag whose CHAP frames carry both times and byte
+offsets (players show them as chapters), and `<archive>.index.json` lists
+the same per chunk plus its track cues, so one chunk can be cut back out
+with a plain byte range.
+"""
+import json
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from .catalog import find_manifests
+from .manifest import annotate_manifest, journal_path, read_manifest
+from .supervisor import StdoutPipe, get_supervisor
+
+INDEX_VERSION = 1
+GROUP_BY = ("session", "day")
+# chunk extension -> (ffmpeg muxer, archive extension)
+_FORMATS = {".mp3": ("mp3", ".mp3"), ".m4a": ("adts", ".aac")}
+_NO_OFFSET = 0xFFFFFFFF  # CHAP: "use the times"
+_CTOC_MAX = 255  # entries per CTOC frame
+
+
+def copy_cmd(ffmpeg: str, src: str, muxer: str) -> List[str]:
+    extra = ["-write_xing", "0", "-id3v2_version", "0", "-write_id3v1", "0"] if muxer == "mp3" else []
+    return [ffmpeg, "-v", "error", "-i", src, "-map", "0:a:0", "-c", "copy", "-map_metadata", "-1"] + extra + ["-f", muxer, "pipe:1"]
+
+
+def _pipe_into(cmd: List[str], f) -> Tuple[bool, int]:
+    # Same hand-off as pcm.run_pcm: the supervisor loop only reads (bounded), this thread writes.
+    pipe = StdoutPipe()
+    child = get_supervisor().spawn(cmd, stdout_pipe=pipe)
+    n = 0
+    try:
+        while True:
+            data = pipe.get()
+            if data is None:
+                break
+            f.write(data)
+            n += len(data)
+    except BaseException:
+        pipe.abandon()
+        child.terminate()
+        raise
+    return child.future.result().returncode == 0, n
+
+
+# ---- ID3v2.4 chapters ----
+def _syncsafe(n: int) -> bytes:
+    return bytes(((n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F))
+
+
+def _frame(fid: str, body: bytes) -> bytes:
+    return fid.encode("ascii") + _syncsafe(len(body)) + b"\0\0" + body
+
+
+def _text(fid: str, text: str) -> bytes:
+    return _frame(fid, b"\x03" + text.encode("utf-8"))  # 3 = UTF-8
+
+
+def _off(n: int) -> int:
+    return n if n < _NO_OFFSET else _NO_OFFSET
+
+
+def chapter_tag(title: str, album: str, chapters: List[dict], base: int = 0, size: int = 0) -> bytes:
+    """
+    ID3v2.4 tag with TIT2/TALB, one CHAP per chapter and a table of contents
+    (nested when there are more than 255). Chapter byte offsets are relative
+    to the audio and shifted by `base`, the tag's own length; its size does
+    not depend on the offsets, so it can be built twice. `size` pads the
+    tag (ID3 padding) to fill space reserved for it.
+    """
+    frames = [_text("TIT2", title), _text("TALB", album)]
+    ids = []
+    for n, c in enumerate(chapters):
+        cid = b"ch%d" % n
+        ids.append(cid)
+        frames.append(_frame("CHAP", cid + b"\0" + struct.pack(">IIII", int(c["start_ms"]), int(c["end_ms"]), _off(base + c["offset"]), _off(base + c["offset"] + c["bytes"]))
+                             + _text("TIT2", c["title"])))
+    if len(ids) <= _CTOC_MAX:
+        groups = [(b"toc", ids)]
+    else:
+        subs = [(b"toc%d" % k, ids[k * _CTOC_MAX:(k + 1) * _CTOC_MAX]) for k in range((len(ids) + _CTOC_MAX - 1) // _CTOC_MAX)]
+        groups = [(b"toc", [s[0] for s in subs])] + subs
+    for k, (tid, children) in enumerate(groups):
+        flags = 0x03 if k == 0 else 0x01  # top-level (first only) + ordered
+        frames.append(_frame("CTOC", tid + b"\0" + bytes((flags, len(children))) + b"".join(c + b"\0" for c in children)))
+    body = b"".join(frames)
+    body += b"\0" * max(0, size - 10 - len(body))
+    return b"ID3\x04\x00\x00" + _syncsafe(len(body)) + body
+
+
+# ---- planning ----
+def _prefix(output_file: str) -> str:
+    # <prefix>_<YYYYMMDD>_<HHMMSS>_<nnn>.ext
+    return os.path.splitext(output_file)[0].rsplit("_", 3)[0]
+
+
+def plan_groups(roots: List[str], by: str = "session", force: bool = False) -> Tuple[List[dict], List[str]]:
+    """
+    Archives to build from the finished manifests under `roots`. Chunks
+    already in an archive (the manifest's `archives`) are left out unless
+    `force`. Returns (groups, notes); each group has its folder, name,
+    muxer and chunk entries in time order.
+    """
+    if by not in GROUP_BY:
+        raise ValueError(f"Unknown grouping '{by}' (use {', '.join(GROUP_BY)}).")
+    groups: Dict[tuple, dict] = {}
+    notes = []
+    for path in sorted(find_manifests(roots)):
+        if journal_path(path).exists():
+            notes.append(f"{os.path.basename(path)}: still recording (or unrecovered), skipped")
+            continue
+        try:
+            data = read_manifest(path)
+        except (OSError, ValueError) as e:
+            notes.append(f"{os.path.basename(path)}: unreadable ({e})")
+            continue
+        folder = os.path.dirname(path)
+        sid = data["session"]["id"]
+        station = (data.get("station") or {}).get("preset_name") or ""
+        done = set() if force else {i for a in data.get("archives", []) for i in a.get("chunks", [])}
+        for c in data.get("chunks", []):
+            name = c.get("output_file") or ""
+            ext = os.path.splitext(name)[1].lower()
+            if c["index"] in done or not name:
+                continue
+            if ext not in _FORMATS:
+                notes.append(f"{name}: {ext or 'no extension'} is not joined, left as it is")
+                continue
+            src = os.path.join(folder, name)
+            if not os.path.exists(src):
+                continue
+            day = (c.get("start_local") or "")[:10]
+            key = (folder, _prefix(name), ext) + ((path,) if by == "session" else (day,))
+            g = groups.get(key)
+            if g is None:
+                stem = "%s_%s" % (_prefix(name), sid if by == "session" else day.replace("-", ""))
+                g = groups[key] = {"folder": folder, "stem": stem, "muxer": _FORMATS[ext][0], "ext": _FORMATS[ext][1],
+                                   "station": station, "by": by, "chunks": []}
+            g["chunks"].append(dict(c, manifest=path, session_id=sid, source=src))
+    out = list(groups.values())
+    for g in out:
+        g["chunks"].sort(key=lambda c: (c.get("start_local") or "", c["index"]))
+    return out, notes
+
+
+def _archive_path(folder: str, stem: str, ext: str) -> str:
+    path = os.path.join(folder, f"{stem}_archive{ext}")
+    n = 2
+    while os.path.exists(path):
+        path = os.path.join(folder, f"{stem}_archive{n}{ext}")
+        n += 1
+    return path
+
+
+def _chapter_title(c: dict) -> str:
+    t = (c.get("start_local") or "")[11:19] or "#%d" % c["index"]
+    cues = c.get("cues") or []
+    return f"{t} {cues[0]['title']}" if cues and cues[0].get("offset", 0) < 1 else t
+
+
+# ---- building ----
+def build_archive(ffmpeg: str, group: dict, log: Callable[[str], None] = print) -> dict:
+    """Write one archive and its index; returns a summary (ok, file, index, chunks, bytes, seconds)."""
+    t0 = time.monotonic()
+    path = _archive_path(group["folder"], group["stem"], group["ext"])
+    title = group["stem"] if not group["station"] else f"{group['station']} {group['stem'].rsplit('_', 1)[-1]}"
+    entries = [dict(start_ms=0, end_ms=0, offset=0, bytes=0, title=_chapter_title(c)) for c in group["chunks"]]
+    head = len(chapter_tag(title, group["station"], entries))
+    tmp = path + ".tmp"
+    pos, ms, failed = 0, 0.0, 0
+    with open(tmp, "wb") as f:
+        f.write(b"\0" * head)  # the tag goes here once the offsets are known
+        for c, e in zip(group["chunks"], entries):
+            good, n = _pipe_into(copy_cmd(ffmpeg, c["source"], group["muxer"]), f)
+            if not good or n == 0:
+                # Cut back to the last good chunk so the archive stays valid.
+                f.seek(head + pos)
+                f.truncate()
+                failed += 1
+                log(f"COMPACT: {os.path.basename(c['source'])} could not be copied, left out")
+                e["bytes"] = -1
+                continue
+            dur = float(c.get("actual_seconds") or c.get("planned_seconds") or 0)
+            e.update(offset=pos, bytes=n, start_ms=int(ms * 1000), end_ms=int((ms + dur) * 1000))
+            pos += n
+            ms += dur
+        kept = [(c, e) for c, e in zip(group["chunks"], entries) if e["bytes"] >= 0]
+        if kept:
+            f.seek(0)
+            f.write(chapter_tag(title, group["station"], [e for _, e in kept], base=head, size=head))
+    if not kept:
+        os.remove(tmp)
+        return {"ok": False, "file": None, "chunks": [], "failed": failed}
+    os.replace(tmp, path)
+    index = {
+        "index_version": INDEX_VERSION,
+        "archive": os.path.basename(path),
+        "format": group["muxer"],
+        "grouped_by": group["by"],
+        "audio_offset": head,  # offsets below are into the file, the tag included
+        "bytes": head + pos,
+        "seconds": round(ms, 3),
+        "created": datetime.now().astimezone().isoformat(timespec="seconds"),
+        "chunks": [{
+            "session_id": c["session_id"],
+            "index": c["index"],
+            "source": os.path.basename(c["source"]),
+            "start_local": c.get("start_local"),
+            "end_local": c.get("end_local"),
+            "offset": head + e["offset"],
+            "bytes": e["bytes"],
+            "start": e["start_ms"] / 1000,
+            "end": e["end_ms"] / 1000,
+            "title": e["title"],
+            "cues": [dict(q, offset=round(e["start_ms"] / 1000 + q["offset"], 3)) for q in c.get("cues") or []],
+        } for c, e in kept],
+    }
+    index_path = os.path.splitext(path)[0] + ".index.json"
+    with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1, ensure_ascii=False)
+    os.replace(index_path + ".tmp", index_path)
+    log(f"COMPACT: {os.path.basename(path)} <- {len(kept)} chunks, {(head + pos) / 1048576:.1f} MB in {time.monotonic() - t0:.1f}s")
+    return {"ok": True, "file": path, "index": index_path, "chunks": [c for c, _ in kept], "failed": failed, "bytes": head + pos, "seconds": ms}
+
+
+def compact(ffmpeg: str, roots: List[str], by: str = "session", jobs: int = 4, delete_chunks: bool = False,
+            force: bool = False, dry_run: bool = False, log: Callable[[str], None] = print) -> dict:
+    """
+    Build every archive planned under `roots`, `jobs` at a time (the work is
+    ffmpeg stream copies and file I/O, so threads are enough). Afterwards
+    each manifest gets an `archives` entry per archive holding its chunks;
+    with `delete_chunks` the chunk files that went in are removed.
+    """
+    groups, notes = plan_groups(roots, by=by, force=force)
+    for n in notes:
+        log(f"COMPACT: {n}")
+    stats = {"archives": 0, "chunks": 0, "failed": 0, "bytes": 0, "deleted": 0}
+    if dry_run:
+        for g in groups:
+            log(f"COMPACT: would write {g['stem']}_archive{g['ext']} from {len(g['chunks'])} chunks")
+        stats["archives"] = len(groups)
+        stats["chunks"] = sum(len(g["chunks"]) for g in groups)
+        return stats
+    def run(g: dict) -> dict:
+        try:
+            return build_archive(ffmpeg, g, log=log)
+        except OSError as e:
+            log(f"COMPACT: {g['stem']}: {e}")
+            return {"ok": False, "chunks": [], "failed": len(g["chunks"])}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as ex:
+        results = list(ex.map(run, groups))
+    # Manifests are only touched from here, so sessions split over two days don't race.
+    for res in results:
+        stats["failed"] += res["failed"]
+        if not res["ok"]:
+            continue
+        stats["archives"] += 1
+        stats["chunks"] += len(res["chunks"])
+        stats["bytes"] += res["bytes"]
+        per_manifest: Dict[str, List[dict]] = {}
+        for c in res["chunks"]:
+            per_manifest.setdefault(c["manifest"], []).append(c)
+        for mpath, chunks in per_manifest.items():
+            item: Dict[str, Any] = {"file": os.path.basename(res["file"]), "index_file": os.path.basename(res["index"]),
+                                    "chunks": [c["index"] for c in chunks], "chunks_deleted": delete_chunks,
+                                    "created": datetime.now().astimezone().isoformat(timespec="seconds")}
+            try:
+                annotate_manifest(mpath, "archives", item)
+            except (OSError, ValueError) as e:
+                log(f"COMPACT: {os.path.basename(mpath)} not updated ({e}); chunk files kept")
+                continue
+            if delete_chunks:
+                for c in chunks:
+                    try:
+                        os.remove(c["source"])
+                        stats["deleted"] += 1
+                        if c.get("peaks_file"): os.remove(os.path.join(os.path.dirname(c["source"]), c["peaks_file"]))
+                    except OSError:
+                        pass
+    return stats
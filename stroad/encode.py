@@ -0,0 +1,80 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+from .pcm import PCM_FILTER, pcm_output_args
+
+def legacy_fade_filter(fade_sec: int) -> str:
+    # Buffers the whole decoded chunk (areverse); kept for benchmarks and as a
+    # fallback when the chunk length is unknown.
+    return f"afade=t=in:ss=0:d={fade_sec},areverse,afade=t=in:ss=0:d={fade_sec},areverse"
+
+def fade_filter(fade_sec: int, length: Optional[float] = None) -> str:
+    """Single-pass fade in/out. Streams in constant memory when the length is known."""
+    if fade_sec <= 0:
+        return "anull"
+    if not length or length <= 0:
+        return legacy_fade_filter(fade_sec)
+    d = min(float(fade_sec), length / 2.0)
+    return f"asetpts=PTS-STARTPTS,afade=t=in:st=0:d={d:.3f},afade=t=out:st={length - d:.3f}:d={d:.3f}"
+
+# Extra outputs per chunk (extra_outputs setting): name -> file extension.
+EXTRA_FORMATS = {"mp3": ".mp3", "m4a": ".m4a", "aac": ".m4a", "flac": ".flac"}
+
+def parse_extra_outputs(value, primary_ext: str) -> List[str]:
+    """'M4A, FLAC' -> ['.m4a', '.flac'], without the primary format and duplicates."""
+    out = []
+    for name in str(value or "").replace(";", ",").split(","):
+        name = name.strip().lower()
+        if not name: continue
+        if name not in EXTRA_FORMATS: raise ValueError(f"Unknown extra output '{name}' (use {', '.join(sorted(EXTRA_FORMATS))}).")
+        ext = EXTRA_FORMATS[name]
+        if ext != primary_ext and ext not in out: out.append(ext)
+    return out
+
+def codec_args(out_ext: str) -> List[str]:
+    if out_ext.lower() == ".mp3":
+        return ["-c:a", "libmp3lame", "-q:a", "4"]
+    if out_ext.lower() == ".flac":
+        return ["-c:a", "flac", "-compression_level", "5"]
+    return ["-c:a", "aac", "-b:a", "192k"]
+
+def tag_args(tags: Dict[str, object]) -> List[str]:
+    out = []
+    for k, v in tags.items():
+        out += ["-metadata", f"{k}={v}"]
+    return out
+
+def encode_cmd(ffmpeg: str, src: str, dst: str, af: str, tags: Dict[str, object], trim: Optional[Tuple[float, float]] = None) -> List[str]:
+    """trim: (start, length) in seconds of src to keep."""
+    ext = os.path.splitext(dst)[1]
+    cut = ["-ss", "%.3f" % trim[0], "-t", "%.3f" % trim[1]] if trim else []
+    return [ffmpeg, "-y"] + cut + ["-i", src, "-af", af] + tag_args(tags) + codec_args(ext) + [dst]
+
+def encode_multi_cmd(ffmpeg: str, src: str, dsts: List[str], af: str, tags: Dict[str, object], trim: Optional[Tuple[float, float]] = None, measure: Optional[str] = None, pcm: bool = False) -> List[str]:
+    """
+    One decode and one filter chain (fade etc.) split to every output, each
+    with its own encoder: extra formats cost an encode, not another decode.
+    `measure` (a sink chain, e.g. loudness.MEASURE_FILTER) gets one more
+    branch of the same audio. With `pcm` the decoded source (before the
+    filter chain) also goes to pipe:1 as low-rate PCM (see pcm.py).
+    """
+    if len(dsts) == 1 and not measure and not pcm:
+        return encode_cmd(ffmpeg, src, dsts[0], af, tags, trim=trim)
+    cut = ["-ss", "%.3f" % trim[0], "-t", "%.3f" % trim[1]] if trim else []
+    n = len(dsts) + (1 if measure else 0)
+    labels = "".join(f"[o{k}]" for k in range(n))
+    head = f"[0:a]asplit=2[a][p];[p]{PCM_FILTER}[pcm];[a]" if pcm else "[0:a]"
+    graph = f"{head}{af},asplit={n}{labels}" + (f";[o{n - 1}]{measure}" if measure else "")
+    cmd = [ffmpeg, "-y"] + cut + ["-i", src, "-filter_complex", graph]
+    for k, dst in enumerate(dsts):
+        cmd += ["-map", f"[o{k}]"] + tag_args(tags) + codec_args(os.path.splitext(dst)[1]) + [dst]
+    return cmd + (pcm_output_args("pcm") if pcm else [])
+
+def remux_cmd(ffmpeg: str, src: str, dst: str, tags: Dict[str, object], trim: Optional[Tuple[float, float]] = None) -> List[str]:
+    # Captured audio as it came (stream copy into Matroska): no decode, no fade.
+    cut = ["-ss", "%.3f" % trim[0], "-t", "%.3f" % trim[1]] if trim else []
+    return [ffmpeg, "-y", "-v", "error"] + cut + ["-i", src, "-map", "0:a", "-c", "copy"] + tag_args(tags) + [dst]
+
+def retag_cmd(ffmpeg: str, src: str, dst: str, tags: Dict[str, object]) -> List[str]:
+    # Stream copy of an already encoded chunk with replaced tags.
+    return [ffmpeg, "-y", "-v", "error", "-i", src, "-map", "0", "-c", "copy"] + tag_args(tags) + [dst]
@@ -0,0 +1,1120 @@
+import threading
+import os
+import time
+import datetime
+import shutil
+import uuid
+import math
+from typing import Tuple, List, Callable, Optional
+
+from .constants import APP_NAME, APP_VERSION
+from .settings import DEFAULTS
+from .utils import parse_time_string, safe_int, fmt_mmss, fmt_title_range, log_line, find_bin
+from .ffprobe import ffprobe_duration, station_name_from_tags, station_short_code
+from .manifest import SessionManifest
+from .recovery import fragment_times
+from .catalog import open_catalog
+from .metaprobe import MetadataProber
+from .pool import EncodePool, JobQueue, QUEUE_POLICIES, resolve_workers
+from .encode import fade_filter, encode_multi_cmd, remux_cmd, retag_cmd, parse_extra_outputs
+from .pcm import feed_file, run_pcm
+from .silence import SilenceAnalyser, keep_ranges, cut_filter, available as silence_available
+from .peaks import PeaksBuilder, peaks_path
+from .loudness import LOUDNESS_MODES, MEASURE_FILTER, get_profiles, parse_summary
+from .supervisor import get_supervisor
+from .icy import split_title
+from .tap import StreamTap
+from .capture import is_gapless, is_single_pass, chunk_capture_cmd, direct_capture_cmd, segment_capture_cmd, read_segment_list, concat_cmd, write_concat_list, ProgressReader
+
+
+MIN_TRACK_SEC = 15  # split mode: title changes sooner than this after a cut (jingles, ads) stay in the chunk
+
+
+class EngineListener:
+    """Progress hooks for a front-end. Called from worker threads."""
+
+    def log(self, line: str) -> None: pass
+    def status(self, text: str) -> None: pass
+    def chunk_started(self, i: int, num_chunks: int, dur: int) -> None: pass
+    def chunk_time(self, elapsed: int, dur: int) -> None: pass
+    def total_progress(self, done: int, num_chunks: int) -> None: pass
+    def finished(self, status: str) -> None: pass
+
+
+class RecordingEngine:
+    """
+    One recording session (capture -> job_q -> encode pool -> manifest),
+    independent of any GUI. `cfg` uses the same keys as settings.DEFAULTS.
+    """
+
+    def __init__(
+        self,
+        cfg: dict,
+        stream_url: str,
+        listener: Optional[EngineListener] = None,
+        meta: Optional[MetadataProber] = None,
+        encode_slots: Optional[threading.Semaphore] = None,
+        host_limiter=None,
+        session_suffix: str = "",
+        tap=None,
+        source_url: str = "",
+    ):
+        self.cfg = dict(DEFAULTS)
+        self.cfg.update(cfg or {})
+        self.stream_url = (stream_url or "").strip()
+        self.listener = listener or EngineListener()
+        # Cache and probes may be shared (GUI, multi.py); the manifest's `metadata` counts this session only.
+        self.meta = (meta or MetadataProber(ttl=safe_int(self.cfg.get("metadata_ttl_sec"), default=300))).view()
+        # Shared limits when several engines run in one process (see multi.py)
+        self.sup = get_supervisor()
+        self.encode_slots = encode_slots
+        self.host_limiter = host_limiter
+        self.session_suffix = session_suffix
+        self.tap = tap  # running StreamTap on stream_url: record from it instead of connecting
+        # What the capture ffmpeg connects to: the station, or a local re-stream of it (tap.TapServer).
+        self.source_url = (source_url or "").strip() or self.stream_url
+        self._own_tap = False
+
+        self.ffmpeg = (self.cfg.get("ffmpeg_path") or "").strip() or find_bin("ffmpeg")
+        self.ffprobe = (self.cfg.get("ffprobe_path") or "").strip() or find_bin("ffprobe")
+        self.out_dir = (self.cfg.get("output_path") or "").strip()
+        self.prefix = (self.cfg.get("filename_prefix") or "").strip() or "STROAD_Rec"
+        self.preset = self.cfg.get("selected_preset") or ""
+        self.total_sec = parse_time_string(self.cfg.get("total_time_str"))
+        self.chunk_sec = parse_time_string(self.cfg.get("chunk_time_str"))
+        self.fade_sec = safe_int(self.cfg.get("fade_duration"), default=0)
+        self.stall_sec = safe_int(self.cfg.get("stall_timeout_sec"), default=20)
+        self.connect_sec = safe_int(self.cfg.get("connect_timeout_sec"), default=30)
+        self.overlap_sec = max(0, safe_int(self.cfg.get("handover_overlap_sec"), default=0))
+        self.track_mode = (self.cfg.get("track_metadata") or "off").strip().lower()
+        self.silence_action = (self.cfg.get("silence_action") or "off").strip().lower()
+        self.silence_db = float(self.cfg.get("silence_threshold_db", -50))
+        self.silence_min_sec = float(self.cfg.get("silence_min_sec", 10))
+        self.silence_skip_ratio = float(self.cfg.get("silence_skip_ratio", 0.95))
+        self.extra_exts: List[str] = []  # extra output formats per chunk (set by validate)
+        self.peaks_on = str(self.cfg.get("waveform_peaks", "on")).strip().lower() not in ("off", "false", "0", "")
+        self.loudness_mode = (self.cfg.get("loudness") or "off").strip().lower()
+        self.loudness_target = float(self.cfg.get("loudness_target_lufs", -16))
+        self.loudness_max_gain = float(self.cfg.get("loudness_max_gain_db", 12))
+        self.loudness = None  # shared LoudnessProfiles (set by validate)
+
+        # --- Runtime state ---
+        self.is_running = False
+        self.stop_requested = False
+        self.user_stopped = False
+        self.current_process = None
+        self.spawned_at = None
+        self.manifest = None
+        self.session_id = None
+        self.status = "idle"
+        self.chunks_ok = 0
+        self.chunks_fail = 0
+        self.chunks_skipped = 0
+        self.queue_policy = (self.cfg.get("queue_policy") or "block").strip().lower()
+        self.job_q = JobQueue(max_jobs=safe_int(self.cfg.get("queue_max_jobs"), default=16), max_bytes=safe_int(self.cfg.get("queue_max_mb"), default=4096) << 20,
+                              policy=self.queue_policy if self.queue_policy in QUEUE_POLICIES else "block", on_drop=self._drop_job)
+        self.disk_min_mb = safe_int(self.cfg.get("disk_min_free_mb"), default=500)
+        self.disk_warn_mb = safe_int(self.cfg.get("disk_warn_free_mb"), default=2000)
+        self._disk_low = False
+        self.index_base = 0  # chunk numbers continue after this (resumed sessions)
+        self.capture_thread = None
+        self.process_thread = None
+        self._done = threading.Event()
+
+    def log(self, msg: str):
+        self.listener.log(log_line(msg))
+
+    # -------------------- Control --------------------
+    def validate(self) -> None:
+        if not self.ffmpeg or not os.path.exists(self.ffmpeg): raise ValueError("FFmpeg not found!")
+        if not self.out_dir or not os.path.isdir(self.out_dir): raise ValueError("Output folder does not exist.")
+        if not self.stream_url: raise ValueError("No stream URL.")
+        if self.total_sec <= 0 or self.chunk_sec <= 0: raise ValueError("Total time and chunk length must be > 0.")
+        if self.tap is not None and self.tap.url != self.stream_url: raise ValueError("Time-shift buffer is listening to a different stream.")
+        self.extra_exts = parse_extra_outputs(self.cfg.get("extra_outputs"), ".mp3" if "MP3" in self.cfg["output_format"] else ".m4a")
+        self._open_loudness()
+        if self.queue_policy not in QUEUE_POLICIES: raise ValueError(f"Unknown queue policy '{self.queue_policy}' (use {', '.join(QUEUE_POLICIES)}).")
+        free = self._free_mb()
+        if free < self.disk_min_mb: raise ValueError(f"Only {free} MB free in {self.out_dir} (disk_min_free_mb is {self.disk_min_mb}).")
+
+    def start(self) -> None:
+        self.validate()
+        # Rough need: 128 kbps captured, plus as much again for temp files and outputs.
+        need = self.total_sec * 32 // 1024 * (1 + len(self.extra_exts))
+        if self._free_mb() - need < self.disk_warn_mb: self.log(f"DISK: {self._free_mb()} MB free, this session may need about {need} MB.")
+        self.log(f"DEBUG: Parsed Total='{self.cfg['total_time_str']}'->{self.total_sec}s, Chunk='{self.cfg['chunk_time_str']}'->{self.chunk_sec}s")
+        self.chunks_ok = 0
+        self.chunks_fail = 0
+        self.chunks_skipped = 0
+        self.user_stopped = False
+        self.meta.reset_stats()
+        now = datetime.datetime.now()
+        self.session_id = now.strftime("%Y%m%d_%H%M%S")
+        if self.session_suffix: self.session_id += "_" + self.session_suffix
+        short_code = station_short_code(station_name=self.preset, preset_name=self.preset)
+
+        self.manifest = SessionManifest(
+            out_dir=self.out_dir, session_id=self.session_id, app_name=APP_NAME, app_version=APP_VERSION,
+            station_url=self.stream_url, preset_name=self.preset, short_code=short_code,
+            chunk_seconds=self.chunk_sec, tape_mode=False, output_format=self.cfg["output_format"],
+            capture_mode="Track split" if self.track_mode == "split" else "Shared tap" if self.tap else self.cfg["capture_mode"],
+            catalog=self._catalog(), total_seconds=self.total_sec, filename_prefix=self.prefix,
+        )
+        self.log(f"Session manifest: STROAD_Rec_{self.session_id}.session.json")
+        self.stop_requested = False
+        self.is_running = True
+        self.status = "recording"
+        self._done.clear()
+        self.listener.status("Starting pipeline…")
+        self.process_thread = threading.Thread(target=self.worker_process, daemon=True)
+        self.capture_thread = threading.Thread(target=self.worker_capture, daemon=True)
+        self.process_thread.start()
+        self.capture_thread.start()
+
+    def _catalog(self):
+        path = (self.cfg.get("catalog_path") or "").strip()
+        if path.lower() == "off": return None
+        return open_catalog(path or None)
+
+    def stop(self):
+        if not self.is_running: return
+        self.user_stopped = True
+        self.log("STOP requested...")
+        if self.manifest: self.manifest.event("stop_requested")
+        self.stop_requested = True
+        if self.current_process:
+            try: self.current_process.terminate()
+            except Exception: pass
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the session has finalized its manifest."""
+        return self._done.wait(timeout)
+
+    # -------------------- Recovery --------------------
+    def recover(self, plan: dict, resume: bool = False) -> None:
+        """
+        Finish a session whose process died (plan from recovery.plan_recovery):
+        its captured-but-unsaved chunks and partial captures go through
+        worker_process into the same manifest; with `resume`, the rest of the
+        planned time is recorded under the same session id.
+        """
+        if not self.ffmpeg or not os.path.exists(self.ffmpeg): raise ValueError("FFmpeg not found!")
+        self.extra_exts = parse_extra_outputs(self.cfg.get("extra_outputs"), ".mp3" if "MP3" in self.cfg["output_format"] else ".m4a")
+        self._open_loudness()
+        self.out_dir = plan["folder"]
+        if self._free_mb() < self.disk_min_mb: raise ValueError(f"Only {self._free_mb()} MB free in {self.out_dir} (disk_min_free_mb is {self.disk_min_mb}).")
+        self.session_id = plan["session_id"]
+        self.chunks_ok = plan["saved"]
+        self.chunks_fail = 0
+        self.chunks_skipped = 0
+        self.user_stopped = False
+        self.meta.reset_stats()
+        self.index_base = plan["next_index"] - 1
+        self.total_sec = plan["remaining_seconds"] if resume and self.stream_url and self.chunk_sec > 0 else 0
+        if self.total_sec < 5: self.total_sec = 0
+
+        self.manifest = SessionManifest.reopen(plan["path"], catalog=self._catalog())
+        self.manifest.event("recovered", pending=len(plan["jobs"]), partial=len(plan["fragments"]), removed=len(plan["junk"]), lost=plan["lost"], resume_seconds=self.total_sec)
+        self.log("RECOVERY %s: %d chunk(s) to save, %d partial capture(s), %d leftover(s) to remove%s." % (
+            self.session_id, len(plan["jobs"]), len(plan["fragments"]), len(plan["junk"]), f", resuming for {fmt_mmss(self.total_sec)}" if self.total_sec else ""))
+        if plan["lost"]: self.log(f"RECOVERY: chunk(s) {', '.join(map(str, plan['lost']))} captured but their files are gone.")
+        for p in plan["junk"]:
+            try: os.remove(p)
+            except OSError: pass
+        self.stop_requested = False
+        self.is_running = True
+        self.status = "recording"
+        self._done.clear()
+        self.listener.status("Recovering…")
+        self.process_thread = threading.Thread(target=self.worker_process, daemon=True)
+        self.capture_thread = threading.Thread(target=self._worker_recover, args=(plan,), daemon=True)
+        self.process_thread.start()
+        self.capture_thread.start()
+
+    def _worker_recover(self, plan: dict):
+        resumed = False
+        try:
+            for job in plan["jobs"]:
+                self.job_q.put(job)  # journaled before the crash
+                self.log(f"ENQUEUED: {os.path.basename(job['final_file'])} (recovered)")
+            frags = plan["fragments"]
+            for n, frag in enumerate(frags, start=1):
+                job = self._fragment_job(plan, frag, n, len(frags))
+                if job is None: continue
+                self._enqueue(job)
+                self.log(f"ENQUEUED: {os.path.basename(job['final_file'])} (partial capture, {fmt_mmss(job['actual_seconds'])})")
+            self.index_base += len(frags)
+            if self.total_sec > 0 and not self.stop_requested:
+                self.log(f"RECOVERY: resuming capture from chunk {self.index_base + 1}.")
+                resumed = True
+                self.worker_capture()
+        except Exception as e:
+            self.log(f"RECOVERY ERROR: {e}")
+            if self.manifest: self.manifest.error(f"Recovery: {e}")
+        finally:
+            if not resumed: self.job_q.put(None)
+
+    def _fragment_job(self, plan: dict, frag: dict, n: int, count: int) -> Optional[dict]:
+        # The chunk that was being captured at the crash: keep what made it to disk.
+        parts = frag["parts"]
+        temp_file = parts[0]
+        if len(parts) > 1 and not self._join_parts(self.ffmpeg, parts, temp_file): return None
+        start_dt, end_dt, length = fragment_times(plan, frag["mtime"], ffprobe_duration(self.ffprobe, temp_file))
+        if length < 1:
+            os.remove(temp_file)
+            return None
+        out_ext = ".mp3" if "MP3" in self.cfg["output_format"] else ".m4a"
+        final_file = self._final_path(self.out_dir, self.prefix, start_dt.strftime("%Y%m%d_%H%M%S"), n, out_ext)
+        return {"i": n, "num_chunks": count, "dur": self.chunk_sec or int(length), "actual_seconds": round(length, 3), "capture": {"recovered": True, "partial": True}, "start_iso": start_dt.astimezone().isoformat(timespec="seconds"), "end_iso": end_dt.astimezone().isoformat(timespec="seconds"), "temp_file": temp_file, "final_file": final_file, "album": plan["album"], "url": self.stream_url, "preset": self.preset, "artist": self.prefix, "title": fmt_title_range(start_dt, int(round(length))), "year": start_dt.year}
+
+    # -------------------- Capture Workers --------------------
+    def _stderr_tail(self, lines: List[str], max_lines: int = 12) -> List[str]:
+        if not lines: return []
+        return lines[-max_lines:]
+
+    def _looks_like_transient_http(self, stderr_text: str) -> bool:
+        t = (stderr_text or "").lower()
+        return any(n in t for n in ["http error 503", "server returned 5xx", "error opening input", "service unavailable", "connection refused", "connection reset", "timed out", "temporary failure"])
+
+    def _run_capture_ffmpeg_with_progress(self, ffmpeg: str, stream_url: str, dur: float, temp_file: str, offset: float = 0.0, chunk_dur: Optional[int] = None) -> Tuple[int, str, dict]:
+        # offset/chunk_dur: where this run resumes inside the chunk (after a stall)
+        cmd = chunk_capture_cmd(ffmpeg, self.source_url, int(round(dur)), temp_file)
+        total = chunk_dur or int(round(dur))
+        def on_tick(elapsed, snap):
+            done = snap["out_time"] if snap["out_time"] > 0 else elapsed
+            self._show_chunk_time(int(offset + done), total)
+        return self._run_ffmpeg_until(cmd, dur, on_tick)
+
+    def _run_ffmpeg_until(self, cmd: List[str], max_seconds: float, on_tick: Callable[[int, dict], None]) -> Tuple[int, str, dict]:
+        if self.host_limiter is None:
+            return self._run_ffmpeg_until_unlimited(cmd, max_seconds, on_tick)
+        # Every capture run is one upstream connection; wait for a per-host slot.
+        with self.host_limiter.slot(self.stream_url, lambda: self.stop_requested) as ok:
+            if not ok: return (-1, "stopped while waiting for a connection slot", {})
+            return self._run_ffmpeg_until_unlimited(cmd, max_seconds, on_tick)
+
+    def _run_ffmpeg_until_unlimited(self, cmd: List[str], max_seconds: float, on_tick: Callable[[int, dict], None]) -> Tuple[int, str, dict]:
+        self.spawned_at = datetime.datetime.now()
+        # The supervisor reads stderr plus the -progress stream on stdout and
+        # enforces the deadline; we wake once a second for progress/stall checks.
+        prog = ProgressReader()
+        child = self.sup.spawn(cmd, timeout=max_seconds + 2.0, on_stdout_line=prog.feed)
+        self.current_process = child
+        start = time.monotonic()
+        elapsed = 0
+        stalled = no_connect = False
+        try:
+            while True:
+                if self.stop_requested: child.terminate()
+                on_tick(elapsed, prog.snapshot)
+                # Connection setup (DNS, TLS, HLS playlist) has its own limit; the stall clock starts with the first data.
+                if not no_connect and self.connect_sec > 0 and prog.connecting_for() > self.connect_sec:
+                    no_connect = True
+                    self.log(f"CAPTURE: no audio {prog.connecting_for():.0f}s after connecting, dropping connection.")
+                    child.terminate()
+                if not stalled and self.stall_sec > 0 and prog.stalled_for() > self.stall_sec:
+                    stalled = True
+                    self.log(f"CAPTURE: no data for {prog.stalled_for():.0f}s, dropping connection.")
+                    child.terminate()
+                res = child.wait(timeout=max(0.0, start + elapsed + 1 - time.monotonic()))
+                if res is not None: break
+                elapsed += 1
+        finally:
+            self.current_process = None
+        stats = prog.stats()
+        stats["stalled"] = stalled
+        stats["connect_timeout"] = no_connect
+        stats["origin"] = prog.snapshot["origin"]
+        return (res.returncode, res.stderr, stats)
+
+    def _show_chunk_time(self, elapsed: int, dur: int):
+        self.listener.chunk_time(min(dur, max(0, elapsed)), dur)
+
+    def _temp_path(self, out_dir: str, ext: str) -> str:
+        # Named after the session so crash recovery can tell whose leftovers these are.
+        return os.path.join(out_dir, "stroad_raw_%s_%s%s" % (self.session_id, uuid.uuid4().hex[:8], ext))
+
+    def _final_path(self, out_dir: str, prefix: str, ts: str, i: int, out_ext: str) -> str:
+        return os.path.join(out_dir, "%s_%s_%03d%s" % (prefix, ts, self.index_base + i, out_ext))
+
+    def _enqueue(self, job: dict) -> None:
+        job["i"] += self.index_base
+        job["num_chunks"] += self.index_base
+        # Journaled so a chunk captured but not yet saved survives a crash (see recovery.py).
+        job["temp_bytes"] = os.path.getsize(job["temp_file"]) if job.get("temp_file") and os.path.exists(job["temp_file"]) else 0
+        if self.manifest: self.manifest.event("chunk_captured", job={k: os.path.basename(v) if k in ("temp_file", "final_file") and v else v for k, v in job.items()})
+        waited = self.job_q.put(job)
+        if waited >= 1: self.log(f"CAPTURE: waited {waited:.1f}s for the encode backlog ({self.job_q.pending()} chunks pending).")
+        if job.get("copy_only"): self.log(f"CAPTURE {job['i']}: encode backlog full, chunk will be saved as captured (no encode).")
+
+    # -------------------- Loudness --------------------
+    def _open_loudness(self) -> None:
+        if self.loudness_mode not in LOUDNESS_MODES: raise ValueError(f"Unknown loudness mode '{self.loudness_mode}' (use {', '.join(LOUDNESS_MODES)}).")
+        if self.loudness_mode != "off": self.loudness = get_profiles((self.cfg.get("loudness_profile_path") or "").strip() or None)
+
+    def _loudness_gain(self, url: str) -> float:
+        # The station's profile from earlier chunks, so every chunk is one pass with a stable gain.
+        if self.loudness_mode != "normalize" or not self.loudness: return 0.0
+        return self.loudness.gain(url, self.loudness_target, self.loudness_max_gain) or 0.0
+
+    def _loudness_done(self, job: dict, stderr_lines: List[str], gain: float, seconds: Optional[float]) -> None:
+        # ebur128 measured the encoded audio (after gain and fade); the profile keeps the station's own level.
+        m = parse_summary(stderr_lines)
+        if not m:
+            self.log(f"PROCESS {job['i']}: no loudness summary from ffmpeg.")
+            return
+        src = {"integrated_lufs": round(m["integrated_lufs"] - gain, 2), "lra_lu": m.get("lra_lu"),
+               "true_peak_dbtp": round(m["true_peak_dbtp"] - gain, 2) if m.get("true_peak_dbtp") is not None else None}
+        job['loudness'] = dict(src, gain_db=gain, output_lufs=m["integrated_lufs"], output_true_peak_dbtp=m.get("true_peak_dbtp"))
+        if self.loudness_mode == "normalize": job['loudness']["target_lufs"] = self.loudness_target
+        self.loudness.add(job['url'], src, seconds or job.get('actual_seconds') or 0)
+
+    def _drop_job(self, job: dict) -> None:
+        # drop-oldest policy: called from the producer thread, outside the queue lock.
+        i = job["i"]
+        if job.get("temp_file"):
+            try: os.remove(job["temp_file"])
+            except OSError: pass
+        self.chunks_fail += 1
+        self.log(f"PROCESS {i} DROPPED: encode backlog full ({self.job_q.policy}).")
+        if self.manifest: self.manifest.error(f"Dropped chunk {i}: encode backlog full", details={"policy": self.job_q.policy, "bytes": job.get("temp_bytes", 0)})
+
+    # -------------------- Disk --------------------
+    def _free_mb(self) -> int:
+        try: return shutil.disk_usage(self.out_dir).free >> 20
+        except OSError: return 1 << 30  # unknown: don't block on it
+
+    def _chunk_started(self, i: int, num_chunks: int, dur: int) -> None:
+        # Watermarks are checked before every chunk: warn once when free space
+        # drops under disk_warn_free_mb, stop capturing under disk_min_free_mb.
+        free = self._free_mb()
+        if free < self.disk_min_mb:
+            self.log(f"DISK: only {free} MB free, stopping capture (disk_min_free_mb {self.disk_min_mb}).")
+            if self.manifest: self.manifest.error("Disk full: capture stopped", details={"free_mb": free, "pending_jobs": self.job_q.pending()})
+            self.stop_requested = True
+            if self.current_process:
+                try: self.current_process.terminate()
+                except Exception: pass
+            return
+        if (free < self.disk_warn_mb) != self._disk_low:
+            self._disk_low = free < self.disk_warn_mb
+            self.log(f"DISK: {free} MB free" + (f" (below {self.disk_warn_mb} MB)." if self._disk_low else ", back above the warning level."))
+            if self.manifest: self.manifest.event("disk_low" if self._disk_low else "disk_ok", free_mb=free)
+        self.listener.chunk_started(i, num_chunks, dur)
+
+    def _capture_per_chunk(self, ffmpeg: str, stream_url: str, out_dir: str, prefix: str, total_sec: int, chunk_sec: int, num_chunks: int):
+        direct = is_single_pass(self.cfg["capture_mode"])
+        for i in range(1, num_chunks + 1):
+            if self.stop_requested: break
+            dur = chunk_sec
+            if i == num_chunks:
+                rem = total_sec % chunk_sec
+                if rem > 0: dur = rem
+            start_dt = datetime.datetime.now()
+            start_iso = start_dt.astimezone().isoformat(timespec="seconds")
+            title_range = fmt_title_range(start_dt, dur)
+            # Tags come from the background prober; never wait on it here.
+            self.meta.request(self.ffprobe, stream_url)
+            station = station_name_from_tags(self.meta.get(stream_url) or {}, self.preset)
+            temp_file = self._temp_path(out_dir, ".mka")
+            ts = start_dt.strftime("%Y%m%d_%H%M%S")
+            out_ext = ".mp3" if "MP3" in self.cfg["output_format"] else ".m4a"
+            final_file = self._final_path(out_dir, prefix, ts, i, out_ext)
+            self._chunk_started(i, num_chunks, dur)
+            self.log("CAPTURE %d/%d: %ds | album='%s' | title='%s'" % (i, num_chunks, dur, station, title_range))
+
+            if direct:
+                job, fallback = self._capture_chunk_direct(ffmpeg, stream_url, i, num_chunks, dur, start_dt, station, title_range, final_file, prefix)
+                if fallback:
+                    direct = False
+                    self.log("PIPELINE: switching to two-stage capture (temp file + encoder pool).")
+                    if self.manifest: self.manifest.event("pipeline_fallback", chunk=i)
+                if job is not None:
+                    self._enqueue(job)
+                    self.log(f"ENQUEUED: {os.path.basename(final_file)} (encoded)")
+                    continue
+                if self.stop_requested: break
+                if not fallback: continue
+                # The encoder failed outright: capture this chunk the two-stage way.
+
+            # Retry loop. A stalled or dropped connection resumes into a new
+            # part for the rest of the chunk instead of starting over.
+            max_retries = 3
+            parts: List[str] = []
+            runs: List[dict] = []
+            got = 0.0
+            rc = -1
+            err = ""
+            attempt = 0
+            while attempt <= max_retries:
+                if self.stop_requested: break
+                if attempt > 0:
+                    wait = [1, 2, 4][min(attempt-1, 2)]
+                    self.log(f"CAPTURE retry {attempt}/{max_retries} after {wait}s" + (f", resuming at {fmt_mmss(got)}..." if parts else "..."))
+                    if self.manifest: self.manifest.event("retry_connect", chunk=i, attempt=attempt, resume_at=round(got, 3))
+                    time.sleep(wait)
+                part = temp_file if not parts else "%s.part%d.mka" % (temp_file[:-4], len(parts))
+                if os.path.exists(part): os.remove(part)
+                want = dur - got
+                rc, err, st = self._run_capture_ffmpeg_with_progress(ffmpeg, stream_url, want, part, offset=got, chunk_dur=dur)
+                runs.append(st)
+                if os.path.exists(part) and os.path.getsize(part) > 0:
+                    parts.append(part)
+                    # Without progress output (very old ffmpeg) assume the run covered what was asked.
+                    got += st.get("out_seconds") or (want if not st.get("stalled") else 0.0)
+                if self.stop_requested: break
+                if parts and (dur - got < 1 or (rc == 0 and not st.get("stalled"))): break
+                if not (st.get("stalled") or st.get("connect_timeout") or self._looks_like_transient_http(err) or (parts and rc != 0)): break
+                attempt += 1
+
+            ok_temp = sum(os.path.getsize(p) for p in parts if os.path.exists(p)) >= 20000
+            if ok_temp and len(parts) > 1:
+                ok_temp = self._join_parts(ffmpeg, parts, temp_file)
+            if self.stop_requested:
+                for p in parts + [temp_file]:
+                    if os.path.exists(p): os.remove(p)
+                break
+            if not ok_temp:
+                self.log("CAPTURE FAILED. Stderr tail:")
+                for l in self._stderr_tail(err.splitlines()): self.log("  "+l)
+                self.chunks_fail += 1
+                if self.manifest: self.manifest.error(f"Capture failed chunk {self.index_base + i}", exit_code=rc)
+                for p in parts + [temp_file]:
+                    if os.path.exists(p): os.remove(p)
+                continue
+
+            end_dt = datetime.datetime.now()
+            capture = {
+                "connections": len(runs),
+                "parts": len(parts),
+                "stalls": sum(1 for r in runs if r.get("stalled")),
+                "bytes_in": sum(r.get("bytes_in") or 0 for r in runs),
+                "avg_kbps": round(sum(r.get("bytes_in") or 0 for r in runs) * 8 / 1000 / got, 1) if got > 0 else None,
+                "speed": runs[-1].get("speed") if runs else None,
+                "longest_stall_seconds": max((r.get("longest_stall_seconds") or 0 for r in runs), default=0),
+            }
+            job = {"i": i, "num_chunks": num_chunks, "dur": dur, "actual_seconds": round(got, 3) if got > 0 else float(dur), "capture": capture, "start_iso": start_iso, "end_iso": end_dt.astimezone().isoformat(timespec="seconds"), "temp_file": temp_file, "final_file": final_file, "album": station, "url": stream_url, "preset": self.preset, "artist": prefix, "title": title_range, "year": start_dt.year}
+            self._enqueue(job)
+            self.log(f"ENQUEUED: {os.path.basename(final_file)}")
+
+    def _capture_chunk_direct(self, ffmpeg: str, stream_url: str, i: int, num_chunks: int, dur: int, start_dt, station: str, title_range: str, final_file: str, prefix: str) -> Tuple[Optional[dict], bool]:
+        """
+        Single-pass chunk: ffmpeg encodes while audio arrives, fading from the
+        planned length. Returns (job, fallback); fallback asks the caller to
+        use the two-stage path from here on.
+        """
+        tags = {"album": station, "artist": prefix, "title": title_range, "date": start_dt.year}
+        gain = self._loudness_gain(stream_url)
+        af = fade_filter(self.fade_sec, dur)
+        if gain: af = f"volume={gain:+.2f}dB,{af}"
+        # Peaks / silence come from a PCM side branch written next to the chunk (stdout carries -progress).
+        pcm_file = self._temp_path(os.path.dirname(final_file), ".pcm") if self._pcm_wanted() else None
+        cmd = direct_capture_cmd(ffmpeg, self.source_url, dur, final_file, af, tags, pcm_file=pcm_file)
+        max_retries = 3
+        ok = False
+        rc, err, st = -1, "", {}
+        attempt = 0
+        while attempt <= max_retries:
+            if attempt > 0:
+                wait = [1, 2, 4][min(attempt-1, 2)]
+                self.log(f"CAPTURE retry {attempt}/{max_retries} after {wait}s...")
+                if self.manifest: self.manifest.event("retry_connect", chunk=i, attempt=attempt)
+                time.sleep(wait)
+            if self.stop_requested: break
+            if os.path.exists(final_file): os.remove(final_file)
+            rc, err, st = self._run_ffmpeg_until(cmd, dur, lambda e, snap: self._show_chunk_time(int(snap["out_time"] or e), dur))
+            ok = os.path.exists(final_file) and os.path.getsize(final_file) >= 20000
+            if ok or self.stop_requested: break
+            if not (st.get("stalled") or st.get("connect_timeout") or self._looks_like_transient_http(err)):
+                # Not a network problem (missing encoder, bad filter...): let the two-stage path try.
+                self.log(f"CAPTURE {i}: single-pass encode failed (exit {rc}). Stderr tail:")
+                for l in self._stderr_tail(err.splitlines()): self.log("  "+l)
+                for p in (final_file, pcm_file):
+                    if p and os.path.exists(p): os.remove(p)
+                return None, True
+            attempt += 1
+        if self.stop_requested or not ok:
+            for p in (final_file, pcm_file):
+                if p and os.path.exists(p): os.remove(p)
+            if not self.stop_requested:
+                self.log("CAPTURE FAILED. Stderr tail:")
+                for l in self._stderr_tail(err.splitlines()): self.log("  "+l)
+                self.chunks_fail += 1
+                if self.manifest: self.manifest.error(f"Capture failed chunk {self.index_base + i}", exit_code=rc)
+            return None, False
+
+        got = st.get("out_seconds") or float(dur)
+        if got < dur - 1: self.log(f"CAPTURE {i}: stream ended at {fmt_mmss(got)} of {fmt_mmss(dur)}; no fade-out at the cut.")
+        speed = st.get("speed")
+        # -re reads in real time, so speed below ~1x means the encoder is the bottleneck.
+        slow = speed is not None and speed < 0.95
+        if slow: self.log(f"CAPTURE {i}: single-pass encode ran at {speed:.2f}x real time.")
+        end_dt = datetime.datetime.now()
+        capture = {"pipeline": "single-pass", "connections": attempt + 1, "stalls": 1 if st.get("stalled") else 0, "avg_kbps": st.get("avg_kbps"), "speed": speed, "longest_stall_seconds": st.get("longest_stall_seconds")}
+        job = {"i": i, "num_chunks": num_chunks, "dur": dur, "actual_seconds": round(got, 3), "capture": capture, "encoded": True, "loudness": {"gain_db": gain, "target_lufs": self.loudness_target} if gain else None, "start_iso": start_dt.astimezone().isoformat(timespec="seconds"), "end_iso": end_dt.astimezone().isoformat(timespec="seconds"), "temp_file": None, "pcm_file": pcm_file, "final_file": final_file, "album": station, "url": stream_url, "preset": self.preset, "artist": prefix, "title": title_range, "year": start_dt.year}
+        return job, slow
+
+    def _capture_handover(self, ffmpeg: str, stream_url: str, out_dir: str, prefix: str, total_sec: int, chunk_sec: int, num_chunks: int):
+        # Overlapping handover: chunk i+1 connects `overlap` seconds before
+        # chunk i is due to end, both keep recording past the boundary, and
+        # each chunk is trimmed at a cut point inside the overlap. Times are
+        # on the monotonic clock; a chunk's "origin" is when its audio began.
+        ov = float(self.overlap_sec)
+        durs = [chunk_sec] * num_chunks
+        if total_sec % chunk_sec: durs[-1] = total_sec % chunk_sec
+        out_ext = ".mp3" if "MP3" in self.cfg["output_format"] else ".m4a"
+        mono0, wall0 = time.monotonic(), datetime.datetime.now()
+        runs = {}
+        enqueued = set()
+        sched = {"B": None}  # origin of chunk 1; chunk i is due at B + sum(durs[:i-1])
+
+        def due(i):
+            return sched["B"] + sum(durs[:i-1])
+
+        def capture(r):
+            def on_tick(elapsed, snap):
+                if r["origin"] is None: r["origin"] = snap["origin"]
+            cmd = chunk_capture_cmd(ffmpeg, self.source_url, int(r["length"] + 0.999), r["temp_file"])
+            rc, err, st = self._run_ffmpeg_until(cmd, r["length"], on_tick)
+            r.update(rc=rc, err=err, stats=st, origin=st.get("origin") or r["origin"], done=True)
+
+        def launch(i):
+            now = time.monotonic()
+            # Record until the next boundary is covered by `ov` (chunk 1 starts the schedule).
+            length = durs[0] + ov if i == 1 else due(i + 1) + ov - now
+            r = {"i": i, "length": max(1.0, length), "origin": None, "done": False, "launched": now,
+                 "temp_file": self._temp_path(out_dir, ".mka")}
+            self.meta.request(self.ffprobe, stream_url)
+            r["station"] = station_name_from_tags(self.meta.get(stream_url) or {}, self.preset)
+            r["thread"] = threading.Thread(target=capture, args=(r,), daemon=True)
+            runs[i] = r
+            r["thread"].start()
+            self.log("CAPTURE %d/%d: connecting (%s incl. overlap) | album='%s'" % (i, num_chunks, fmt_mmss(r["length"]), r["station"]))
+
+        def finish(i):
+            r, nr = runs[i], runs.get(i + 1)
+            st = r.get("stats") or {}
+            origin = r["origin"]
+            ok = origin is not None and os.path.exists(r["temp_file"]) and os.path.getsize(r["temp_file"]) >= 20000
+            end = origin + (st.get("out_seconds") or 0.0) if ok else None
+            if ok and self.stop_requested and (sched["B"] is None or end < due(i + 1) - 1):
+                ok = False  # cut short by STOP; discarded like in per-chunk mode
+            start_cut = r.get("cut_start", origin)
+            end_cut = min(end, due(i + 1)) if ok else end
+            if nr is not None and (nr["origin"] is not None or nr["done"]):
+                ns, k = nr["origin"], due(i + 1)
+                if ok and ns is not None and ns < end:
+                    # Both connections cover [ns, end]: cut at the planned boundary if it is inside.
+                    cut = min(max(k, ns), end)
+                    overlap, gap = end - ns, 0.0
+                    end_cut = nr["cut_start"] = cut
+                else:
+                    cut = None
+                    overlap, gap = 0.0, (ns - end if ok and ns is not None else None)
+                    end_cut = end
+                    nr["cut_start"] = ns
+                nr["boundary"] = {"overlap_seconds": round(overlap, 3), "gap_seconds": round(gap, 3) if gap is not None else None,
+                                  "cut_offset_seconds": round(cut - k, 3) if cut is not None else None}
+                self.log("HANDOVER %d->%d: overlap %.2fs, gap %s" % (i, i + 1, overlap, "%.2fs" % gap if gap is not None else "n/a"))
+                if self.manifest: self.manifest.event("handover", chunk=i + 1, **nr["boundary"])
+            if self.stop_requested or not ok:
+                if not self.stop_requested:
+                    self.log(f"CAPTURE {i} FAILED. Stderr tail:")
+                    for l in self._stderr_tail((r.get("err") or "").splitlines()): self.log("  "+l)
+                    self.chunks_fail += 1
+                    if self.manifest: self.manifest.error(f"Capture failed chunk {self.index_base + i}", exit_code=r.get("rc"))
+                try: os.remove(r["temp_file"])
+                except OSError: pass
+                return
+            ss = max(0.0, start_cut - origin)
+            length = max(0.0, end_cut - max(start_cut, origin))
+            start_dt = wall0 + datetime.timedelta(seconds=max(start_cut, origin) - mono0)
+            end_dt = start_dt + datetime.timedelta(seconds=length)
+            final_file = self._final_path(out_dir, prefix, start_dt.strftime("%Y%m%d_%H%M%S"), i, out_ext)
+            capture = {"connections": 1, "stalls": 1 if st.get("stalled") else 0, "bytes_in": st.get("bytes_in"), "avg_kbps": st.get("avg_kbps"),
+                       "speed": st.get("speed"), "longest_stall_seconds": st.get("longest_stall_seconds"),
+                       "handover": dict(r.get("boundary") or {}, connect_seconds=round(origin - r["launched"], 3), trim_start=round(ss, 3))}
+            job = {"i": i, "num_chunks": num_chunks, "dur": durs[i-1], "actual_seconds": round(length, 3), "capture": capture, "trim": (ss, length), "start_iso": start_dt.astimezone().isoformat(timespec="seconds"), "end_iso": end_dt.astimezone().isoformat(timespec="seconds"), "temp_file": r["temp_file"], "final_file": final_file, "album": r["station"], "url": stream_url, "preset": self.preset, "artist": prefix, "title": fmt_title_range(start_dt, int(round(length))), "year": start_dt.year}
+            enqueued.add(r["temp_file"])
+            self._enqueue(job)
+            self.log(f"ENQUEUED: {os.path.basename(final_file)} ({length:.2f}s)")
+
+        launch(1)
+        nxt, fin, shown = 2, 1, 0
+        try:
+            while fin <= num_chunks and not self.stop_requested:
+                now = time.monotonic()
+                if sched["B"] is None:
+                    # The schedule starts when chunk 1's audio does (or now, if it never came).
+                    if runs[1]["origin"] is not None: sched["B"] = runs[1]["origin"]
+                    elif runs[1]["done"]: sched["B"] = now
+                if sched["B"] is not None and nxt <= num_chunks and (now >= due(nxt) - ov or runs[nxt - 1]["done"]):
+                    if runs[nxt - 1]["done"] and now < due(nxt) - ov:
+                        self.log(f"CAPTURE {nxt - 1}: connection ended early, connecting chunk {nxt} now.")
+                    launch(nxt)
+                    nxt += 1
+                r = runs.get(fin)
+                if r and r["done"]:
+                    nr = runs.get(fin + 1)
+                    if fin == num_chunks or (nr is not None and (nr["origin"] is not None or nr["done"])):
+                        finish(fin)
+                        fin += 1
+                        continue
+                if sched["B"] is not None:
+                    cur = max([j for j in runs if due(j) <= now] or [1])
+                    if cur != shown:
+                        shown = cur
+                        self._chunk_started(cur, num_chunks, durs[cur-1])
+                    self._show_chunk_time(int(now - due(cur)), durs[cur-1])
+                time.sleep(0.25)
+        finally:
+            for r in runs.values():
+                r["thread"].join()
+            # Chunks that were complete before STOP are still kept.
+            while self.stop_requested and fin < nxt:
+                finish(fin)
+                fin += 1
+            for r in runs.values():
+                if r["temp_file"] not in enqueued and os.path.exists(r["temp_file"]):
+                    try: os.remove(r["temp_file"])
+                    except OSError: pass
+
+    def _capture_from_tap(self, out_dir: str, prefix: str, total_sec: int, chunk_sec: int, num_chunks: int):
+        # Chunks are cut from the tap's ring buffer on arrival time: chunk 1
+        # starts with the time-shift history, the rest follow on the same
+        # connection with no gap. Ring data is written out as memoryviews;
+        # a slice the live stream overwrote during the write is truncated
+        # back out of the file and counted in lost_bytes (see copy_out).
+        # In "split" mode a StreamTitle change ends the chunk early (chunk_sec
+        # stays the upper bound); the cut is in the captured TS, so every track
+        # is still encoded exactly once.
+        tap, ring = self.tap, self.tap.ring
+        split = self.track_mode == "split"
+        out_ext = ".mp3" if "MP3" in self.cfg["output_format"] else ".m4a"
+        mono0, wall0 = time.monotonic(), datetime.datetime.now()
+        pos = tap.record_start()
+        preroll = max(0.0, mono0 - ring.time_at(pos))
+        if preroll >= 1:
+            self.log(f"CAPTURE (tap): starting {fmt_mmss(preroll)} back in the time-shift buffer.")
+            if self.manifest: self.manifest.event("timeshift_flush", seconds=round(preroll, 3), bytes=ring.end - pos)
+        else:
+            preroll = 0.0
+            self.log("CAPTURE (tap): recording from the shared connection.")
+        if split: self.log(f"CAPTURE (tap): cutting at track changes (min {MIN_TRACK_SEC}s, max {chunk_sec}s).")
+        boundary, session_end, i = mono0, mono0 + total_sec, 0
+        while session_end - boundary >= 1 and not self.stop_requested:
+            i += 1
+            deadline = min(boundary + chunk_sec, session_end)
+            dur = int(round(deadline - boundary))
+            if split: num_chunks = i - 1 + math.ceil((session_end - boundary) / chunk_sec)
+            back = preroll if i == 1 else 0.0
+            chunk_t0 = boundary - back
+            start_dt = wall0 + datetime.timedelta(seconds=chunk_t0 - mono0)
+            self.meta.request(self.ffprobe, self.stream_url)
+            station = station_name_from_tags(self.meta.get(self.stream_url) or {}, self.preset)
+            temp_file = self._temp_path(out_dir, ".ts")
+            final_file = self._final_path(out_dir, prefix, start_dt.strftime("%Y%m%d_%H%M%S"), i, out_ext)
+            self._chunk_started(i, num_chunks, dur)
+            self.log("CAPTURE %d/%d: %ds%s | album='%s'" % (i, num_chunks, dur, f" + {back:.0f}s buffered" if back else "", station))
+            first, lost, cut = pos, 0, None
+            fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+            try:
+                while not self.stop_requested:
+                    now = time.monotonic()
+                    if split and cut is None:
+                        changes = tap.titles.track_changes(chunk_t0 + MIN_TRACK_SEC, deadline)
+                        if changes:
+                            cut = deadline = changes[0][0]
+                            dur = max(1, int(round(deadline - boundary)))  # planned length is now the track's
+                            self.log(f"CAPTURE {i}: track change -> '{changes[0][1]}'")
+                    limit = ring.offset_at(deadline) if now >= deadline else None
+                    pos, n = ring.write_to(fd, pos, limit)
+                    lost += n
+                    self._show_chunk_time(int(now - boundary), dur)
+                    if limit is not None and pos >= limit: break
+            finally:
+                os.close(fd)
+            boundary = deadline
+            if self.stop_requested:
+                os.remove(temp_file)
+                break
+            if lost: self.log(f"CAPTURE {i}: fell behind the tap, {lost} bytes lost.")
+            if pos - first < 20000:
+                self.log(f"CAPTURE {i} FAILED: only {pos - first} bytes from the tap.")
+                self.chunks_fail += 1
+                if self.manifest: self.manifest.error(f"Capture failed chunk {self.index_base + i}", details={"source": "tap", "bytes": pos - first})
+                os.remove(temp_file)
+                continue
+            length = deadline - chunk_t0
+            end_dt = wall0 + datetime.timedelta(seconds=deadline - mono0)
+            capture = {"source": "tap", "bytes_in": pos - first, "lost_bytes": lost, "avg_kbps": round((pos - first) * 8 / 1000 / length, 1), "upstream_connections": tap.connects}
+            if back: capture["timeshift_seconds"] = round(back, 3)
+            cues = tap.titles.cues(chunk_t0, deadline) if self.track_mode != "off" else []
+            artist, title = prefix, fmt_title_range(start_dt, int(round(length)))
+            if split and cues and not cues[0]["offset"]:
+                track_artist, track_title = split_title(cues[0]["title"])
+                artist, title = track_artist or prefix, track_title or title
+            job = {"i": i, "num_chunks": num_chunks, "dur": dur, "actual_seconds": round(length, 3), "capture": capture, "start_iso": start_dt.astimezone().isoformat(timespec="seconds"), "end_iso": end_dt.astimezone().isoformat(timespec="seconds"), "temp_file": temp_file, "final_file": final_file, "album": station, "url": self.stream_url, "preset": self.preset, "artist": artist, "title": title, "year": start_dt.year}
+            if cues: job["cues"] = cues
+            self._enqueue(job)
+            self.log(f"ENQUEUED: {os.path.basename(final_file)}" + (f" ({len(cues)} cue{'s' if len(cues) != 1 else ''})" if cues else ""))
+
+    def _join_parts(self, ffmpeg: str, parts: List[str], temp_file: str) -> bool:
+        """Stream-copy the parts of a resumed chunk into temp_file."""
+        list_file = temp_file[:-4] + ".parts.txt"
+        joined = temp_file[:-4] + ".joined.mka"
+        write_concat_list(parts, list_file)
+        res = self.sup.run(concat_cmd(ffmpeg, list_file, joined))
+        try: os.remove(list_file)
+        except OSError: pass
+        if res.returncode != 0 or not os.path.exists(joined):
+            self.log(f"CAPTURE: joining {len(parts)} parts failed; keeping the first part only.")
+            for p in parts[1:]:
+                if os.path.exists(p): os.remove(p)
+            return os.path.exists(parts[0]) and os.path.getsize(parts[0]) >= 20000
+        for p in parts:
+            if os.path.exists(p): os.remove(p)
+        os.replace(joined, temp_file)
+        return True
+
+    def _capture_segmented(self, ffmpeg: str, stream_url: str, out_dir: str, prefix: str, total_sec: int, chunk_sec: int, num_chunks: int):
+        # Gapless mode: one long-lived ffmpeg cuts the stream with the segment
+        # muxer; finished segments are picked up from its CSV list and queued.
+        base = self._temp_path(out_dir, "")
+        pattern = base + "_%05d.mka"
+        list_file = base + ".segments.csv"
+        out_ext = ".mp3" if "MP3" in self.cfg["output_format"] else ".m4a"
+        last_dur = total_sec % chunk_sec or chunk_sec
+        state = {"next_i": 1, "captured": 0.0, "runs": 0}
+        enqueued = set()
+        shown = [0]
+        max_retries = 3
+        attempt = 0
+        rc, err = -1, ""
+
+        def collect(entries, seen, station):
+            # Segment times are relative to when ffmpeg was actually spawned.
+            run_start = self.spawned_at
+            for path, s0, s1 in entries[seen:]:
+                i = state["next_i"]
+                state["next_i"] += 1
+                seg_dur = max(0.0, s1 - s0)
+                state["captured"] += seg_dur
+                enqueued.add(path)
+                # Like per-chunk mode, the chunk in progress at STOP is discarded.
+                if self.stop_requested or not os.path.exists(path) or os.path.getsize(path) < 20000:
+                    if not self.stop_requested:
+                        self.chunks_fail += 1
+                        self.log(f"CAPTURE: segment {i} too small, dropped.")
+                        if self.manifest: self.manifest.error(f"Capture failed chunk {self.index_base + i}", details={"segment": os.path.basename(path)})
+                    try: os.remove(path)
+                    except OSError: pass
+                    continue
+                start_dt = run_start + datetime.timedelta(seconds=s0)
+                end_dt = run_start + datetime.timedelta(seconds=s1)
+                ts = start_dt.strftime("%Y%m%d_%H%M%S")
+                final_file = self._final_path(out_dir, prefix, ts, i, out_ext)
+                size = os.path.getsize(path)
+                capture = {"connection": state["runs"], "bytes_in": size, "avg_kbps": round(size * 8 / 1000 / seg_dur, 1) if seg_dur > 0 else None}
+                job = {"i": i, "num_chunks": num_chunks, "dur": chunk_sec if i < num_chunks else last_dur, "actual_seconds": round(seg_dur, 3), "capture": capture, "start_iso": start_dt.astimezone().isoformat(timespec="seconds"), "end_iso": end_dt.astimezone().isoformat(timespec="seconds"), "temp_file": path, "final_file": final_file, "album": station, "url": stream_url, "preset": self.preset, "artist": prefix, "title": fmt_title_range(start_dt, int(round(seg_dur))), "year": start_dt.year}
+                self._enqueue(job)
+                self.log(f"ENQUEUED: {os.path.basename(final_file)} ({seg_dur:.2f}s)")
+            return len(entries)
+
+        try:
+            while not self.stop_requested:
+                remaining = total_sec - state["captured"]
+                if remaining < 1: break
+                if attempt > 0:
+                    wait = [1, 2, 4][min(attempt-1, 2)]
+                    self.log(f"CAPTURE retry {attempt}/{max_retries} after {wait}s...")
+                    if self.manifest: self.manifest.event("retry_connect", chunk=state["next_i"], attempt=attempt)
+                    time.sleep(wait)
+                    if self.stop_requested: break
+                self.meta.request(self.ffprobe, stream_url)
+                station = station_name_from_tags(self.meta.get(stream_url) or {}, self.preset)
+                if os.path.exists(list_file): os.remove(list_file)
+                first_i = state["next_i"]
+                state["runs"] += 1
+                self.log("CAPTURE (gapless) from chunk %d: %s on one connection | album='%s'" % (first_i, fmt_mmss(remaining), station))
+                if self.manifest: self.manifest.event("segment_run_start", chunk=first_i, seconds=round(remaining, 3))
+                cmd = segment_capture_cmd(ffmpeg, self.source_url, remaining, chunk_sec, pattern, list_file, start_number=first_i)
+                seen = [0]
+
+                def on_tick(elapsed, snap):
+                    entries = read_segment_list(list_file)
+                    seen[0] = collect(entries, seen[0], station)
+                    i = state["next_i"]
+                    boundary = entries[-1][2] if entries else 0.0
+                    dur = chunk_sec if i < num_chunks else last_dur
+                    if i != shown[0]:
+                        shown[0] = i
+                        self._chunk_started(i, num_chunks, dur)
+                    pos = snap["out_time"] if snap["out_time"] > 0 else elapsed
+                    self._show_chunk_time(int(pos - boundary), dur)
+
+                rc, err, st = self._run_ffmpeg_until(cmd, remaining + 15, on_tick)
+                seen[0] = collect(read_segment_list(list_file), seen[0], station)
+                if self.stop_requested: break
+                if total_sec - state["captured"] < 1: break
+                if state["next_i"] > first_i:
+                    # Connection dropped after delivering audio: reconnect right away.
+                    attempt = 0
+                    self.log("CAPTURE: %s, reconnecting..." % ("stream stalled" if st.get("stalled") else "no audio from the connection" if st.get("connect_timeout") else "stream ended early"))
+                    if self.manifest: self.manifest.event("segment_run_end", chunk=state["next_i"], exit_code=rc, stalled=bool(st.get("stalled")), **{k: st[k] for k in ("bytes_in", "avg_kbps", "longest_stall_seconds") if k in st})
+                    continue
+                attempt += 1
+                if attempt > max_retries or (rc != 0 and not st.get("stalled") and not st.get("connect_timeout") and not self._looks_like_transient_http(err)):
+                    self.log("CAPTURE FAILED. Stderr tail:")
+                    for l in self._stderr_tail(err.splitlines()): self.log("  "+l)
+                    self.chunks_fail += 1
+                    if self.manifest: self.manifest.error(f"Capture failed chunk {self.index_base + state['next_i']}", exit_code=rc)
+                    break
+        finally:
+            # Drop anything the muxer started but never completed.
+            for name in os.listdir(out_dir):
+                path = os.path.join(out_dir, name)
+                if path.startswith(base + "_") and name.endswith(".mka") and path not in enqueued:
+                    try: os.remove(path)
+                    except OSError: pass
+            if os.path.exists(list_file):
+                try: os.remove(list_file)
+                except OSError: pass
+
+    def worker_capture(self):
+        try:
+            total_sec, chunk_sec = self.total_sec, self.chunk_sec
+            ffmpeg, out_dir, prefix, stream_url = self.ffmpeg, self.out_dir, self.prefix, self.stream_url
+            num_chunks = (total_sec + chunk_sec - 1) // chunk_sec
+            self.listener.total_progress(0, num_chunks)
+            self.log(f"CAPTURE: {num_chunks} chunks planned.")
+            self.listener.status("Capturing…")
+            if self.manifest: self.manifest.event("capture_start", planned_chunks=num_chunks)
+            if self.tap is None and self.track_mode == "split" and not self._open_own_tap(): return
+            if self.tap is None and self.source_url != self.stream_url:
+                self.log(f"CAPTURE: reading the shared connection ({self.source_url}).")
+                if self.manifest: self.manifest.event("shared_connection", source=self.source_url)
+
+            if self.tap is not None:
+                self._capture_from_tap(out_dir, prefix, total_sec, chunk_sec, num_chunks)
+            elif is_gapless(self.cfg["capture_mode"]):
+                self._capture_segmented(ffmpeg, stream_url, out_dir, prefix, total_sec, chunk_sec, num_chunks)
+            elif self.overlap_sec > 0 and not is_single_pass(self.cfg["capture_mode"]):
+                self._capture_handover(ffmpeg, stream_url, out_dir, prefix, total_sec, chunk_sec, num_chunks)
+            else:
+                self._capture_per_chunk(ffmpeg, stream_url, out_dir, prefix, total_sec, chunk_sec, num_chunks)
+
+            self.log("CAPTURE: finished (or stopped).")
+            if self.manifest: self.manifest.event("capture_end")
+        except Exception as e:
+            self.log(f"CAPTURE CRITICAL ERROR: {e}")
+            if self.manifest: self.manifest.error(f"Capture critical: {e}")
+        finally:
+            if self._own_tap:
+                self.tap.stop(); self.tap = None; self._own_tap = False
+            self.job_q.put(None)
+
+    def _open_own_tap(self) -> bool:
+        # Track changes are only seen on a tap: open a private one. It is one
+        # upstream connection for the whole session, so it holds a host slot.
+        release = None
+        if self.host_limiter is not None:
+            if not self.host_limiter.acquire(self.stream_url, lambda: self.stop_requested): return False
+            release = lambda: self.host_limiter.release(self.stream_url)
+        self.tap = StreamTap(self.ffmpeg, self.stream_url, seconds=0, max_bytes=safe_int(self.cfg.get("timeshift_max_mb"), default=64) << 20,
+                             log=self.log, stall_sec=self.stall_sec, icy=True, on_stop=release)
+        self.tap.start()
+        self._own_tap = True
+        return True
+
+    def _encode_job(self, job: dict) -> dict:
+        # Runs on an EncodePool thread; counters/manifest are updated in _commit_job.
+        i = job["i"]
+        # Apply probe results that arrived after the chunk started.
+        tags = self.meta.get(job["url"], wait=6.0)
+        retag = False
+        if tags:
+            album = station_name_from_tags(tags, job["preset"])
+            if album != job["album"]:
+                self.log(f"PROCESS {i}: album '{job['album']}' -> '{album}' (late metadata)")
+                job["album"] = album
+                retag = True
+        if job.get("encoded"):
+            return self._finish_encoded_job(job, retag)
+        if job.get("copy_only"):
+            return self._copy_job(job)
+        trim = job.get('trim')
+        self.log(f"PROCESS {i}: tagging -> {os.path.basename(job['final_file'])}")
+        # Measure the real length so the fade-out can be placed up front
+        # and the chunk streams through ffmpeg without areverse.
+        if trim: length = trim[1]
+        else: length = ffprobe_duration(self.ffprobe, job['temp_file']) if self.fade_sec > 0 else None
+        if length: job['actual_seconds'] = round(length, 3)
+        gain = self._loudness_gain(job['url'])
+        tags = {"album": job['album'], "artist": job['artist'], "title": job['title'], "date": job['year']}
+        root = os.path.splitext(job['final_file'])[0]
+        dsts = [job['final_file']] + [root + ext for ext in self.extra_exts]
+        # Silence analysis and peaks read the PCM branch of this encode: one decode per chunk.
+        an, peaks, sinks = self._pcm_sinks()
+        cmd = self._encode_cmd(job, dsts, tags, gain, length, pcm=bool(sinks))
+        res = run_pcm(cmd, sinks) if sinks else self.sup.run(cmd)
+        silence = self._silence_result(job, an) if res.returncode == 0 else None
+        if peaks: peaks.finish()
+        if silence and not length: job['actual_seconds'] = silence["length"]
+        if silence and self.silence_action == "skip" and silence["silent_ratio"] >= self.silence_skip_ratio:
+            for f in [job['temp_file']] + dsts:
+                try: os.remove(f)
+                except OSError: pass
+            return {"ok": False, "skipped": True, "rc": 0, "bytes": 0}
+        keep = None
+        if silence and self.silence_action == "trim" and silence["regions"]:
+            keep = keep_ranges(silence["regions"], silence["length"])
+            if keep:
+                # Regions are only known once the audio went by: cut them in a second encode.
+                kept = sum(b - a for a, b in keep)
+                silence["trimmed_seconds"] = round(silence["length"] - kept, 2)
+                self.log(f"PROCESS {i}: cutting {silence['trimmed_seconds']:.0f}s of silence.")
+                length = job['actual_seconds'] = round(kept, 3)
+                res = self.sup.run(self._encode_cmd(job, dsts, tags, gain, length, cut=cut_filter(keep)))
+        if self.loudness and res.returncode == 0: self._loudness_done(job, res.stderr_lines, gain, length)
+        try: os.remove(job['temp_file'])
+        except: pass
+        ok = res.returncode == 0 and os.path.exists(job['final_file'])
+        if len(dsts) > 1:
+            job['outputs'] = self._outputs(dsts, res.returncode)
+            for o in job['outputs'][1:]:
+                if o["exit_code"] != 0: self.log(f"PROCESS {i}: extra output {o['file']} failed (exit {o['exit_code']}).")
+        if ok and peaks:
+            if keep: peaks.cut(keep)
+            self._write_peaks(job, peaks)
+        return {"ok": ok, "rc": res.returncode, "bytes": os.path.getsize(job['final_file']) if ok else 0}
+
+    def _encode_cmd(self, job: dict, dsts: List[str], tags: dict, gain: Optional[float], length: Optional[float], cut: str = "", pcm: bool = False) -> List[str]:
+        af = fade_filter(self.fade_sec, length or job.get('actual_seconds'))
+        if gain: af = f"volume={gain:+.2f}dB,{af}"
+        if cut: af = f"{cut},{af}"
+        return encode_multi_cmd(self.ffmpeg, job['temp_file'], dsts, af, tags, trim=job.get('trim'), measure=MEASURE_FILTER if self.loudness else None, pcm=pcm)
+
+    def _copy_job(self, job: dict) -> dict:
+        # copy policy: the backlog is over budget, so keep the capture as it is.
+        job['final_file'] = os.path.splitext(job['final_file'])[0] + ".mka"
+        self.log(f"PROCESS {job['i']}: copy only -> {os.path.basename(job['final_file'])}")
+        tags = {"album": job['album'], "artist": job['artist'], "title": job['title'], "date": job['year']}
+        res = self.sup.run(remux_cmd(self.ffmpeg, job['temp_file'], job['final_file'], tags, trim=job.get('trim')))
+        try: os.remove(job['temp_file'])
+        except OSError: pass
+        ok = res.returncode == 0 and os.path.exists(job['final_file'])
+        return {"ok": ok, "rc": res.returncode, "bytes": os.path.getsize(job['final_file']) if ok else 0}
+
+    def _outputs(self, dsts: List[str], rc: int) -> List[dict]:
+        # One ffmpeg wrote all of them: a missing file counts as failed even if it exited 0.
+        out = []
+        for d in dsts:
+            exists = os.path.exists(d) and os.path.getsize(d) > 0
+            out.append({"file": os.path.basename(d), "format": os.path.splitext(d)[1][1:], "bytes": os.path.getsize(d) if exists else 0, "exit_code": rc if exists or rc else -1})
+        return out
+
+    def _pcm_wanted(self) -> bool:
+        return self.peaks_on or (self.silence_action != "off" and silence_available())
+
+    def _pcm_sinks(self) -> Tuple[Optional[SilenceAnalyser], Optional[PeaksBuilder], List[Callable[[bytes], None]]]:
+        an = SilenceAnalyser(threshold_db=self.silence_db, min_sec=self.silence_min_sec) if self.silence_action != "off" and silence_available() else None
+        peaks = PeaksBuilder() if self.peaks_on else None
+        return an, peaks, [x.feed for x in (an, peaks) if x is not None]
+
+    def _silence_result(self, job: dict, an: Optional[SilenceAnalyser]) -> Optional[dict]:
+        if an is None: return None
+        res = an.finish()
+        if not an.seconds: return None
+        job['silence'] = res
+        if res["regions"]: self.log(f"PROCESS {job['i']}: {res['silent_seconds']:.0f}s silent in {len(res['regions'])} region(s)")
+        return res
+
+    def _write_peaks(self, job: dict, peaks: PeaksBuilder) -> None:
+        path = peaks_path(job['final_file'])
+        try: peaks.write(path)
+        except OSError as e:
+            self.log(f"PROCESS {job['i']}: waveform peaks not written: {e}")
+            return
+        job['peaks_file'] = os.path.basename(path)
+
+    def _finish_encoded_job(self, job: dict, retag: bool) -> dict:
+        # Single-pass chunk: audio is final; only rewrite tags (stream copy) if they changed.
+        # Silence is only marked here (no trim/skip without a re-encode).
+        final = job['final_file']
+        pcm_file = job.get('pcm_file')
+        if pcm_file and os.path.exists(pcm_file):
+            # Written by the capture's PCM branch: no decode of the finished chunk.
+            an, peaks, sinks = self._pcm_sinks()
+            try:
+                feed_file(pcm_file, sinks)
+                self._silence_result(job, an)
+                if peaks:
+                    peaks.finish()
+                    self._write_peaks(job, peaks)
+            except OSError as e: self.log(f"PROCESS {job['i']}: PCM side file unreadable: {e}")
+            try: os.remove(pcm_file)
+            except OSError: pass
+        if retag:
+            root, ext = os.path.splitext(final)
+            tmp = root + ".retag" + ext
+            tags = {"album": job['album'], "artist": job['artist'], "title": job['title'], "date": job['year']}
+            res = self.sup.run(retag_cmd(self.ffmpeg, final, tmp, tags))
+            if res.returncode == 0 and os.path.exists(tmp): os.replace(tmp, final)
+            else:
+                self.log(f"PROCESS {job['i']}: retag failed (exit {res.returncode}); keeping capture-time tags.")
+                try: os.remove(tmp)
+                except OSError: pass
+        ok = os.path.exists(final)
+        return {"ok": ok, "rc": 0 if ok else -1, "bytes": os.path.getsize(final) if ok else 0}
+
+    def _commit_job(self, job: dict, result: dict):
+        # Called by the pool in chunk order, one job at a time.
+        i = job["i"]
+        result["queue_depth"] = max(0, self.job_q.pending() - 1)  # captured chunks still behind this one
+        if result["ok"]:
+            self.chunks_ok += 1
+            self.log(f"SAVED: {os.path.basename(job['final_file'])} (encode {result['encode_seconds']:.1f}s, queued {result['wait_seconds']:.1f}s, {result['queue_depth']} pending)")
+            if self.manifest: self.manifest.add_chunk(index=i, start_local=job['start_iso'], end_local=job['end_iso'], planned_seconds=job['dur'], actual_seconds=job['actual_seconds'], output_file=os.path.basename(job['final_file']), bytes_written=result['bytes'], ffmpeg_exit_code=0, encode_seconds=result['encode_seconds'], queue_depth=result['queue_depth'], capture_stats=job.get('capture'), cues=job.get('cues'), silence=job.get('silence'), peaks_file=job.get('peaks_file'), outputs=job.get('outputs'), degraded="copy-only" if job.get('copy_only') else None, loudness=job.get('loudness'))
+        elif result.get("skipped"):
+            self.chunks_skipped += 1
+            self.log(f"SKIPPED: chunk {i} is {job['silence']['silent_ratio']:.0%} silence, not saved.")
+            if self.manifest: self.manifest.event("chunk_skipped", index=i, reason="silence", silence=job['silence'])
+        else:
+            self.chunks_fail += 1
+            self.log(f"PROCESS {i} FAILED: {result.get('error') or 'ffmpeg exit %s' % result.get('rc')}")
+            if self.manifest: self.manifest.error(f"Encode failed chunk {i}", exit_code=result.get("rc"))
+        if self.manifest: self.manifest.update("metadata", **self.meta.stats())
+        self.job_q.done(job)
+        self.listener.total_progress(i, job["num_chunks"])
+
+    def worker_process(self):
+        pool = None
+        try:
+            workers = resolve_workers(self.cfg["encode_workers"])
+            pool = EncodePool(workers, self._encode_job, self._commit_job, slots=self.encode_slots)
+            self.log(f"PROCESSOR: ready ({workers} encoder{'s' if workers != 1 else ''}).")
+            if self.extra_exts and is_single_pass(self.cfg["capture_mode"]) and self.tap is None and self.track_mode != "split": self.log("PROCESSOR: single-pass chunks are encoded while captured; extra outputs are only made for chunks that fall back to the encoder pool.")
+            if self.silence_action != "off" and not silence_available(): self.log("PROCESSOR: silence detection needs NumPy (pip install numpy); off for this session.")
+            if self.manifest: self.manifest.event("processor_ready", workers=workers)
+            while True:
+                # Jobs wait in job_q (bounded, see JobQueue) until an encoder is free,
+                # so its policy still has them in hand.
+                pool.wait_below(workers)
+                job = self.job_q.get()
+                if job is None: break
+                pool.submit(job)
+                depth = self.job_q.pending()
+                self.listener.status(f"Processing… ({depth} pending)")
+                if depth > workers: self.log(f"PROCESSOR: backlog {depth} jobs for {workers} encoders.")
+            pool.close()
+            self.log("PROCESSOR: finished.")
+        except Exception as e: self.log(f"PROCESS ERROR: {e}")
+        finally:
+            self.is_running = False; self.current_process = None
+            self.status = "completed" if self.chunks_ok > 0 or self.chunks_skipped > 0 else "aborted"
+            if self.manifest:
+                self.manifest.update("queue", **self.job_q.stats())
+                self.manifest.finalize(self.status)
+            self.listener.finished(self.status)
+            self._done.set()
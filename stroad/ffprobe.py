@@ -1,7 +1,9 @@
 import os
 import json
-import subprocess
 import re
+from typing import Optional
+
+from .supervisor import get_supervisor
 
 def ffprobe_tags(ffprobe_path: str, stream_url: str, timeout: int = 6) -> dict:
     ffprobe = (ffprobe_path or "").strip()
@@ -15,8 +17,9 @@ def ffprobe_tags(ffprobe_path: str, stream_url: str, timeout: int = 6) -> dict:
         stream_url
     ]
     try:
-        out = subprocess.check_output(cmd, stderr=subprocess.STDOUT, text=True, timeout=timeout)
-        data = json.loads(out)
+        res = get_supervisor().run(cmd, timeout=timeout, capture_stdout=True)
+        if res.returncode != 0: return {}
+        data = json.loads(res.stdout.decode("utf-8", "replace"))
         tags = (data.get("format", {}) or {}).get("tags", {}) or {}
         norm = {}
         for k, v in tags.items():
@@ -26,6 +29,58 @@ def ffprobe_tags(ffprobe_path: str, stream_url: str, timeout: int = 6) -> dict:
     except Exception:
         return {}
 
+def ffprobe_duration(ffprobe_path: str, media_path: str, timeout: int = 10) -> Optional[float]:
+    ffprobe = (ffprobe_path or "").strip()
+    if not ffprobe or not os.path.exists(ffprobe):
+        return None
+    cmd = [
+        ffprobe,
+        "-v", "error",
+        "-print_format", "json",
+        "-show_entries", "format=duration",
+        media_path
+    ]
+    try:
+        res = get_supervisor().run(cmd, timeout=timeout, capture_stdout=True)
+        if res.returncode != 0: return None
+        dur = float((json.loads(res.stdout.decode("utf-8", "replace")).get("format", {}) or {}).get("duration"))
+        return dur if dur > 0 else None
+    except Exception:
+        return None
+
+def ffprobe_stream_info(ffprobe_path: str, stream_url: str, timeout: float = 10) -> dict:
+    """Codec, bitrate, sample rate, channels and format tags of a stream's first audio track; {"error": ...} if it can't be read."""
+    ffprobe = (ffprobe_path or "").strip()
+    if not ffprobe or not os.path.exists(ffprobe):
+        return {"error": "ffprobe not found"}
+    cmd = [
+        ffprobe,
+        "-v", "error",
+        "-rw_timeout", str(int(timeout * 1e6)),
+        "-select_streams", "a:0",
+        "-print_format", "json",
+        "-show_entries", "stream=codec_name,bit_rate,sample_rate,channels:format=format_name,bit_rate:format_tags",
+        stream_url
+    ]
+    try:
+        res = get_supervisor().run(cmd, timeout=timeout, capture_stdout=True)
+        if res.timed_out: return {"error": f"ffprobe timed out after {timeout:.0f}s"}
+        if res.returncode != 0: return {"error": (res.stderr_lines[-1] if res.stderr_lines else f"ffprobe exit {res.returncode}").strip()}
+        data = json.loads(res.stdout.decode("utf-8", "replace"))
+    except Exception as e:
+        return {"error": str(e)}
+    st = (data.get("streams") or [{}])[0]
+    fmt = data.get("format", {}) or {}
+    br = st.get("bit_rate") or fmt.get("bit_rate")
+    return {
+        "codec": st.get("codec_name"),
+        "format": fmt.get("format_name"),
+        "bitrate_kbps": round(int(br) / 1000) if str(br or "").isdigit() else None,
+        "sample_rate": int(st["sample_rate"]) if str(st.get("sample_rate") or "").isdigit() else None,
+        "channels": st.get("channels"),
+        "tags": {k.strip().lower(): v.strip() for k, v in (fmt.get("tags") or {}).items() if isinstance(v, str)},
+    }
+
 def station_name_from_tags(tags: dict, selected_preset: str) -> str:
     name = (tags.get("icy-name") or tags.get("icy_name") or "").strip()
     if name:
@@ -0,0 +1,127 @@
+"""
+Station health check: every preset is probed concurrently (bounded, with a
+per-host cap) under strict timeouts. An HTTP/ICY connect gives time to first
+byte, ICY name and current title; ffprobe gives codec and bitrate. Results
+are cached with timestamps so the GUI can mark dead or stale presets without
+probing again.
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+from .ffprobe import ffprobe_stream_info
+from .icy import icy_probe
+
+STALE_HOURS = 24
+
+
+def default_health_path() -> Path:
+    return Path.home() / ".stroad2_health.json"
+
+
+def check_stream(name: str, url: str, ffprobe: str, timeout: float = 8.0) -> dict:
+    """Probe one stream; `ok` is True when ffprobe could read an audio track from it."""
+    t0 = time.monotonic()
+    res: Dict[str, object] = {"name": name, "url": url, "checked": datetime.now().astimezone().isoformat(timespec="seconds"),
+                              "checked_ts": time.time(), "ok": False}
+    if urlsplit(url).scheme in ("http", "https"):
+        try:
+            r = icy_probe(url, timeout=timeout)
+            h = r["headers"]
+            res["ttfb_ms"] = round(r["ttfb"] * 1000) if r["ttfb"] is not None else None
+            res["icy_name"] = h.get("icy-name") or None
+            res["icy_br"] = h.get("icy-br") or None
+            res["content_type"] = h.get("content-type") or None
+            if r["title"]: res["title"] = r["title"]
+        except (OSError, ValueError) as e:
+            # Unreachable here means unreachable for ffmpeg too: don't wait for ffprobe to say so.
+            res["error"] = str(e) or type(e).__name__
+            res["seconds"] = round(time.monotonic() - t0, 2)
+            return res
+    info = ffprobe_stream_info(ffprobe, url, timeout=timeout)
+    if info.get("error"):
+        res["error"] = info["error"]
+    else:
+        res["ok"] = bool(info.get("codec"))
+        res.update({k: info.get(k) for k in ("codec", "bitrate_kbps", "sample_rate", "channels", "format")})
+        res["icy_name"] = res.get("icy_name") or info["tags"].get("icy-name")
+        if not res["ok"]: res["error"] = "no audio track"
+    res["seconds"] = round(time.monotonic() - t0, 2)
+    return res
+
+
+def check_streams(presets: Dict[str, str], ffprobe: str, workers: int = 8, timeout: float = 8.0, per_host: int = 2,
+                  on_result: Optional[Callable[[dict], None]] = None) -> List[dict]:
+    """
+    Check every preset with a URL, `workers` at a time and at most `per_host`
+    connections to one server. on_result is called (from a worker thread)
+    as each finishes. Returns results in preset order.
+    """
+    from .multi import HostLimiter
+    hosts = HostLimiter(per_host)
+    todo = [(n, u.strip()) for n, u in presets.items() if (u or "").strip()]
+
+    def run(item) -> dict:
+        name, url = item
+        with hosts.slot(url):
+            res = check_stream(name, url, ffprobe, timeout=timeout)
+        if on_result: on_result(res)
+        return res
+
+    if not todo:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(todo)))) as ex:
+        return list(ex.map(run, todo))
+
+
+class HealthCache:
+    """Last result per stream URL, in a JSON file."""
+
+    def __init__(self, path: Union[str, Path, None] = None):
+        self.path = Path(path) if path else default_health_path()
+        self._lock = threading.Lock()
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.results: Dict[str, dict] = data.get("streams", {}) if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            self.results = {}
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            return self.results.get((url or "").strip())
+
+    def update(self, results: List[dict]) -> None:
+        with self._lock:
+            for r in results:
+                self.results[r["url"]] = r
+            try:
+                tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+                tmp.write_text(json.dumps({"version": 1, "streams": self.results}, indent=1, ensure_ascii=False), encoding="utf-8")
+                tmp.replace(self.path)
+            except OSError:
+                pass
+
+    def state(self, url: str, stale_hours: float = STALE_HOURS) -> str:
+        """'ok', 'dead', 'stale' (last check too old) or 'unknown' (never checked)."""
+        r = self.get(url)
+        if not r:
+            return "unknown"
+        if stale_hours > 0 and time.time() - float(r.get("checked_ts") or 0) > stale_hours * 3600:
+            return "stale"
+        return "ok" if r.get("ok") else "dead"
+
+
+def describe(r: Optional[dict]) -> str:
+    """One line for a result: codec/bitrate, time to first byte, ICY name, or the error."""
+    if not r:
+        return "not checked"
+    if not r.get("ok"):
+        return f"dead: {r.get('error') or 'unreachable'}"
+    parts = [p for p in (r.get("codec"), f"{r['bitrate_kbps']} kbps" if r.get("bitrate_kbps") else None,
+                         f"{r['ttfb_ms']} ms" if r.get("ttfb_ms") is not None else None, r.get("icy_name")) if p]
+    return ", ".join(parts) or "ok"
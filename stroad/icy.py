@@ -0,0 +1,208 @@
+"""
+In-band ICY (SHOUTcast/Icecast) metadata. IcyReader opens the stream with
+`Icy-MetaData: 1`, hands the audio bytes on and records every StreamTitle
+change on the monotonic clock in a TitleLog, so chunks can carry a cue list
+(and be cut at track changes) without probing or decoding anything.
+"""
+import re
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+_STREAM_TITLE = re.compile(rb"StreamTitle='(.*?)';", re.S)
+# Playlists/HLS/DASH: ffmpeg has to open these itself.
+_NOT_ICY = (".m3u8", ".m3u", ".pls", ".mpd", ".xspf")
+
+
+def icy_capable(url: str) -> bool:
+    u = urlsplit(url or "")
+    return u.scheme in ("http", "https") and not u.path.lower().endswith(_NOT_ICY)
+
+
+def parse_stream_title(meta: bytes) -> Optional[str]:
+    m = _STREAM_TITLE.search(meta)
+    if not m:
+        return None
+    raw = m.group(1)
+    try:
+        return raw.decode("utf-8").strip()
+    except UnicodeDecodeError:
+        return raw.decode("latin-1").strip()
+
+
+def split_title(title: str) -> Tuple[Optional[str], str]:
+    """'Artist - Title' -> (artist, title); (None, title) when there is no separator."""
+    artist, sep, rest = (title or "").partition(" - ")
+    return (artist.strip(), rest.strip()) if sep and artist.strip() and rest.strip() else (None, (title or "").strip())
+
+
+class TitleLog:
+    """StreamTitle changes as (monotonic time, title), bounded history."""
+
+    def __init__(self, keep: int = 2000):
+        self._items: Deque[Tuple[float, str]] = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def add(self, title: str, t: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._items and self._items[-1][1] == title:
+                return False
+            self._items.append((time.monotonic() if t is None else t, title))
+            return True
+
+    def at(self, t: float) -> Optional[str]:
+        with self._lock:
+            cur = None
+            for ti, title in self._items:
+                if ti > t:
+                    break
+                cur = title
+            return cur
+
+    def changes(self, t0: float, t1: float) -> List[Tuple[float, str]]:
+        """Changes strictly after t0 and before t1."""
+        with self._lock:
+            return [(t, s) for t, s in self._items if t0 < t < t1]
+
+    def track_changes(self, t0: float, t1: float) -> List[Tuple[float, str]]:
+        """Like changes(), without the first title heard (that's no track boundary)."""
+        with self._lock:
+            return [(t, s) for k, (t, s) in enumerate(self._items) if k and t0 < t < t1]
+
+    def cues(self, t0: float, t1: float) -> List[Dict[str, object]]:
+        """Cue list for the audio between t0 and t1: offsets in seconds from t0."""
+        out = []
+        first = self.at(t0)
+        if first:
+            out.append({"offset": 0.0, "title": first})
+        for t, title in self.changes(t0, t1):
+            out.append({"offset": round(t - t0, 3), "title": title})
+        return out
+
+
+def icy_probe(url: str, timeout: float = 8.0) -> dict:
+    """
+    Connect like IcyReader and read up to the first metadata block: response
+    headers, seconds to the first body byte and the current StreamTitle (if
+    the server sends titles). Everything happens within `timeout`.
+    """
+    deadline = time.monotonic() + timeout
+    reader = IcyReader(url, TitleLog(), timeout=timeout)
+    t0 = time.monotonic()
+    sock, f, headers = reader._open(url)
+    try:
+        first = f.read(1)
+        ttfb = time.monotonic() - t0
+        title = None
+        metaint = int(headers.get("icy-metaint") or 0)
+        if first and metaint and icy_capable(url):
+            left = metaint - 1
+            while left > 0 and time.monotonic() < deadline:
+                sock.settimeout(max(0.1, deadline - time.monotonic()))
+                got = f.read(min(left, 16384))
+                if not got:
+                    break
+                left -= len(got)
+            if left == 0:
+                n = f.read(1)
+                if n and n[0]:
+                    title = parse_stream_title(f.read(n[0] * 16))
+    finally:
+        f.close()
+        sock.close()
+    return {"headers": headers, "ttfb": ttfb if first else None, "title": title}
+
+
+class IcyReader:
+    """
+    Minimal HTTP/ICY client (accepts `ICY 200 OK`, follows redirects). Use
+    pump() to copy the audio to a sink until the connection ends, the sink
+    raises, or stop() is called; titles go to `titles`.
+    """
+
+    def __init__(self, url: str, titles: TitleLog, timeout: float = 20.0, user_agent: str = "STROAD"):
+        self.url = url
+        self.titles = titles
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.metaint = 0
+        self.content_type = ""
+        self.bytes_in = 0
+        self.answered = False  # the server sent a status line
+        self._sock = None
+        self._stopping = False
+
+    def _open(self, url: str, redirects: int = 5):
+        u = urlsplit(url)
+        port = u.port or (443 if u.scheme == "https" else 80)
+        sock = socket.create_connection((u.hostname, port), timeout=self.timeout)
+        if u.scheme == "https":
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=u.hostname)
+        path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+        host = u.hostname + (f":{u.port}" if u.port else "")
+        # HTTP/1.0 keeps servers from using chunked encoding on the stream.
+        req = f"GET {path} HTTP/1.0\r\nHost: {host}\r\nUser-Agent: {self.user_agent}\r\nIcy-MetaData: 1\r\nAccept: */*\r\n\r\n"
+        sock.sendall(req.encode("latin-1"))
+        f = sock.makefile("rb")
+        status = f.readline(1024).decode("latin-1").strip()
+        self.answered = bool(status)
+        headers = {}
+        while True:
+            line = f.readline(8192).decode("latin-1").strip()
+            if not line:
+                break
+            k, _, v = line.partition(":")
+            headers[k.strip().lower()] = v.strip()
+        parts = status.split()
+        code = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+        if code in (301, 302, 303, 307, 308) and headers.get("location") and redirects > 0:
+            f.close(); sock.close()
+            return self._open(urljoin(url, headers["location"]), redirects - 1)
+        if code != 200:
+            f.close(); sock.close()
+            raise OSError(f"stream answered '{status}'")
+        return sock, f, headers
+
+    def pump(self, sink: Callable[[bytes], None]) -> None:
+        sock, f, headers = self._open(self.url)
+        self._sock = sock
+        self.metaint = int(headers.get("icy-metaint") or 0)
+        self.content_type = headers.get("content-type", "")
+        try:
+            if "mpegurl" in self.content_type or "text/" in self.content_type:
+                raise OSError(f"not an audio stream ({self.content_type})")
+            block = self.metaint or 16384
+            while not self._stopping:
+                # Buffered read: returns a whole block unless the stream ended.
+                data = f.read(block)
+                if not data:
+                    break
+                self.bytes_in += len(data)
+                sink(data)
+                if not self.metaint:
+                    continue
+                n = f.read(1)
+                if len(data) < block or not n:
+                    break
+                if n[0]:
+                    meta = f.read(n[0] * 16)
+                    title = parse_stream_title(meta)
+                    if title is not None:
+                        self.titles.add(title)
+        finally:
+            self._sock = None
+            try: f.close()
+            except OSError: pass
+            try: sock.close()
+            except OSError: pass
+
+    def stop(self) -> None:
+        self._stopping = True
+        sock = self._sock
+        if sock is not None:
+            try: sock.shutdown(socket.SHUT_RDWR)
+            except OSError: pass
@@ -0,0 +1,126 @@
+"""
+EBU R128 loudness: measured by ffmpeg's ebur128 filter on a side branch of
+the encode graph (same decode as the fade), and kept as a rolling profile
+per station so the next chunks get one stable gain, applied in that same
+single pass. The chunk being encoded never depends on its own measurement.
+"""
+import json
+import math
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+LOUDNESS_MODES = ("off", "measure", "normalize")
+# metadata=1 also moves ebur128's per-frame log to verbose, so only the summary reaches stderr.
+MEASURE_FILTER = "ebur128=peak=true:metadata=1,anullsink"
+WINDOW = 20  # chunks per station in the profile
+SILENT_LUFS = -69.0  # ebur128 reports -70 for digital silence
+TRUE_PEAK_CEILING = -1.0  # dBTP the applied gain keeps the profile's peaks under
+
+_SUMMARY = {
+    "integrated_lufs": re.compile(r"^\s*I:\s*(-?[\d.]+|-?inf) LUFS"),
+    "lra_lu": re.compile(r"^\s*LRA:\s*(-?[\d.]+) LU"),
+    "true_peak_dbtp": re.compile(r"^\s*Peak:\s*(-?[\d.]+|-?inf) dBFS"),
+}
+
+
+def default_profiles_path() -> Path:
+    return Path.home() / ".stroad2_loudness.json"
+
+
+def parse_summary(lines: List[str]) -> Optional[dict]:
+    """Values from the ebur128 'Summary:' block in ffmpeg's stderr, or None."""
+    for k in range(len(lines) - 1, -1, -1):
+        if "Summary:" in lines[k]:
+            break
+    else:
+        return None
+    out = {}
+    for line in lines[k + 1:]:
+        for key, rx in _SUMMARY.items():
+            m = rx.match(line)
+            if m and key not in out:
+                v = float(m.group(1))
+                out[key] = round(v, 2) if math.isfinite(v) else None
+    return out if out.get("integrated_lufs") is not None else None
+
+
+def _power_mean(values: List[float], weights: List[float]) -> float:
+    total = sum(weights) or 1.0
+    return 10 * math.log10(sum(w * 10 ** (v / 10) for v, w in zip(values, weights)) / total)
+
+
+class LoudnessProfiles:
+    """
+    Last WINDOW measurements per station (keyed by stream URL), in a JSON
+    file shared by every session of the process. Each save re-reads the
+    file and replaces only the station it changed.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data: Dict[str, List[dict]] = self._load()
+
+    def _load(self) -> Dict[str, List[dict]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            return data.get("stations", {}) if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def profile(self, key: str) -> Optional[dict]:
+        """Integrated loudness (duration-weighted power mean), mean LRA and highest true peak over the window."""
+        with self._lock:
+            rows = list(self._data.get(key) or [])
+        if not rows:
+            return None
+        peaks = [r["true_peak_dbtp"] for r in rows if r.get("true_peak_dbtp") is not None]
+        return {
+            "integrated_lufs": round(_power_mean([r["integrated_lufs"] for r in rows], [r.get("seconds") or 1.0 for r in rows]), 2),
+            "lra_lu": round(sum(r.get("lra_lu") or 0.0 for r in rows) / len(rows), 2),
+            "true_peak_dbtp": max(peaks) if peaks else None,
+            "chunks": len(rows),
+        }
+
+    def gain(self, key: str, target: float, max_gain: float) -> Optional[float]:
+        """dB to reach `target` from the station profile, None until there is one."""
+        p = self.profile(key)
+        if p is None:
+            return None
+        g = min(max(target - p["integrated_lufs"], -max_gain), max_gain)
+        if p["true_peak_dbtp"] is not None:
+            g = min(g, TRUE_PEAK_CEILING - p["true_peak_dbtp"])
+        return round(g, 2)
+
+    def add(self, key: str, measured: dict, seconds: float) -> None:
+        if measured.get("integrated_lufs") is None or measured["integrated_lufs"] <= SILENT_LUFS:
+            return  # dead air says nothing about the station's level
+        row = {k: measured.get(k) for k in ("integrated_lufs", "lra_lu", "true_peak_dbtp")}
+        row["seconds"] = round(seconds or 0.0, 1)
+        with self._lock:
+            rows = (self._data.get(key) or [])[-(WINDOW - 1):] + [row]
+            self._data[key] = rows
+            try:
+                on_disk = self._load()
+                on_disk[key] = rows
+                tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+                tmp.write_text(json.dumps({"version": 1, "stations": on_disk}, indent=1, ensure_ascii=False), encoding="utf-8")
+                tmp.replace(self.path)
+                self._data = on_disk
+            except OSError:
+                pass  # keep the profile in memory for this process
+
+
+_profiles: Dict[str, LoudnessProfiles] = {}
+_profiles_lock = threading.Lock()
+
+
+def get_profiles(path: Union[str, Path, None] = None) -> LoudnessProfiles:
+    """One LoudnessProfiles per file, shared by all engines in the process."""
+    p = str(Path(path) if path else default_profiles_path())
+    with _profiles_lock:
+        if p not in _profiles:
+            _profiles[p] = LoudnessProfiles(p)
+        return _profiles[p]
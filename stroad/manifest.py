@@ -1,8 +1,14 @@
 import json
+import os
+import socket
 import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Union
+
+# Snapshot is compacted once the journal outgrows it (but never below this),
+# so total bytes written stay linear in the number of events.
+_MIN_JOURNAL_BYTES = 64 * 1024
 
 
 def _atomic_write_json(path: Path, obj: dict) -> None:
@@ -11,7 +17,62 @@ def _atomic_write_json(path: Path, obj: dict) -> None:
     tmp.replace(path)
 
 
+def journal_path(snapshot_path: Union[str, Path]) -> Path:
+    p = Path(snapshot_path)
+    return p.with_suffix(".jsonl")
+
+
+def _apply(data: dict, rec: dict) -> None:
+    op = rec.get("op")
+    if op == "append":
+        data.setdefault(rec["key"], []).append(rec["item"])
+    elif op == "update":
+        data.setdefault(rec["key"], {}).update(rec["set"])
+
+
+def read_manifest(path: Union[str, Path]) -> dict:
+    """Rebuild the full session state from the snapshot plus its journal."""
+    path = Path(path)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    seq = int(data.get("journal_seq", 0))
+    jp = journal_path(path)
+    if jp.exists():
+        with open(jp, encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # torn tail from a crash mid-append
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break
+                if rec.get("seq", 0) <= seq:
+                    continue  # already folded into the snapshot
+                _apply(data, rec)
+                seq = rec["seq"]
+    data["journal_seq"] = seq
+    return data
+
+
+def annotate_manifest(path: Union[str, Path], key: str, item: dict) -> None:
+    """Append `item` to a top-level list of a finished manifest (no journal), in place."""
+    path = Path(path)
+    if journal_path(path).exists():
+        raise ValueError(f"{path.name} is still being written")
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data.setdefault(key, []).append(item)
+    _atomic_write_json(path, data)
+
+
 class SessionManifest:
+    """
+    Session manifest as snapshot + append-only journal.
+
+    `<name>.session.json` keeps the usual shape; every change is appended to
+    `<name>.session.jsonl` as one JSON line. The snapshot is rewritten only
+    when the journal outgrows it and at finalize (which also drops the
+    journal). Use read_manifest() to get the live state of a running session.
+    """
+
     def __init__(
         self,
         out_dir: str,
@@ -24,9 +85,14 @@ class SessionManifest:
         chunk_seconds: int,
         tape_mode: bool,
         output_format: str,
+        capture_mode: str = "Per-chunk (reconnect)",
+        catalog=None,
+        total_seconds: Optional[int] = None,
+        filename_prefix: Optional[str] = None,
     ):
         self._lock = threading.Lock()
         self.path = Path(out_dir) / f"STROAD_Rec_{session_id}.session.json"
+        self.journal_path = journal_path(self.path)
         self.data = {
             "manifest_version": 1,
             "app": {"name": app_name, "version": app_version},
@@ -35,6 +101,9 @@ class SessionManifest:
                 "start_local": self._now_local(),
                 "end_local": None,
                 "status": "recording",
+                # Lets crash recovery tell a dead session from a running one
+                "pid": os.getpid(),
+                "host": socket.gethostname(),
             },
             "station": {
                 "url": station_url,
@@ -44,25 +113,113 @@ class SessionManifest:
             },
             "settings": {
                 "chunk_seconds": chunk_seconds,
+                "total_seconds": total_seconds,
+                "filename_prefix": filename_prefix,
                 "tape_mode": tape_mode,
+                "capture_mode": capture_mode,
                 "output_dir": str(Path(out_dir)),
             },
             "events": [{"t": self._now_local(), "type": "session_start"}],
             "chunks": [],
             "errors": [],
+            "journal_seq": 0,
         }
+        self._seq = 0
+        self._journal = None
+        self._journal_bytes = 0
+        self._snapshot_bytes = 0
         with self._lock:
-            _atomic_write_json(self.path, self.data)
+            self._compact()
+        # Optional stroad.catalog.Catalog, kept in step as chunks complete
+        self.catalog = catalog
+        self._catalog_id = self._to_catalog("session_started", str(self.path), self.data)
+
+    @classmethod
+    def reopen(cls, path: Union[str, Path], catalog=None) -> "SessionManifest":
+        """
+        Continue an unfinished session (crash recovery) in the same files:
+        the journal is folded into the snapshot and appends start over.
+        """
+        self = cls.__new__(cls)
+        self._lock = threading.Lock()
+        self.path = Path(path)
+        self.journal_path = journal_path(self.path)
+        self.data = read_manifest(self.path)
+        self._seq = int(self.data.get("journal_seq", 0))
+        self._journal = None
+        self._journal_bytes = 0
+        self._snapshot_bytes = 0
+        with self._lock:
+            self._compact()
+        self.catalog = catalog
+        self._catalog_id = self._to_catalog("session_resumed", str(self.path))
+        return self
+
+    def _to_catalog(self, method: str, *args):
+        # The catalog is only an index: if it fails, stop feeding it but keep recording.
+        if self.catalog is None:
+            return None
+        try:
+            return getattr(self.catalog, method)(*args)
+        except Exception:
+            self.catalog = None
+            return None
 
     def _now_local(self) -> str:
         return datetime.now().astimezone().isoformat(timespec="seconds")
 
-    def event(self, typ: str, **extra) -> None:
-        with self._lock:
-            e = {"t": self._now_local(), "type": typ}
-            e.update(extra)
-            self.data["events"].append(e)
+    # -------------------- journal --------------------
+    def _record(self, rec: dict) -> None:
+        # Caller holds the lock.
+        self._seq += 1
+        rec["seq"] = self._seq
+        _apply(self.data, rec)
+        if self._journal is None:
+            # Finalized: late writes go straight to the snapshot.
+            self.data["journal_seq"] = self._seq
             _atomic_write_json(self.path, self.data)
+            return
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        self._journal.write(line)
+        self._journal.flush()
+        self._journal_bytes += len(line.encode("utf-8"))
+        if self._journal_bytes > max(_MIN_JOURNAL_BYTES, self._snapshot_bytes):
+            self._compact()
+
+    def _compact(self, drop_journal: bool = False) -> None:
+        self.data["journal_seq"] = self._seq
+        _atomic_write_json(self.path, self.data)
+        self._snapshot_bytes = self.path.stat().st_size
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+        if drop_journal:
+            try: self.journal_path.unlink()
+            except FileNotFoundError: pass
+            return
+        # Records up to journal_seq now live in the snapshot.
+        self._journal = open(self.journal_path, "w", encoding="utf-8")
+        self._journal_bytes = 0
+
+    def _append(self, key: str, item: dict) -> None:
+        with self._lock:
+            self._record({"op": "append", "key": key, "item": item})
+
+    def update(self, key: str, **values) -> None:
+        """Merge values into a top-level section (created on first use)."""
+        with self._lock:
+            self._record({"op": "update", "key": key, "set": values})
+
+    def compact(self) -> None:
+        with self._lock:
+            if self._journal:
+                self._compact()
+
+    # -------------------- API --------------------
+    def event(self, typ: str, **extra) -> None:
+        e = {"t": self._now_local(), "type": typ}
+        e.update(extra)
+        self._append("events", e)
 
     def add_chunk(
         self,
@@ -74,21 +231,47 @@ class SessionManifest:
         output_file: str,
         bytes_written: int,
         ffmpeg_exit_code: int,
+        encode_seconds: Optional[float] = None,
+        queue_depth: Optional[int] = None,
+        capture_stats: Optional[Dict[str, Any]] = None,
+        cues: Optional[List[Dict[str, Any]]] = None,
+        silence: Optional[Dict[str, Any]] = None,
+        peaks_file: Optional[str] = None,
+        outputs: Optional[List[Dict[str, Any]]] = None,
+        degraded: Optional[str] = None,
+        loudness: Optional[Dict[str, Any]] = None,
     ) -> None:
-        with self._lock:
-            self.data["chunks"].append(
-                {
-                    "index": index,
-                    "start_local": start_local,
-                    "end_local": end_local,
-                    "planned_seconds": planned_seconds,
-                    "actual_seconds": actual_seconds,
-                    "output_file": output_file,
-                    "bytes": bytes_written,
-                    "ffmpeg_exit_code": ffmpeg_exit_code,
-                }
-            )
-            _atomic_write_json(self.path, self.data)
+        item: Dict[str, Any] = {
+            "index": index,
+            "start_local": start_local,
+            "end_local": end_local,
+            "planned_seconds": planned_seconds,
+            "actual_seconds": actual_seconds,
+            "output_file": output_file,
+            "bytes": bytes_written,
+            "ffmpeg_exit_code": ffmpeg_exit_code,
+        }
+        if encode_seconds is not None:
+            item["encode_seconds"] = encode_seconds
+        if queue_depth is not None:
+            item["queue_depth"] = queue_depth
+        if capture_stats:
+            item["capture"] = capture_stats
+        if cues:
+            item["cues"] = cues  # [{"offset": seconds into the file, "title": StreamTitle}]
+        if silence:
+            item["silence"] = silence  # regions are in capture time (before any trim)
+        if peaks_file:
+            item["peaks_file"] = peaks_file  # waveform min/max levels, see peaks.py
+        if outputs:
+            item["outputs"] = outputs  # every file written for this chunk (output_file is the first)
+        if degraded:
+            item["degraded"] = degraded  # saved without the normal encode (backlog policy)
+        if loudness:
+            item["loudness"] = loudness  # EBU R128 of the captured audio, gain applied, level of the file
+        self._append("chunks", item)
+        if self._catalog_id is not None:
+            self._to_catalog("chunk_added", self._catalog_id, item)
 
     def error(
         self,
@@ -96,22 +279,23 @@ class SessionManifest:
         exit_code: Optional[int] = None,
         details: Optional[Dict[str, Any]] = None,
     ) -> None:
-        with self._lock:
-            item: Dict[str, Any] = {
-                "t": self._now_local(),
-                "message": message,
-                "exit_code": exit_code,
-            }
-            if details:
-                item["details"] = details
-            self.data["errors"].append(item)
-            _atomic_write_json(self.path, self.data)
+        item: Dict[str, Any] = {
+            "t": self._now_local(),
+            "message": message,
+            "exit_code": exit_code,
+        }
+        if details:
+            item["details"] = details
+        self._append("errors", item)
+        if self._catalog_id is not None:
+            self._to_catalog("error_added", self._catalog_id, item)
 
     def finalize(self, status: str) -> None:
         with self._lock:
-            self.data["session"]["end_local"] = self._now_local()
-            self.data["session"]["status"] = status
-            self.data["events"].append(
-                {"t": self._now_local(), "type": "session_end", "status": status}
-            )
-            _atomic_write_json(self.path, self.data)
+            if not self._journal:
+                return
+            self._record({"op": "update", "key": "session", "set": {"end_local": self._now_local(), "status": status}})
+            self._record({"op": "append", "key": "events", "item": {"t": self._now_local(), "type": "session_end", "status": status}})
+            self._compact(drop_journal=True)
+        if self._catalog_id is not None:
+            self._to_catalog("session_updated", self._catalog_id, status, self.data["session"]["end_local"], str(self.path))
@@ -0,0 +1,137 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait as _wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .ffprobe import ffprobe_tags
+
+
+class ProbeStats:
+    """Lookup / probe counters (not locked: the owner holds its lock while updating)."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.probes = 0
+        self.failures = 0
+        self.latency_total = 0.0
+        self.latency_last: Optional[float] = None
+        self.latency_max = 0.0
+
+    def probed(self, dt: float, ok: bool) -> None:
+        self.probes += 1
+        self.latency_total += dt
+        self.latency_last = dt
+        self.latency_max = max(self.latency_max, dt)
+        if not ok:
+            self.failures += 1
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "lookups": lookups,
+            "cache_hits": self.hits,
+            "cache_hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "probes": self.probes,
+            "probe_failures": self.failures,
+            "probe_latency_avg_ms": round(1000 * self.latency_total / self.probes) if self.probes else None,
+            "probe_latency_last_ms": round(1000 * self.latency_last) if self.latency_last is not None else None,
+            "probe_latency_max_ms": round(1000 * self.latency_max) if self.probes else None,
+        }
+
+
+class MetadataProber:
+    """
+    Background ffprobe tag lookups with a per-URL TTL cache.
+
+    request() never blocks: it returns immediately and refreshes stale entries
+    on a worker thread. get() returns whatever is cached (optionally waiting a
+    bounded time for an in-flight probe), so the capture loop never waits on
+    the network and late results are picked up when the chunk is tagged.
+    Sessions sharing one prober each take a view() for their own counters.
+    """
+
+    def __init__(self, ttl: float = 300.0, workers: int = 2, probe: Callable[[str, str], dict] = ffprobe_tags):
+        self.ttl = float(ttl)
+        self._probe = probe
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="metaprobe")
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[float, dict]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._stats = ProbeStats()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = ProbeStats()
+
+    def view(self) -> "MetadataView":
+        return MetadataView(self)
+
+    def _fresh(self, url: str) -> bool:
+        item = self._cache.get(url)
+        return bool(item) and (time.monotonic() - item[0]) < self.ttl
+
+    def request(self, ffprobe_path: str, url: str, stats: Optional[ProbeStats] = None) -> None:
+        """`stats`: extra counters (a view's) that this lookup, and the probe it starts, also count in."""
+        counters = [self._stats] + ([stats] if stats is not None else [])
+        with self._lock:
+            fresh = self._fresh(url)
+            for c in counters:
+                if fresh: c.hits += 1
+                else: c.misses += 1
+            if fresh or url in self._inflight:
+                return
+            self._inflight[url] = self._pool.submit(self._run, ffprobe_path, url, counters)
+
+    def _run(self, ffprobe_path: str, url: str, counters: List[ProbeStats]) -> dict:
+        t0 = time.monotonic()
+        tags = {}
+        try:
+            tags = self._probe(ffprobe_path, url) or {}
+        finally:
+            dt = time.monotonic() - t0
+            with self._lock:
+                self._inflight.pop(url, None)
+                for c in counters:
+                    c.probed(dt, bool(tags))
+                if tags:
+                    self._cache[url] = (time.monotonic(), tags)
+        return tags
+
+    def get(self, url: str, wait: float = 0.0) -> Optional[dict]:
+        """Cached tags (possibly stale), or None. May wait up to `wait` s for a running probe."""
+        with self._lock:
+            fut = self._inflight.get(url)
+        if fut is not None and wait > 0:
+            _wait([fut], timeout=wait)
+        with self._lock:
+            item = self._cache.get(url)
+        return dict(item[1]) if item else None
+
+    def stats(self, view: Optional[ProbeStats] = None) -> dict:
+        with self._lock:
+            return (view or self._stats).as_dict()
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+class MetadataView:
+    """One session's window on a shared MetadataProber: same cache and probes, its own counters."""
+
+    def __init__(self, prober: MetadataProber):
+        self.prober = prober
+        self._stats = ProbeStats()
+
+    def request(self, ffprobe_path: str, url: str) -> None:
+        self.prober.request(ffprobe_path, url, stats=self._stats)
+
+    def get(self, url: str, wait: float = 0.0) -> Optional[dict]:
+        return self.prober.get(url, wait=wait)
+
+    def stats(self) -> dict:
+        return self.prober.stats(self._stats)
+
+    def reset_stats(self) -> None:
+        with self.prober._lock:
+            self._stats = ProbeStats()
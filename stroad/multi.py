@@ -0,0 +1,207 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .engine import RecordingEngine, EngineListener
+from .ffprobe import station_short_code
+from .metaprobe import MetadataProber
+from .pool import resolve_workers
+from .settings import DEFAULTS
+from .streams import resolve_stream_url
+from .utils import safe_int
+
+
+class HostLimiter:
+    """Caps simultaneous upstream connections per host across all sessions."""
+
+    def __init__(self, per_host: int):
+        self.per_host = max(1, int(per_host))
+        self._lock = threading.Lock()
+        self._sems: Dict[str, threading.BoundedSemaphore] = {}
+        self._busy: Dict[str, int] = {}
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return (urlsplit(url).hostname or "").lower()
+
+    def _sem(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._sems:
+                self._sems[host] = threading.BoundedSemaphore(self.per_host)
+                self._busy[host] = 0
+            return self._sems[host]
+
+    def acquire(self, url: str, cancelled: Callable[[], bool] = lambda: False, block: bool = True) -> bool:
+        """Take a slot for `url`'s host; False if cancelled while waiting (or none free and not `block`)."""
+        host = self.host_of(url)
+        sem = self._sem(host)
+        while not (sem.acquire(timeout=0.5) if block else sem.acquire(blocking=False)):
+            if not block or cancelled():
+                return False
+        with self._lock:
+            self._busy[host] += 1
+        return True
+
+    def release(self, url: str) -> None:
+        host = self.host_of(url)
+        with self._lock:
+            self._busy[host] -= 1
+        self._sems[host].release()
+
+    @contextmanager
+    def slot(self, url: str, cancelled: Callable[[], bool] = lambda: False):
+        """Yields True once a slot is held, or False if cancelled while waiting."""
+        if not self.acquire(url, cancelled):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self.release(url)
+
+    def usage(self) -> Dict[str, int]:
+        with self._lock:
+            return {h: n for h, n in self._busy.items() if n}
+
+
+class SessionStatus(EngineListener):
+    """Listener that keeps a per-session status line and forwards logs with a name prefix."""
+
+    def __init__(self, name: str, sink: Optional[Callable[[str], None]] = None):
+        self.name = name
+        self.sink = sink
+        self.state = "pending"
+        self.chunk = 0
+        self.num_chunks = 0
+        self.done = 0
+        self.last = ""
+
+    def log(self, line: str) -> None:
+        self.last = line
+        if self.sink:
+            self.sink(f"[{self.name}] {line}")
+
+    def status(self, text: str) -> None:
+        self.state = text
+
+    def chunk_started(self, i: int, num_chunks: int, dur: int) -> None:
+        self.chunk, self.num_chunks = i, num_chunks
+
+    def total_progress(self, done: int, num_chunks: int) -> None:
+        self.done, self.num_chunks = done, num_chunks
+
+    def finished(self, status: str) -> None:
+        self.state = status
+
+
+def load_sessions_file(path: str) -> List[dict]:
+    """Either a list of session dicts, or {"defaults": {...}, "sessions": [...]}."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    defaults = {}
+    if isinstance(data, dict):
+        defaults = data.get("defaults") or {}
+        data = data.get("sessions") or []
+    out = []
+    for item in data:
+        spec = dict(defaults)
+        spec.update(item)
+        out.append(spec)
+    return out
+
+
+class MultiRecorder:
+    """
+    Runs many RecordingEngines side by side. They share one metadata cache,
+    one encoder budget (max concurrent encodes over all sessions) and a
+    per-host connection limit.
+    """
+
+    def __init__(self, base_cfg: dict, presets: dict, max_encoders=None, per_host: int = 2, log_sink: Optional[Callable[[str], None]] = None):
+        self.base_cfg = dict(DEFAULTS)
+        self.base_cfg.update(base_cfg or {})
+        self.presets = presets
+        self.max_encoders = resolve_workers(max_encoders if max_encoders is not None else self.base_cfg.get("encode_workers"))
+        self.encode_slots = threading.BoundedSemaphore(self.max_encoders)
+        self.hosts = HostLimiter(per_host)
+        self.meta = MetadataProber(ttl=safe_int(self.base_cfg.get("metadata_ttl_sec"), default=300), workers=4)
+        self.log_sink = log_sink
+        self.sessions: List[tuple] = []  # (name, engine, status)
+
+    def add(self, spec: dict, tap=None) -> RecordingEngine:
+        spec = dict(spec)
+        name = spec.pop("name", None) or spec.get("selected_preset") or spec.get("url") or f"session{len(self.sessions) + 1}"
+        url = (spec.pop("url", "") or "").strip()
+        cfg = dict(self.base_cfg)
+        cfg.update(spec)
+        if "selected_preset" not in spec:
+            cfg["selected_preset"] = name if name in self.presets else "Custom URL"
+        if not url:
+            url = resolve_stream_url(cfg, self.presets)
+        code = station_short_code(name, cfg["selected_preset"] if cfg["selected_preset"] != "Custom URL" else name)
+        if "filename_prefix" not in spec:
+            # Keep chunk names unique when several stations share an output folder.
+            cfg["filename_prefix"] = f"{self.base_cfg.get('filename_prefix') or 'STROAD_Rec'}_{code}"
+        status = SessionStatus(name, self.log_sink)
+        engine = RecordingEngine(cfg, url, listener=status, meta=self.meta, encode_slots=self.encode_slots, host_limiter=self.hosts, session_suffix=code, tap=tap)
+        self.sessions.append((name, engine, status))
+        return engine
+
+    def start_all(self) -> List[str]:
+        """Start every session; returns error messages for those that could not start."""
+        errors = []
+        for name, engine, status in self.sessions:
+            try:
+                engine.start()
+            except ValueError as e:
+                status.state = f"error: {e}"
+                errors.append(f"{name}: {e}")
+        return errors
+
+    def prune(self) -> None:
+        """Forget sessions that have finished (long-running schedulers)."""
+        self.sessions = [s for s in self.sessions if s[1].is_running]
+
+    def stop_all(self) -> None:
+        for _, engine, _ in self.sessions:
+            engine.stop()
+
+    def running(self) -> int:
+        return sum(1 for _, e, _ in self.sessions if e.is_running)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        end = None if timeout is None else time.monotonic() + timeout
+        for _, engine, _ in self.sessions:
+            if not engine.is_running:
+                continue
+            left = None if end is None else max(0.0, end - time.monotonic())
+            if not engine.wait(left):
+                return False
+        return True
+
+    def status(self) -> List[dict]:
+        rows = []
+        for name, engine, st in self.sessions:
+            rows.append({
+                "name": name,
+                "session_id": engine.session_id,
+                "state": st.state,
+                "chunk": st.chunk,
+                "num_chunks": st.num_chunks,
+                "ok": engine.chunks_ok,
+                "fail": engine.chunks_fail,
+                "last": st.last,
+            })
+        return rows
+
+    def status_table(self) -> str:
+        lines = [f"{'session':<24} {'state':<22} {'chunk':>9} {'ok':>4} {'fail':>4}"]
+        for r in self.status():
+            chunk = f"{r['chunk']}/{r['num_chunks']}" if r["num_chunks"] else "-"
+            lines.append(f"{r['name'][:24]:<24} {r['state'][:22]:<22} {chunk:>9} {r['ok']:>4} {r['fail']:>4}")
+        hosts = self.hosts.usage()
+        lines.append(f"encoders: {self.max_encoders} max | connections: " + (", ".join(f"{h}={n}" for h, n in sorted(hosts.items())) or "none"))
+        return "\n".join(lines)
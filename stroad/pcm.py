@@ -0,0 +1,64 @@
+"""
+Low-rate mono s16le for everything that looks at the audio itself (silence
+analysis, waveform peaks). The processor takes it from a side branch of the
+encode graph (PCM_FILTER on pipe:1), so the chunk is decoded once; each sink
+gets the bytes as they arrive, through a bounded pipe (StdoutPipe) so a slow
+sink holds ffmpeg back instead of buffering the chunk in memory.
+"""
+from typing import Callable, List, Optional, Tuple
+
+from .supervisor import ChildResult, StdoutPipe, get_supervisor
+
+RATE = 8000  # Hz; enough for levels and waveforms
+PCM_FILTER = f"aresample={RATE},aformat=sample_fmts=s16:channel_layouts=mono"
+PCM_BLOCK = 65536  # bytes per read when feeding from a file
+
+
+def pcm_output_args(label: str, dst: str = "pipe:1") -> List[str]:
+    """Output options for a filter_complex branch ending in PCM_FILTER."""
+    return ["-map", f"[{label}]", "-c:a", "pcm_s16le", "-f", "s16le", dst]
+
+
+def pcm_cmd(ffmpeg: str, src: str, rate: int = RATE, trim: Optional[Tuple[float, float]] = None) -> List[str]:
+    cut = ["-ss", "%.3f" % trim[0], "-t", "%.3f" % trim[1]] if trim else []
+    return [ffmpeg, "-v", "error"] + cut + ["-i", src, "-vn", "-ac", "1", "-ar", str(rate), "-f", "s16le", "pipe:1"]
+
+
+def run_pcm(cmd: List[str], sinks: List[Callable[[bytes], None]], max_blocks: int = 16) -> ChildResult:
+    """
+    Run `cmd` (which writes PCM to pipe:1) and feed its stdout into `sinks`
+    on the calling thread. At most `max_blocks` pipe reads wait in memory.
+    """
+    pipe = StdoutPipe(max_blocks)
+    child = get_supervisor().spawn(cmd, stdout_pipe=pipe)
+    try:
+        while True:
+            data = pipe.get()
+            if data is None:
+                break
+            for sink in sinks:
+                sink(data)
+    except BaseException:
+        pipe.abandon()
+        child.terminate()
+        raise
+    return child.future.result()
+
+
+def decode_pcm(ffmpeg: str, src: str, sinks: List[Callable[[bytes], None]], trim: Optional[Tuple[float, float]] = None) -> bool:
+    """Decode `src` (or its trim range) into `sinks` on the calling thread; True if ffmpeg succeeded."""
+    return run_pcm(pcm_cmd(ffmpeg, src, trim=trim), sinks).returncode == 0
+
+
+def feed_file(path: str, sinks: List[Callable[[bytes], None]]) -> int:
+    """Feed a raw PCM file (written by a capture's side branch) into `sinks`; returns bytes read."""
+    n = 0
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(PCM_BLOCK)
+            if not data:
+                break
+            for sink in sinks:
+                sink(data)
+            n += len(data)
+    return n
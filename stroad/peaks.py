@@ -0,0 +1,165 @@
+"""
+Waveform peak files: min/max per bin of decoded samples at several zoom
+levels, so a chunk can be drawn and scrubbed without decoding it again.
+Built from the PCM side branch of the encode (pcm.py); bins live in `array('b')`
+(8-bit is plenty for drawing), about 200 KB per hour for all levels.
+
+File layout (little-endian):
+    header  "<4sBBHII"  magic b"STPK", version, channels, levels, rate, samples
+    table   "<II"       per level: samples per bin, bins
+    data                per level: mins then maxs, one signed byte per bin
+"""
+import os
+import struct
+import sys
+from array import array
+from typing import List, Optional, Tuple
+
+from .pcm import RATE
+
+MAGIC = b"STPK"
+VERSION = 1
+_HEADER = struct.Struct("<4sBBHII")
+_LEVEL = struct.Struct("<II")
+
+
+def peaks_path(audio_file: str) -> str:
+    return os.path.splitext(audio_file)[0] + ".peaks"
+
+
+class PeaksBuilder:
+    """
+    Feed raw s16le mono bytes in any pieces; full blocks of `base`-sample
+    bins are reduced as they arrive. Levels above the base are `factor`
+    times coarser each and are derived in finish().
+    """
+
+    def __init__(self, rate: int = RATE, base: int = 400, levels: int = 5, factor: int = 4):
+        self.rate = rate
+        self.base = base
+        self.levels = max(1, levels)
+        self.factor = factor
+        self.mins = array("b")
+        self.maxs = array("b")
+        self.samples = 0
+        self._pending = bytearray()
+        self._block = base * 2 * 64  # 64 bins per block
+
+    def feed(self, data: bytes) -> None:
+        self._pending += data
+        while len(self._pending) >= self._block:
+            block = bytes(self._pending[:self._block])
+            del self._pending[:self._block]
+            self._bins(block)
+
+    def _bins(self, block: bytes) -> None:
+        a = array("h")
+        a.frombytes(block)
+        if sys.byteorder == "big":
+            a.byteswap()
+        base, mins, maxs = self.base, self.mins, self.maxs
+        for k in range(0, len(a), base):
+            s = a[k:k + base]
+            mins.append(min(s) >> 8)
+            maxs.append(max(s) >> 8)
+        self.samples += len(a)
+
+    def finish(self) -> None:
+        tail = bytes(self._pending[:len(self._pending) - len(self._pending) % 2])
+        self._pending.clear()
+        if tail:
+            self._bins(tail)
+
+    def cut(self, keep: List[Tuple[float, float]]) -> None:
+        """Drop the bins outside `keep` (seconds), after silence was cut from the audio."""
+        bin_sec = self.base / self.rate
+        mins, maxs = array("b"), array("b")
+        for a, b in keep:
+            i0, i1 = int(a / bin_sec), min(len(self.mins), int(round(b / bin_sec)))
+            mins.extend(self.mins[i0:i1])
+            maxs.extend(self.maxs[i0:i1])
+        self.mins, self.maxs = mins, maxs
+        self.samples = min(self.samples, len(mins) * self.base)
+
+    def level_arrays(self) -> List[Tuple[int, array, array]]:
+        out = [(self.base, self.mins, self.maxs)]
+        for _ in range(self.levels - 1):
+            spb, lo, hi = out[-1]
+            f = self.factor
+            if len(lo) <= 1:
+                break
+            out.append((spb * f, array("b", (min(lo[k:k + f]) for k in range(0, len(lo), f))),
+                        array("b", (max(hi[k:k + f]) for k in range(0, len(hi), f)))))
+        return out
+
+    def write(self, path: str) -> None:
+        levels = self.level_arrays()
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, 1, len(levels), self.rate, self.samples))
+            for spb, lo, _ in levels:
+                f.write(_LEVEL.pack(spb, len(lo)))
+            for _, lo, hi in levels:
+                f.write(lo.tobytes())
+                f.write(hi.tobytes())
+        os.replace(tmp, path)
+
+
+class Peaks:
+    """A peaks file loaded for drawing."""
+
+    def __init__(self, rate: int, samples: int, levels: List[Tuple[int, array, array]]):
+        self.rate = rate
+        self.samples = samples
+        self.levels = levels
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.rate if self.rate else 0.0
+
+    def columns(self, t0: float, t1: float, width: int) -> List[Tuple[int, int]]:
+        """(min, max) per pixel column for the span t0..t1, from the coarsest level that still resolves it."""
+        width = max(1, int(width))
+        per_col = max(1e-9, (t1 - t0) * self.rate / width)  # samples per column
+        spb, lo, hi = self.levels[0]
+        for lvl in self.levels:
+            if lvl[0] <= per_col:
+                spb, lo, hi = lvl
+        out = []
+        n = len(lo)
+        for x in range(width):
+            b0 = int((t0 * self.rate + x * per_col) / spb)
+            b1 = max(b0 + 1, int((t0 * self.rate + (x + 1) * per_col) / spb))
+            if b0 >= n or b1 <= 0:
+                out.append((0, 0))
+                continue
+            b0, b1 = max(0, b0), min(n, b1)
+            out.append((min(lo[b0:b1]), max(hi[b0:b1])))
+        return out
+
+
+def read_peaks(path: str) -> Optional[Peaks]:
+    """Load a peaks file; None if it is missing or not one of ours."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    magic, version, _channels, nlev, rate, samples = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        return None
+    pos = _HEADER.size
+    table = []
+    for _ in range(nlev):
+        table.append(_LEVEL.unpack_from(data, pos))
+        pos += _LEVEL.size
+    levels = []
+    for spb, bins in table:
+        lo, hi = array("b"), array("b")
+        lo.frombytes(data[pos:pos + bins])
+        hi.frombytes(data[pos + bins:pos + 2 * bins])
+        pos += 2 * bins
+        levels.append((spb, lo, hi))
+    return Peaks(rate, samples, levels)
@@ -0,0 +1,212 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Any, List, Optional
+
+QUEUE_POLICIES = ("block", "copy", "drop-oldest")
+
+def resolve_workers(value, cap: int = 8) -> int:
+    """'auto' (or anything non-numeric) -> CPU count minus one, capped."""
+    s = str(value or "").strip().lower()
+    if s.isdigit() and int(s) > 0:
+        return int(s)
+    return max(1, min(cap, (os.cpu_count() or 2) - 1))
+
+
+class EncodePool:
+    """
+    Bounded pool of encoder threads. Jobs run concurrently, but results are
+    handed to on_result strictly in submission order and one at a time, so
+    manifest order and ok/fail counters stay deterministic.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        run_job: Callable[[Dict[str, Any]], Dict[str, Any]],
+        on_result: Callable[[Dict[str, Any], Dict[str, Any]], None],
+        name: str = "encode",
+        slots: Optional[threading.Semaphore] = None,
+    ):
+        self.workers = max(1, int(workers))
+        self._run_job = run_job
+        self._on_result = on_result
+        # Optional budget shared with other pools (caps encodes process-wide)
+        self._slots = slots
+        self._in: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._lock = threading.RLock()
+        self._done: Dict[int, tuple] = {}
+        self._next_seq = 0
+        self._commit_seq = 0
+        self._running = 0
+        self._committed = threading.Condition(self._lock)
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"{name}-{n}", daemon=True)
+            for n in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, job: Dict[str, Any]) -> int:
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+        self._in.put((seq, job, time.monotonic()))
+        return seq
+
+    def depth(self) -> int:
+        """Jobs waiting or encoding right now."""
+        with self._lock:
+            return self._next_seq - self._commit_seq
+
+    def wait_below(self, n: int) -> None:
+        """Block until fewer than n jobs are waiting or encoding."""
+        with self._committed:
+            while self._next_seq - self._commit_seq >= n:
+                self._committed.wait()
+
+    def running(self) -> int:
+        with self._lock:
+            return self._running
+
+    def close(self) -> None:
+        """Finish everything submitted so far, then stop the workers."""
+        for _ in self._threads:
+            self._in.put(None)
+        for t in self._threads:
+            t.join()
+
+    def _worker(self) -> None:
+        while True:
+            item = self._in.get()
+            if item is None:
+                break
+            seq, job, queued_at = item
+            if self._slots:
+                self._slots.acquire()
+            with self._lock:
+                self._running += 1
+            t0 = time.monotonic()
+            try:
+                result = self._run_job(job)
+            except Exception as e:
+                result = {"ok": False, "error": str(e)}
+            finally:
+                if self._slots:
+                    self._slots.release()
+            result["wait_seconds"] = round(t0 - queued_at, 3)
+            result["encode_seconds"] = round(time.monotonic() - t0, 3)
+            with self._lock:
+                self._running -= 1
+                self._done[seq] = (job, result)
+                # Release results in order; later jobs wait here until earlier ones land.
+                while self._commit_seq in self._done:
+                    j, r = self._done.pop(self._commit_seq)
+                    r["queue_depth"] = self._next_seq - self._commit_seq - 1
+                    try:
+                        self._on_result(j, r)
+                    except Exception:
+                        pass
+                    self._commit_seq += 1
+                self._committed.notify_all()
+
+
+class JobQueue:
+    """
+    Capture -> process hand-off with a budget: jobs and temp-file bytes that
+    are captured but not yet committed (queued or encoding). When a new job
+    would exceed it, `policy` decides:
+
+    - block: the producer waits until the processor catches up
+    - copy: the job is admitted but marked copy_only (remux, no encode)
+    - drop-oldest: queued jobs that haven't started are dropped, oldest
+      first, and handed to on_drop (which owns their temp files)
+
+    max_jobs / max_bytes of 0 mean no limit. None is the end-of-capture
+    sentinel and always passes.
+    """
+
+    def __init__(self, max_jobs: int = 0, max_bytes: int = 0, policy: str = "block", on_drop: Optional[Callable[[Dict[str, Any]], None]] = None):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}' (use {', '.join(QUEUE_POLICIES)}).")
+        self.max_jobs = max(0, int(max_jobs))
+        self.max_bytes = max(0, int(max_bytes))
+        self.policy = policy
+        self._on_drop = on_drop
+        self._items: deque = deque()
+        self._cond = threading.Condition()
+        self._jobs = 0  # outstanding = queued + encoding
+        self._bytes = 0
+        self.high_water_jobs = 0
+        self.high_water_bytes = 0
+        self.blocked_seconds = 0.0
+        self.degraded = 0
+        self.dropped = 0
+
+    def _over(self, size: int) -> bool:
+        # A lone job always fits, however large.
+        return self._jobs > 0 and ((self.max_jobs and self._jobs + 1 > self.max_jobs) or (self.max_bytes and self._bytes + size > self.max_bytes))
+
+    def put(self, job: Optional[Dict[str, Any]]) -> float:
+        """Hand a job over; returns the seconds spent waiting (block policy)."""
+        dropped: List[Dict[str, Any]] = []
+        waited = 0.0
+        with self._cond:
+            if job is not None:
+                size = int(job.get("temp_bytes") or 0)
+                if self._over(size):
+                    if self.policy == "block":
+                        t0 = time.monotonic()
+                        while self._over(size):
+                            self._cond.wait()
+                        waited = time.monotonic() - t0
+                        self.blocked_seconds += waited
+                    elif self.policy == "copy":
+                        job["copy_only"] = True
+                        self.degraded += 1
+                    else:
+                        while self._over(size):
+                            old = next((j for j in self._items if j is not None), None)
+                            if old is None:
+                                break  # everything left is already encoding
+                            self._items.remove(old)
+                            self._release(old)
+                            dropped.append(old)
+                        self.dropped += len(dropped)
+                self._jobs += 1
+                self._bytes += size
+                self.high_water_jobs = max(self.high_water_jobs, self._jobs)
+                self.high_water_bytes = max(self.high_water_bytes, self._bytes)
+            self._items.append(job)
+            self._cond.notify_all()
+        for old in dropped:
+            if self._on_drop: self._on_drop(old)
+        return waited
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            while not self._items:
+                self._cond.wait()
+            return self._items.popleft()
+
+    def done(self, job: Dict[str, Any]) -> None:
+        """The job was committed (or failed): its temp file no longer counts."""
+        with self._cond:
+            self._release(job)
+            self._cond.notify_all()
+
+    def _release(self, job: Dict[str, Any]) -> None:
+        self._jobs = max(0, self._jobs - 1)
+        self._bytes = max(0, self._bytes - int(job.get("temp_bytes") or 0))
+
+    def pending(self) -> int:
+        with self._cond:
+            return self._jobs
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"policy": self.policy, "max_jobs": self.max_jobs, "max_bytes": self.max_bytes,
+                    "high_water_jobs": self.high_water_jobs, "high_water_bytes": self.high_water_bytes,
+                    "blocked_seconds": round(self.blocked_seconds, 3), "degraded": self.degraded, "dropped": self.dropped}
@@ -0,0 +1,195 @@
+"""
+Crash recovery: find sessions whose process died while recording and work
+out what is left to do. The work itself (encoding, manifest updates,
+resuming capture) runs through RecordingEngine.recover(), i.e. the normal
+worker_process path.
+"""
+import os
+import re
+import socket
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from .capture import CAPTURE_MODES
+from .catalog import error_row, to_ts
+from .ffprobe import station_name_from_tags
+from .manifest import read_manifest
+from .utils import pid_alive
+
+TEMP_PREFIX = "stroad_raw_"
+_MEDIA_EXT = (".mka", ".ts")
+_PART = re.compile(r"\.part(\d+)\.mka$")
+
+
+def is_orphaned(data: dict) -> bool:
+    """Status "recording" but the process that wrote it is gone."""
+    sess = data.get("session") or {}
+    if sess.get("status") != "recording":
+        return False
+    pid = sess.get("pid")
+    if pid is None:
+        return True  # written before manifests recorded their process
+    if sess.get("host") not in (None, socket.gethostname()):
+        return False  # can't tell from here (shared folder)
+    return not pid_alive(pid)
+
+
+def find_unfinished(folder: str, max_age_hours: float = 48) -> List[Path]:
+    """
+    Orphaned session manifests in `folder`, oldest first. Only journals are
+    looked at (finalize removes them) and only those written in the last
+    `max_age_hours` (0 = no limit), so startup stays fast on big archives.
+    """
+    cutoff = time.time() - max_age_hours * 3600 if max_age_hours and max_age_hours > 0 else 0
+    found = []
+    try:
+        entries = os.scandir(folder)
+    except OSError:
+        return []
+    with entries:
+        for e in entries:
+            if not e.name.endswith(".session.jsonl"):
+                continue
+            try:
+                mtime = e.stat().st_mtime
+            except OSError:
+                continue
+            if mtime < cutoff:
+                continue
+            snap = Path(e.path).with_suffix(".json")
+            try:
+                data = read_manifest(snap)
+            except (OSError, ValueError):
+                continue
+            if is_orphaned(data):
+                found.append((mtime, snap))
+    return [p for _, p in sorted(found)]
+
+
+def _planned_seconds(data: dict) -> Optional[int]:
+    cfg = data.get("settings") or {}
+    if cfg.get("total_seconds"):
+        return int(cfg["total_seconds"])
+    # Older manifests: planned chunks x chunk length.
+    starts = [e for e in data.get("events", []) if e.get("type") == "capture_start" and e.get("planned_chunks")]
+    if starts and cfg.get("chunk_seconds"):
+        return int(starts[0]["planned_chunks"]) * int(cfg["chunk_seconds"])
+    return None
+
+
+def plan_recovery(path: Union[str, Path]) -> Dict[str, Any]:
+    """
+    What an orphaned session still needs, from its manifest and folder:
+
+    - jobs: chunks that were captured (journaled "chunk_captured") but never
+      saved, ready for the encode pool; jobs whose file is already encoded
+      are only committed
+    - fragments: unreferenced capture files of this session (the chunk in
+      progress at the crash), grouped with their resume parts
+    - junk: leftovers that are useless on their own (lists, tiny files)
+    - remaining_seconds: planned time still ahead, for resuming capture
+    """
+    path = Path(path)
+    folder = path.parent
+    data = read_manifest(path)
+    sess, st, cfg = data["session"], data["station"], data["settings"]
+    sid = sess["id"]
+
+    saved = {c.get("index") for c in data.get("chunks", [])}
+    failed = {error_row(e)[1] for e in data.get("errors", [])}
+    failed.update(e.get("index") for e in data.get("events", []) if e.get("type") == "chunk_skipped")
+    known = saved | failed
+    queued: Dict[int, dict] = {}
+    for e in data.get("events", []):
+        if e.get("type") == "chunk_captured" and isinstance(e.get("job"), dict):
+            queued[e["job"]["i"]] = e["job"]
+    known.update(queued)
+
+    jobs, lost, referenced = [], [], set()
+    for i in sorted(queued):
+        if i in saved or i in failed:
+            continue
+        job = dict(queued[i])
+        temp = str(folder / job["temp_file"]) if job.get("temp_file") else None
+        final = str(folder / job["final_file"])
+        job.update(temp_file=temp, final_file=final, capture=dict(job.get("capture") or {}, recovered=True))
+        if job.get("trim"):
+            job["trim"] = tuple(job["trim"])
+        if temp and os.path.exists(temp) and not job.get("encoded"):
+            referenced.add(os.path.basename(temp))
+            jobs.append(job)
+        elif os.path.exists(final):
+            # Single-pass chunk, or encoded before the crash but never committed.
+            job.update(encoded=True, temp_file=None)
+            jobs.append(job)
+        else:
+            lost.append(i)
+
+    groups: Dict[str, List[str]] = {}
+    junk = []
+    for name in sorted(os.listdir(folder)):
+        if not name.startswith(f"{TEMP_PREFIX}{sid}_") or name in referenced:
+            continue
+        p = str(folder / name)
+        if name.endswith(_MEDIA_EXT) and ".joined." not in name and os.path.getsize(p) >= 20000:
+            groups.setdefault(name.split(".", 1)[0], []).append(p)
+        else:
+            junk.append(p)
+    fragments = []
+    for stem, parts in groups.items():
+        parts.sort(key=lambda p: int(_PART.search(p).group(1)) if _PART.search(p) else 0)
+        fragments.append({"parts": parts, "mtime": max(os.path.getmtime(p) for p in parts)})
+    fragments.sort(key=lambda f: f["mtime"])
+
+    # Where the last known chunk ended: partial captures start there when
+    # their own length can't be measured.
+    ends = [to_ts(c.get("end_local")) for c in data.get("chunks", [])] + [to_ts(j.get("end_iso")) for j in queued.values()]
+    ends = [t for t in ends if t]
+    start = to_ts(sess.get("start_local")) or time.time()
+    planned = _planned_seconds(data)
+    remaining = int(start + planned - time.time()) if planned else 0
+
+    last_job = queued[max(queued)] if queued else {}
+    return {
+        "path": str(path),
+        "folder": str(folder),
+        "session_id": sid,
+        "url": st.get("url") or "",
+        "preset": st.get("preset_name") or "",
+        "album": last_job.get("album") or station_name_from_tags({}, st.get("preset_name")),
+        "output_format": st.get("format"),
+        "capture_mode": cfg.get("capture_mode") if cfg.get("capture_mode") in CAPTURE_MODES else CAPTURE_MODES[0],
+        "chunk_seconds": int(cfg.get("chunk_seconds") or 0),
+        "filename_prefix": cfg.get("filename_prefix") or last_job.get("artist"),
+        "saved": len(saved),
+        "next_index": max([i for i in known if i] or [0]) + 1,
+        "jobs": jobs,
+        "lost": lost,
+        "fragments": fragments,
+        "junk": junk,
+        "last_end": datetime.fromtimestamp(max(ends) if ends else start),
+        "remaining_seconds": max(0, remaining),
+    }
+
+
+def recovery_config(cfg: dict, plan: Dict[str, Any]) -> dict:
+    """Engine settings for recovering `plan`: the session's own values over `cfg`."""
+    out = dict(cfg)
+    out.update(output_path=plan["folder"], selected_preset=plan["preset"], capture_mode=plan["capture_mode"])
+    if plan["output_format"]:
+        out["output_format"] = plan["output_format"]
+    if plan["chunk_seconds"]:
+        out["chunk_time_str"] = str(plan["chunk_seconds"])
+    if plan["filename_prefix"]:
+        out["filename_prefix"] = plan["filename_prefix"]
+    return out
+
+
+def fragment_times(plan: Dict[str, Any], mtime: float, length: Optional[float]):
+    """(start, end, length) of a partial capture that was last written at `mtime`."""
+    end = datetime.fromtimestamp(mtime)
+    if not length or length <= 0:
+        length = max(0.0, (end - plan["last_end"]).total_seconds())
+    return end - timedelta(seconds=length), end, length
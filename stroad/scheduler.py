@@ -0,0 +1,360 @@
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, time as dtime
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from .multi import MultiRecorder
+from .streams import resolve_stream_url
+from .tap import StreamTap
+from .utils import find_bin, parse_time_string, safe_int
+
+_DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+_DAY_ALIASES = {"daily": range(7), "*": range(7), "weekdays": range(5), "weekends": (5, 6)}
+# Keys of a schedule entry that are not engine settings
+_ENTRY_KEYS = {"name", "station", "url", "days", "start", "end", "duration", "lead_sec", "enabled"}
+# A late start still records if at least this much of the slot is left.
+MIN_CATCH_UP_SEC = 30
+
+
+def default_schedule_path() -> Path:
+    return Path.home() / ".stroad2_schedule.json"
+
+
+# -------------------- schedule file --------------------
+def parse_days(value) -> FrozenSet[int]:
+    """'mon-fri', 'sat,sun', 'fri-mon', 'weekdays', 'daily' (or a list of those) -> weekday numbers."""
+    if value is None or value == "":
+        return frozenset(range(7))
+    if isinstance(value, (list, tuple)):
+        value = ",".join(str(v) for v in value)
+    days = set()
+    for part in str(value).lower().replace(" ", "").split(","):
+        if part in _DAY_ALIASES:
+            days.update(_DAY_ALIASES[part])
+            continue
+        a, _, b = part.partition("-")
+        if a[:3] not in _DAYS or (b and b[:3] not in _DAYS):
+            raise ValueError(f"unknown day '{part}'")
+        i, j = _DAYS.index(a[:3]), _DAYS.index((b or a)[:3])
+        days.update((i + k) % 7 for k in range((j - i) % 7 + 1))
+    return frozenset(days)
+
+
+def parse_clock(value: str) -> dtime:
+    try:
+        h, _, m = str(value).strip().partition(":")
+        return dtime(int(h), int(m or 0))
+    except ValueError:
+        raise ValueError(f"bad time of day '{value}' (use HH:MM)")
+
+
+def load_schedule_file(path: Optional[str] = None) -> dict:
+    """{"defaults": {...}, "lead_sec": {station: seconds}, "entries": [...]}; a bare list is taken as entries."""
+    p = Path(path) if path else default_schedule_path()
+    if not p.exists():
+        return {"defaults": {}, "lead_sec": {}, "entries": []}
+    data = json.loads(p.read_text(encoding="utf-8"))
+    if isinstance(data, list):
+        data = {"entries": data}
+    return {"defaults": data.get("defaults") or {}, "lead_sec": data.get("lead_sec") or {}, "entries": data.get("entries") or []}
+
+
+def save_schedule_file(data: dict, path: Optional[str] = None) -> None:
+    p = Path(path) if path else default_schedule_path()
+    tmp = p.with_suffix(p.suffix + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(p)
+
+
+def parse_entries(data: dict, default_lead: int = 30) -> List[dict]:
+    """
+    Normalized entries: name, days, start (time), seconds, lead, spec (the
+    session spec for MultiRecorder.add). Lead time: entry "lead_sec", then
+    the file's per-station "lead_sec" map, then `default_lead`.
+    """
+    out, names = [], set()
+    for n, raw in enumerate(data.get("entries") or [], start=1):
+        item = dict(data.get("defaults") or {})
+        item.update(raw)
+        if not item.get("enabled", True):
+            continue
+        station = item.get("station") or item.get("selected_preset") or ""
+        name = item.get("name") or station or item.get("url") or f"entry{n}"
+        if name in names:
+            raise ValueError(f"duplicate schedule entry name '{name}'")
+        names.add(name)
+        start = parse_clock(item.get("start") or "")
+        if item.get("duration"):
+            seconds = parse_time_string(str(item["duration"]))
+        elif item.get("end"):
+            end = parse_clock(item["end"])
+            seconds = ((end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)) % (24 * 60) * 60 or 24 * 3600
+        else:
+            raise ValueError(f"{name}: needs 'end' or 'duration'")
+        if seconds <= 0:
+            raise ValueError(f"{name}: empty time slot")
+        leads = data.get("lead_sec") or {}
+        lead = item.get("lead_sec", leads.get(station, leads.get(name, default_lead)))
+        spec = {k: v for k, v in item.items() if k not in _ENTRY_KEYS}
+        spec["name"] = name
+        if item.get("url"):
+            spec["url"] = item["url"]
+        if station:
+            spec["selected_preset"] = station
+        out.append({"name": name, "days": parse_days(item.get("days")), "start": start, "seconds": int(seconds),
+                    "lead": max(0, safe_int(lead, default=default_lead)), "spec": spec})
+    return out
+
+
+def occurrence(entry: dict, now: datetime) -> Tuple[datetime, datetime]:
+    """The first slot of `entry` that has not ended by `now` (it may have started already)."""
+    for d in range(-1, 8):
+        day = (now + timedelta(days=d)).date()
+        if day.weekday() not in entry["days"]:
+            continue
+        start = datetime.combine(day, entry["start"])
+        end = start + timedelta(seconds=entry["seconds"])
+        if end > now:
+            return start, end
+    raise ValueError(f"{entry['name']}: no days selected")
+
+
+# -------------------- timer wheel --------------------
+class TimerWheel:
+    """
+    Hashed timing wheel: `slots` buckets of `tick` seconds. Adding and
+    cancelling a timer are O(1) and each tick looks at one bucket only, so
+    hundreds of schedule entries cost nothing between deadlines. Timers more
+    than one revolution away stay in their bucket for further rounds.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512, now: Optional[float] = None):
+        self.tick = float(tick)
+        self.slots = int(slots)
+        self._buckets: List[Dict[int, tuple]] = [{} for _ in range(self.slots)]
+        self._where: Dict[int, int] = {}
+        self._ids = itertools.count(1)
+        self._cur = int((time.time() if now is None else now) // self.tick)  # last tick processed
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def add(self, deadline: float, item: Any) -> int:
+        """Fire `item` at the first tick at or after `deadline` (epoch seconds); returns a handle."""
+        with self._lock:
+            t = max(int(math.ceil(deadline / self.tick)), self._cur + 1)
+            h = next(self._ids)
+            slot = t % self.slots
+            self._buckets[slot][h] = (t, item)
+            self._where[h] = slot
+            return h
+
+    def cancel(self, handle: int) -> bool:
+        with self._lock:
+            slot = self._where.pop(handle, None)
+            if slot is None:
+                return False
+            del self._buckets[slot][handle]
+            return True
+
+    def advance(self, now: Optional[float] = None) -> List[Any]:
+        """Items whose deadline has passed, in deadline order."""
+        target = int((time.time() if now is None else now) // self.tick)
+        due = []
+        with self._lock:
+            # After a long sleep one full revolution visits every bucket.
+            for k in range(1, min(target - self._cur, self.slots) + 1):
+                bucket = self._buckets[(self._cur + k) % self.slots]
+                for h in [h for h, (t, _) in bucket.items() if t <= target]:
+                    t, item = bucket.pop(h)
+                    del self._where[h]
+                    due.append((t, h, item))
+            self._cur = max(self._cur, target)
+        return [item for _, _, item in sorted(due, key=lambda d: d[:2])]
+
+
+# -------------------- scheduler --------------------
+class Scheduler:
+    """
+    Starts recordings from the schedule file on time. Each slot arms one
+    timer `lead` seconds before its start: that opens a StreamTap so the
+    connection is up when the slot begins, and a second timer at the start
+    records from the tap, from the exact start time on. Slots that are
+    already running when the scheduler starts (or wakes up) are recorded
+    for what is left and noted as a catch-up in the session manifest.
+    """
+
+    def __init__(self, cfg: dict, presets: dict, path: Optional[str] = None, log: Optional[Callable[[str], None]] = None,
+                 max_encoders=None, per_host: int = 2):
+        self.cfg = cfg
+        self.presets = presets
+        self.path = path or (cfg.get("schedule_path") or "").strip() or str(default_schedule_path())
+        self.log = log or (lambda line: None)
+        self.rec = MultiRecorder(cfg, presets, max_encoders=max_encoders, per_host=per_host, log_sink=self.log)
+        self.wheel = TimerWheel()
+        self.entries: Dict[str, dict] = {}
+        self.active: Dict[str, dict] = {}  # name -> {"engine", "tap", "end"}
+        self._timers: Dict[str, List[int]] = {}
+        self._taps: Dict[str, StreamTap] = {}  # pre-connected, not recording yet
+        self._mtime = None
+        self._stop = threading.Event()
+
+    def _say(self, msg: str) -> None:
+        self.log(f"[{datetime.now():%H:%M:%S}] SCHEDULE: {msg}")
+
+    def load(self) -> int:
+        data = load_schedule_file(self.path)
+        entries = parse_entries(data, safe_int(self.cfg.get("schedule_lead_sec"), default=30))
+        for name in list(self._timers):
+            self._disarm(name)
+        self.entries = {e["name"]: e for e in entries}
+        try: self._mtime = os.path.getmtime(self.path)
+        except OSError: self._mtime = None
+        for e in entries:
+            self._arm(e, datetime.now())
+        return len(entries)
+
+    def _arm(self, entry: dict, after: datetime) -> None:
+        start, end = occurrence(entry, after)
+        ts = start.timestamp()
+        if entry["lead"] > 0 and ts > time.time():
+            lead_at = max(ts - entry["lead"], time.time())
+            self._timers.setdefault(entry["name"], []).append(self.wheel.add(lead_at, ("preconnect", entry["name"], start, end)))
+        self._timers.setdefault(entry["name"], []).append(self.wheel.add(ts, ("start", entry["name"], start, end)))
+
+    def _disarm(self, name: str) -> None:
+        for h in self._timers.pop(name, []):
+            self.wheel.cancel(h)
+        tap = self._taps.pop(name, None)
+        if tap: tap.stop()
+
+    def upcoming(self, now: Optional[datetime] = None) -> List[Tuple[datetime, datetime, dict]]:
+        now = now or datetime.now()
+        return sorted((occurrence(e, now) + (e,) for e in self.entries.values()), key=lambda r: r[0])
+
+    # -------------------- run loop --------------------
+    def run(self) -> None:
+        self._say(f"{self.load()} entries from {self.path}")
+        for start, end, e in self.upcoming()[:5]:
+            self._say(f"next: {start:%a %Y-%m-%d %H:%M}–{end:%H:%M} {e['name']}")
+        last_check = time.monotonic()
+        while not self._stop.is_set():
+            for kind, name, start, end in self.wheel.advance():
+                try:
+                    (self._preconnect if kind == "preconnect" else self._start)(name, start, end)
+                except Exception as ex:
+                    self._say(f"{name}: {kind} failed: {ex}")
+            self._reap()
+            if time.monotonic() - last_check >= 30:
+                last_check = time.monotonic()
+                self._reload_if_changed()
+            self._stop.wait(self.wheel.tick - time.time() % self.wheel.tick)
+        self._shutdown()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _reload_if_changed(self) -> None:
+        try: m = os.path.getmtime(self.path)
+        except OSError: m = None
+        if m == self._mtime: return
+        try:
+            n = self.load()
+            self._say(f"schedule file changed, {n} entries loaded")
+        except (OSError, ValueError) as ex:
+            self._mtime = m
+            self._say(f"schedule file not reloaded: {ex}")
+
+    def _session_cfg(self, entry: dict) -> Tuple[dict, str]:
+        spec = dict(entry["spec"])
+        cfg = dict(self.rec.base_cfg)
+        cfg.update(spec)
+        if "selected_preset" not in spec:
+            cfg["selected_preset"] = spec["name"] if spec["name"] in self.presets else "Custom URL"
+        url = (spec.get("url") or "").strip() or resolve_stream_url(cfg, self.presets)
+        return cfg, url
+
+    def _preconnect(self, name: str, start: datetime, end: datetime) -> None:
+        entry = self.entries.get(name)
+        if entry is None or name in self.active: return
+        cfg, url = self._session_cfg(entry)
+        ffmpeg = (cfg.get("ffmpeg_path") or "").strip() or find_bin("ffmpeg")
+        if not url or not ffmpeg: return
+        # The early connection counts against --per-host like any other; with
+        # no slot free the session simply connects at its start time.
+        hosts = self.rec.hosts
+        if not hosts.acquire(url, block=False):
+            self._say(f"{name}: no free connection to {hosts.host_of(url)}, not pre-connecting")
+            return
+        tap = StreamTap(ffmpeg, url, seconds=entry["lead"] + 5, max_bytes=safe_int(cfg.get("timeshift_max_mb"), default=64) << 20,
+                        log=lambda m: self._say(f"{name}: {m}"), stall_sec=safe_int(cfg.get("stall_timeout_sec"), default=20),
+                        icy=cfg.get("track_metadata") != "off", on_stop=lambda: hosts.release(url))
+        tap.start()
+        self._taps[name] = tap
+        self._say(f"{name}: connecting {entry['lead']}s ahead of {start:%H:%M}")
+
+    def _start(self, name: str, start: datetime, end: datetime) -> None:
+        entry = self.entries.get(name)
+        if entry is None: return
+        self._timers.pop(name, None)
+        self._arm(entry, end)  # next slot
+        now = datetime.now()
+        tap = self._taps.pop(name, None)
+        if name in self.active:
+            self._say(f"{name}: previous slot still recording, {start:%H:%M} skipped")
+            if tap: tap.stop()
+            return
+        left = (end - now).total_seconds()
+        late = max(0.0, (now - start).total_seconds())
+        if left < 1 or (late >= 2 and left < MIN_CATCH_UP_SEC):
+            self._say(f"{name}: missed the {start:%a %H:%M} slot")
+            if tap: tap.stop()
+            return
+        if tap:
+            # Chunk 1 reaches back to the planned start (as far as the buffer goes).
+            tap.seconds = late
+        seconds = int(math.ceil(left))
+        spec = dict(entry["spec"], total_time_str=str(seconds))
+        engine = self.rec.add(spec, tap=tap)
+        try:
+            engine.start()
+        except ValueError as ex:
+            self._say(f"{name}: not started: {ex}")
+            if tap: tap.stop()
+            return
+        self.active[name] = {"engine": engine, "tap": tap, "end": end}
+        m = engine.manifest
+        m.event("scheduled", entry=name, planned_start=start.astimezone().isoformat(timespec="seconds"),
+                planned_end=end.astimezone().isoformat(timespec="seconds"), lead_sec=entry["lead"],
+                preconnected=tap is not None, connects=tap.connects if tap else None)
+        if late >= 2:
+            back = min(late, tap.buffered_seconds()) if tap else 0.0
+            m.event("schedule_catch_up", late_seconds=round(late, 1), recorded_seconds=seconds, from_buffer_seconds=round(back, 1))
+            self._say(f"{name}: started {late:.0f}s late (catch-up), recording the remaining {seconds}s")
+        else:
+            self._say(f"{name}: recording until {end:%H:%M}" + (" (pre-connected)" if tap else ""))
+
+    def _reap(self) -> None:
+        for name, run in list(self.active.items()):
+            if run["engine"].is_running: continue
+            if run["tap"]: run["tap"].stop()
+            del self.active[name]
+            self._say(f"{name}: session {run['engine'].status}")
+        self.rec.prune()
+
+    def _shutdown(self) -> None:
+        for name in list(self._timers):
+            self._disarm(name)
+        for tap in self._taps.values():
+            tap.stop()
+        self.rec.stop_all()
+        self.rec.wait()
+        for run in self.active.values():
+            if run["tap"]: run["tap"].stop()
+        self.active.clear()
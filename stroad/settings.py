@@ -15,9 +15,45 @@ DEFAULTS = {
     "chunk_time_str": "15m",
     "fade_duration": "3",
     "filename_prefix": "STROAD_Rec",
+    "capture_mode": "Per-chunk (reconnect)",  # Per-chunk (reconnect) | Continuous (gapless) | Per-chunk (single-pass encode)
     "output_path": str(Path.home() / "Downloads"),
 
-    "output_format": "MP3 (encoded)"
+    "output_format": "MP3 (encoded)",
+    "extra_outputs": "",  # more files per chunk from the same decode, e.g. "FLAC" or "M4A, FLAC" (mp3 | m4a | flac)
+    "encode_workers": "auto",  # number of parallel encoders, or "auto" (CPU count - 1)
+    "metadata_ttl_sec": 300,  # how long probed ICY/ffprobe tags are reused per stream URL
+    "handover_overlap_sec": 0,  # per-chunk mode: connect the next chunk this early and cut in the overlap (0 = off)
+    "timeshift_minutes": 10,  # how far back RECORD reaches while the time-shift buffer is on
+    "timeshift_max_mb": 64,  # fixed memory ceiling of the time-shift buffer
+    "track_metadata": "cues",  # in-band ICY titles on tapped streams: off | cues (per-chunk cue list) | split (also cut chunks at track changes)
+    "silence_action": "off",  # dead air found while processing (needs NumPy): off | mark (manifest only) | trim (cut it out) | skip (drop mostly silent chunks)
+    "silence_threshold_db": -50,  # RMS level (dBFS) below which audio counts as silent
+    "silence_min_sec": 10,  # shorter pauses are not reported
+    "silence_skip_ratio": 0.95,  # skip: drop chunks at least this silent
+    "loudness": "measure",  # EBU R128 in the encode pass: off | measure (manifest + station profile) | normalize (gain from the station profile)
+    "loudness_target_lufs": -16,  # normalize: integrated loudness to aim for
+    "loudness_max_gain_db": 12,  # normalize: never change the level by more than this
+    "loudness_profile_path": "",  # per-station loudness profiles (default ~/.stroad2_loudness.json)
+    "waveform_peaks": "on",  # write <chunk>.peaks (waveform levels for the viewer) while processing: on | off
+    "queue_max_jobs": 16,  # captured chunks waiting for / in the encoders (0 = no limit)
+    "queue_max_mb": 4096,  # temp files waiting for / in the encoders (0 = no limit)
+    "queue_policy": "block",  # when over the limits: block (capture waits) | copy (save new chunks as captured, no encode) | drop-oldest (drop queued chunks)
+    "disk_min_free_mb": 500,  # stop capturing when the output volume has less free space
+    "disk_warn_free_mb": 2000,  # log and journal a warning below this
+    "health_cache_path": "",  # stream check results (default ~/.stroad2_health.json)
+    "health_timeout_sec": 8,  # stream check: limit for the connect and for ffprobe
+    "health_stale_hours": 24,  # older check results show as stale
+    "log_scrollback_lines": 5000,  # lines kept in the GUI log (older ones are dropped from the widget)
+    "log_dir": "",  # also write the GUI log to <dir>/stroad.log, rotated (empty = off)
+    "log_max_mb": 10,  # rotate stroad.log at this size
+    "log_backups": 5,  # rotated files kept (stroad.log.1 ...)
+    "stall_timeout_sec": 20,  # reconnect when no audio arrives for this long (0 = off)
+    "connect_timeout_sec": 30,  # reconnect when a new connection delivers no audio within this long (0 = off)
+    "recover_on_start": "encode",  # unfinished sessions found at startup: off | encode (save leftovers) | resume (and keep recording)
+    "recovery_max_age_hours": 48,  # only sessions last written this recently are checked at startup
+    "schedule_path": "",  # recurring recordings ("" = ~/.stroad2_schedule.json), run with `python -m stroad schedule run`
+    "schedule_lead_sec": 30,  # connect this long before a scheduled start (per station: "lead_sec" in the schedule file)
+    "catalog_path": "",  # SQLite catalog of all sessions ("" = ~/.stroad2_catalog.sqlite, "off" = disabled)
 }
 
 def settings_path() -> Path:
@@ -0,0 +1,133 @@
+"""
+Silence / dead-air detection on decoded PCM (see pcm.py). SilenceAnalyser
+consumes the low-rate mono stream in fixed-size blocks (RMS per window,
+vectorized with NumPy), so memory stays constant whatever the chunk length. NumPy is optional: without it analysis is off.
+"""
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from .pcm import RATE, decode_pcm
+
+SILENCE_ACTIONS = ("off", "mark", "trim", "skip")
+
+
+def available() -> bool:
+    return np is not None
+
+
+class SilenceAnalyser:
+    """
+    Feed raw s16le mono bytes in any pieces; they are analysed one block
+    (`block_sec`, a whole number of `window` windows) at a time. A window is
+    silent when its RMS is below `threshold_db` dBFS; runs of silent windows
+    of at least `min_sec` become regions (start, end) in seconds.
+    """
+
+    def __init__(self, threshold_db: float = -50.0, min_sec: float = 10.0, window: float = 0.1, block_sec: float = 8.0, rate: int = RATE):
+        self.rate = rate
+        self.win = max(1, int(rate * window))
+        self.block = self.win * max(1, int(block_sec / window))
+        self.min_windows = max(1, int(math.ceil(min_sec / window)))
+        self.threshold = 32768.0 ** 2 * 10 ** (threshold_db / 10.0)  # mean square
+        self._pending = bytearray()
+        self._windows = 0  # windows analysed so far
+        self._run_start = None  # first window of the current silent run
+        self._peak_ms = 0.0
+        self._sum_ms = 0.0
+        self.regions: List[Tuple[float, float]] = []
+
+    @property
+    def seconds(self) -> float:
+        return self._windows * self.win / self.rate
+
+    def feed(self, data: bytes) -> None:
+        self._pending += data
+        size = self.block * 2
+        while len(self._pending) >= size:
+            block = bytes(self._pending[:size])
+            del self._pending[:size]
+            self._analyse(np.frombuffer(block, dtype="<i2"))
+
+    def _analyse(self, samples) -> None:
+        n = len(samples) // self.win
+        if not n:
+            return
+        x = samples[:n * self.win].astype(np.float32).reshape(n, self.win)
+        ms = np.einsum("ij,ij->i", x, x) / self.win
+        self._peak_ms = max(self._peak_ms, float(ms.max()))
+        self._sum_ms += float(ms.sum())
+        silent = ms < self.threshold
+        # Run boundaries inside the block, carried across blocks by _run_start.
+        edges = np.flatnonzero(np.diff(silent.astype(np.int8))) + 1
+        cuts = [0] + edges.tolist() + [n]
+        for a, b in zip(cuts, cuts[1:]):
+            if silent[a]:
+                if self._run_start is None:
+                    self._run_start = self._windows + a
+            else:
+                self._close_run(self._windows + a)
+        self._windows += n
+
+    def _close_run(self, end_window: int) -> None:
+        if self._run_start is not None and end_window - self._run_start >= self.min_windows:
+            self.regions.append((self._run_start * self.win / self.rate, end_window * self.win / self.rate))
+        self._run_start = None
+
+    def finish(self) -> Dict[str, Any]:
+        tail = bytes(self._pending[:len(self._pending) - len(self._pending) % 2])
+        self._pending.clear()
+        if tail:
+            self._analyse(np.frombuffer(tail, dtype="<i2"))
+        self._close_run(self._windows)
+        silent = sum(b - a for a, b in self.regions)
+        db = lambda ms: round(10 * math.log10(ms / 32768.0 ** 2), 1) if ms > 0 else None
+        return {
+            "length": round(self.seconds, 3),
+            "regions": [[round(a, 2), round(b, 2)] for a, b in self.regions],
+            "silent_seconds": round(silent, 2),
+            "silent_ratio": round(silent / self.seconds, 4) if self.seconds else 0.0,
+            "max_rms_db": db(self._peak_ms),
+            "mean_rms_db": db(self._sum_ms / self._windows) if self._windows else None,
+        }
+
+
+def analyse_file(ffmpeg: str, src: str, threshold_db: float = -50.0, min_sec: float = 10.0, trim: Optional[Tuple[float, float]] = None) -> Optional[Dict[str, Any]]:
+    """Decode `src` (or its trim range) and analyse it; None if NumPy is missing or decoding failed."""
+    if np is None:
+        return None
+    t0 = time.perf_counter()
+    an = SilenceAnalyser(threshold_db=threshold_db, min_sec=min_sec)
+    ok = decode_pcm(ffmpeg, src, [an.feed], trim=trim)
+    out = an.finish()
+    if not ok or not an.seconds:
+        return None
+    out["analysis_seconds"] = round(time.perf_counter() - t0, 3)
+    return out
+
+
+def keep_ranges(regions: List[List[float]], length: float, pad: float = 0.5) -> List[Tuple[float, float]]:
+    """Audio to keep when the silent `regions` are cut out, leaving `pad` seconds of each."""
+    keep, pos = [], 0.0
+    for a, b in regions:
+        a2 = a + pad if a > 0 else 0.0
+        b2 = b - pad if b < length else length
+        if b2 <= a2:
+            continue
+        if a2 > pos:
+            keep.append((pos, a2))
+        pos = b2
+    if pos < length:
+        keep.append((pos, length))
+    return keep
+
+
+def cut_filter(keep: List[Tuple[float, float]]) -> str:
+    """Filter that keeps only the `keep` ranges and closes the gaps (timestamps rebuilt)."""
+    expr = "+".join("between(t,%.3f,%.3f)" % (a, b) for a, b in keep)
+    return f"aselect='{expr}',asetpts=N/SR/TB"
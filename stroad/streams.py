@@ -0,0 +1,30 @@
+import os
+import json
+
+DEFAULT_STREAMS = {
+    "Jazz24 (128k MP3)": "https://knkx-live-a.edge.audiocdn.com/6285_128k",
+    "Jazz24 (256k AAC)": "https://knkx-live-a.edge.audiocdn.com/6285_256k",
+    "BBC Radio 1 (HLS)": "http://as-hls-ww-live.akamaized.net/pool_904/live/ww/bbc_radio_one/bbc_radio_one.isml/bbc_radio_one-audio=96000.norewind.m3u8",
+    "SomaFM Groove Salad": "http://ice1.somafm.com/groovesalad-128-mp3",
+    "Custom URL": ""
+}
+
+def load_streams(path: str = "streams.json") -> dict:
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                loaded = json.load(f)
+                if "Custom URL" not in loaded: loaded["Custom URL"] = ""
+                return loaded
+        except Exception: pass
+    return dict(DEFAULT_STREAMS)
+
+def save_streams(presets: dict, path: str = "streams.json") -> None:
+    with open(path, 'w') as f:
+        json.dump(presets, f, indent=4)
+
+def resolve_stream_url(cfg: dict, presets: dict) -> str:
+    preset = cfg.get("selected_preset") or ""
+    if preset == "Custom URL" or preset not in presets:
+        return (cfg.get("custom_url") or "").strip()
+    return (presets.get(preset) or "").strip()
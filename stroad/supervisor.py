@@ -0,0 +1,283 @@
+import asyncio
+import concurrent.futures
+import os
+import subprocess
+import sys
+import threading
+import warnings
+from collections import deque
+from typing import Callable, Deque, List, Optional
+
+
+class ChildResult:
+    def __init__(self, returncode: int, stderr_lines: List[str], stdout: bytes = b"", timed_out: bool = False, cancelled: bool = False):
+        self.returncode = returncode
+        self.stderr_lines = stderr_lines
+        self.stdout = stdout
+        self.timed_out = timed_out
+        self.cancelled = cancelled
+
+    @property
+    def stderr(self) -> str:
+        return "\n".join(self.stderr_lines)
+
+
+class StdoutPipe:
+    """
+    Bounded hand-off of a child's stdout to one consumer thread. While
+    `max_blocks` blocks are waiting the supervisor stops reading the pipe,
+    so a slow consumer makes the child wait on its write instead of the
+    output piling up in memory. get() returns None at EOF.
+    """
+
+    def __init__(self, max_blocks: int = 16):
+        self.max_blocks = max(1, max_blocks)
+        self._blocks: Deque[Optional[bytes]] = deque()
+        self._cond = threading.Condition()
+        self._waiter = None  # loop-side future while the pipe is full
+        self._loop = None
+        self._abandoned = False
+
+    async def put(self, block: bytes) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._abandoned:
+                    return
+                if len(self._blocks) < self.max_blocks:
+                    self._blocks.append(block)
+                    self._cond.notify()
+                    return
+                self._loop, self._waiter = loop, loop.create_future()
+                waiter = self._waiter
+            await waiter
+
+    def close(self) -> None:
+        with self._cond:
+            self._blocks.append(None)
+            self._cond.notify()
+
+    def get(self) -> Optional[bytes]:
+        with self._cond:
+            while not self._blocks:
+                self._cond.wait()
+            block = self._blocks.popleft()
+            self._wake()
+            return block
+
+    def abandon(self) -> None:
+        """Consumer gives up: the rest of the output is read and dropped."""
+        with self._cond:
+            self._abandoned = True
+            self._blocks.clear()
+            self._wake()
+
+    def _wake(self) -> None:
+        w, self._waiter = self._waiter, None
+        if w is not None:
+            self._loop.call_soon_threadsafe(lambda: w.done() or w.set_result(None))
+
+
+class Child:
+    """Handle to a supervised process. All methods are safe to call from any thread."""
+
+    def __init__(self, sup: "ProcessSupervisor", cmd: List[str]):
+        self.cmd = cmd
+        self.pid: Optional[int] = None
+        self.future: "concurrent.futures.Future[ChildResult]" = concurrent.futures.Future()
+        self._sup = sup
+        self._proc = None
+        self._cancel_requested = False
+
+    @property
+    def running(self) -> bool:
+        return not self.future.done()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[ChildResult]:
+        """Result once the process has exited, or None if `timeout` passes first."""
+        try:
+            return self.future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            return None
+
+    def terminate(self) -> None:
+        self._cancel_requested = True
+        self._sup._call(self._signal, False)
+
+    def kill(self) -> None:
+        self._cancel_requested = True
+        self._sup._call(self._signal, True)
+
+    def _signal(self, kill: bool) -> None:
+        p = self._proc
+        if p is None or p.returncode is not None:
+            return
+        try:
+            p.kill() if kill else p.terminate()
+        except ProcessLookupError:
+            pass
+
+
+class ProcessSupervisor:
+    """
+    One asyncio loop on a background thread owns every ffmpeg/ffprobe/ffplay
+    child: pipes are read without blocking, exits resolve futures, and
+    timeouts/cancellation escalate terminate -> kill. Callers get a Child
+    handle and never need a reader thread or a poll() loop.
+    """
+
+    def __init__(self, kill_grace: float = 3.0):
+        self.kill_grace = kill_grace
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="stroad-supervisor", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        _install_child_watcher(self._loop)
+        self._ready.set()
+        self._loop.run_forever()
+
+    def _call(self, fn, *args) -> None:
+        self._loop.call_soon_threadsafe(fn, *args)
+
+    # -------------------- API --------------------
+    def spawn(
+        self,
+        cmd: List[str],
+        timeout: Optional[float] = None,
+        capture_stdout: bool = False,
+        on_stdout_line: Optional[Callable[[str], None]] = None,
+        on_stderr_line: Optional[Callable[[str], None]] = None,
+        stderr_tail: int = 400,
+        stdin=subprocess.DEVNULL,
+        on_stdout_data: Optional[Callable[[bytes], None]] = None,
+        stdout_pipe: Optional[StdoutPipe] = None,
+    ) -> Child:
+        """
+        Start `cmd`. Line/data callbacks run on the supervisor loop and must
+        not block. With capture_stdout the raw stdout bytes end up in the
+        result; on_stdout_data receives them as they arrive instead, and
+        stdout_pipe hands them to a consumer thread with backpressure.
+        """
+        child = Child(self, cmd)
+        asyncio.run_coroutine_threadsafe(
+            self._supervise(child, timeout, capture_stdout, on_stdout_line, on_stderr_line, stderr_tail, stdin, on_stdout_data, stdout_pipe),
+            self._loop,
+        )
+        return child
+
+    def run(self, cmd: List[str], timeout: Optional[float] = None, capture_stdout: bool = False) -> ChildResult:
+        """spawn() and wait for the exit."""
+        return self.spawn(cmd, timeout=timeout, capture_stdout=capture_stdout).future.result()
+
+    # -------------------- loop side --------------------
+    async def _supervise(self, child, timeout, capture_stdout, on_stdout_line, on_stderr_line, tail_len, stdin, on_stdout_data=None, stdout_pipe=None) -> None:
+        tail: Deque[str] = deque(maxlen=tail_len)
+        out_chunks: List[bytes] = []
+        want_stdout = capture_stdout or on_stdout_line is not None or on_stdout_data is not None or stdout_pipe is not None
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *child.cmd,
+                stdin=stdin,
+                stdout=asyncio.subprocess.PIPE if want_stdout else asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except Exception as e:
+            if stdout_pipe is not None: stdout_pipe.close()
+            child.future.set_result(ChildResult(-1, [f"spawn failed: {e}"]))
+            return
+        child._proc = proc
+        child.pid = proc.pid
+        if child._cancel_requested:
+            child._signal(False)
+
+        async def read_lines(stream, sink: Optional[Callable[[str], None]], keep: bool):
+            while True:
+                line = await stream.readline()
+                if not line:
+                    break
+                text = line.decode("utf-8", "replace").rstrip("\r\n")
+                if keep:
+                    tail.append(text)
+                if sink:
+                    try: sink(text)
+                    except Exception: pass
+
+        async def read_raw(stream, sink: Optional[Callable[[bytes], None]]):
+            while True:
+                block = await stream.read(65536)
+                if not block:
+                    break
+                if stdout_pipe is not None:
+                    await stdout_pipe.put(block)
+                    continue
+                if sink is None:
+                    out_chunks.append(block)
+                    continue
+                try: sink(block)
+                except Exception: pass
+
+        readers = [asyncio.ensure_future(read_lines(proc.stderr, on_stderr_line, True))]
+        if want_stdout:
+            readers.append(asyncio.ensure_future(
+                read_lines(proc.stdout, on_stdout_line, False) if on_stdout_line else read_raw(proc.stdout, on_stdout_data)
+            ))
+
+        timed_out = False
+        try:
+            await asyncio.wait_for(proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            await self._stop(proc)
+        await asyncio.gather(*readers, return_exceptions=True)
+        if stdout_pipe is not None: stdout_pipe.close()
+        child.future.set_result(ChildResult(
+            proc.returncode if proc.returncode is not None else -1,
+            list(tail),
+            b"".join(out_chunks),
+            timed_out=timed_out,
+            cancelled=child._cancel_requested,
+        ))
+
+    async def _stop(self, proc) -> None:
+        try:
+            proc.terminate()
+            await asyncio.wait_for(proc.wait(), self.kill_grace)
+        except asyncio.TimeoutError:
+            try: proc.kill()
+            except ProcessLookupError: pass
+            await proc.wait()
+        except ProcessLookupError:
+            pass
+
+
+def _install_child_watcher(loop) -> None:
+    # Python < 3.12 defaults to a waitpid thread per child on Unix; use pidfd
+    # exit notifications instead where the kernel supports them.
+    if sys.platform != "linux" or sys.version_info >= (3, 12) or not hasattr(asyncio, "PidfdChildWatcher"):
+        return
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            watcher = asyncio.PidfdChildWatcher()
+            watcher.attach_loop(loop)
+            asyncio.set_child_watcher(watcher)
+    except Exception:
+        pass
+
+
+_default: Optional[ProcessSupervisor] = None
+_default_lock = threading.Lock()
+
+
+def get_supervisor() -> ProcessSupervisor:
+    """Process-wide supervisor, started on first use."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ProcessSupervisor()
+        return _default
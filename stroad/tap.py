@@ -0,0 +1,344 @@
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, List, Optional, Tuple
+
+from .capture import tap_cmd
+from .icy import IcyReader, TitleLog, icy_capable
+from .supervisor import get_supervisor
+
+TS_PACKET = 188
+
+
+class PacketRing:
+    """
+    Fixed-size ring of MPEG-TS packets. The buffer is allocated once (capacity
+    rounded down to whole packets) and the oldest packets are overwritten.
+    Positions are absolute byte offsets since the ring was created; readers
+    get memoryviews into the buffer and write them out without copying.
+    """
+
+    WRITE_SLICE = 256 << 10  # bytes per write; bounds what a lap can spoil
+
+    def __init__(self, capacity: int, packet: int = TS_PACKET):
+        self.packet = packet
+        self.capacity = max(packet * 64, capacity - capacity % packet)
+        self._buf = bytearray(self.capacity)
+        self._view = memoryview(self._buf)
+        self._partial = b""
+        self.end = 0
+        # (monotonic time, end offset) about once a second, for time <-> offset lookups
+        self._marks: Deque[Tuple[float, int]] = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def start(self) -> int:
+        return max(0, self.end - self.capacity)
+
+    def write(self, data: bytes) -> None:
+        if self._partial:
+            data = self._partial + data
+        n = len(data) - len(data) % self.packet
+        self._partial = bytes(data[n:])
+        if not n:
+            return
+        mv = memoryview(data)[:n]
+        with self._cond:
+            skip = max(0, n - self.capacity)
+            end = self.end + skip
+            mv = mv[skip:]
+            pos = end % self.capacity
+            first = min(len(mv), self.capacity - pos)
+            self._view[pos:pos + first] = mv[:first]
+            if first < len(mv):
+                self._view[:len(mv) - first] = mv[first:]
+            self.end = end + len(mv)
+            now = time.monotonic()
+            if not self._marks or now - self._marks[-1][0] >= 1.0:
+                self._marks.append((now, self.end))
+            while len(self._marks) > 1 and self._marks[1][1] <= self.start:
+                self._marks.popleft()
+            self._cond.notify_all()
+
+    def discontinuity(self) -> None:
+        """Drop a half-received packet (the producer restarted)."""
+        self._partial = b""
+
+    def _points(self) -> List[Tuple[float, int]]:
+        return list(self._marks) + [(time.monotonic(), self.end)]
+
+    def offset_at(self, t: float) -> int:
+        """Offset of the data that had arrived by monotonic time t (packet aligned)."""
+        with self._cond:
+            pts = self._points()
+            lo, hi = self.start, self.end
+        off = lo if t <= pts[0][0] else hi
+        for (t0, o0), (t1, o1) in zip(pts, pts[1:]):
+            if t0 <= t <= t1:
+                off = o0 + (o1 - o0) * (t - t0) / (t1 - t0) if t1 > t0 else o1
+                break
+        off = int(min(max(off, lo), hi))
+        return off - off % self.packet
+
+    def time_at(self, offset: int) -> float:
+        """Approximate arrival time of the byte at `offset`."""
+        with self._cond:
+            pts = self._points()
+        if offset <= pts[0][1]:
+            return pts[0][0]
+        for (t0, o0), (t1, o1) in zip(pts, pts[1:]):
+            if o0 <= offset <= o1:
+                return t0 + (t1 - t0) * (offset - o0) / (o1 - o0) if o1 > o0 else t1
+        return pts[-1][0]
+
+    def seconds_buffered(self) -> float:
+        return max(0.0, time.monotonic() - self.time_at(self.start)) if self.end else 0.0
+
+    def write_to(self, fd: int, pos: int, limit: Optional[int] = None, timeout: float = 0.5) -> Tuple[int, int]:
+        """
+        Write ring data from `pos` (up to `limit`) to a file descriptor, waiting
+        up to `timeout` for new data. Returns (new_pos, lost_bytes); bytes are
+        lost when the reader fell a whole ring behind the writer. A slice the
+        writer lapped while it was being written is truncated back out of the file.
+        """
+        def write(v):
+            while len(v):
+                v = v[os.write(fd, v):]
+
+        def undo(n):
+            os.ftruncate(fd, os.lseek(fd, -n, os.SEEK_CUR))
+        return self.copy_out(pos, write, limit, timeout, undo=undo)
+
+    def copy_out(self, pos: int, write: Callable[[memoryview], None], limit: Optional[int] = None, timeout: float = 0.5,
+                 undo: Optional[Callable[[int], None]] = None) -> Tuple[int, int]:
+        """
+        Like write_to() for any sink that takes the whole memoryview (e.g.
+        socket.sendall). Data goes out in slices of at most WRITE_SLICE bytes,
+        straight from the buffer; after each write the lock is taken again to
+        see whether the writer lapped that range meanwhile. If it did, `undo(n)`
+        takes the slice back (files) and it is written again from the first
+        intact byte; without `undo` (sockets) the lapped bytes are only counted.
+        """
+        with self._cond:
+            if pos >= self.end and timeout:
+                self._cond.wait(timeout)
+            lost = max(0, self.start - pos)
+            pos += lost
+            stop = self.end if limit is None else max(pos, min(limit, self.end))
+        while pos < stop:
+            with self._cond:
+                if self.start > pos:
+                    skip = min(self.start, stop) - pos
+                    lost += skip
+                    pos += skip
+                    if pos >= stop:
+                        break
+                pa = pos % self.capacity
+                n = min(stop - pos, self.WRITE_SLICE, self.capacity - pa)
+            write(self._view[pa:pa + n])
+            with self._cond:
+                lapped = max(0, min(self.start, pos + n) - pos)
+            if lapped and undo is not None:
+                undo(n)
+                lost += lapped
+                pos += lapped
+                continue
+            lost += lapped
+            pos += n
+        return stop, lost
+
+class StreamTap:
+    """
+    One upstream connection copied into a PacketRing as MPEG-TS. Recorders
+    read from the ring at their own pace, so starting a recording neither
+    opens another connection nor loses what already went by: up to `seconds`
+    of history (bounded by the ring's fixed memory) can go into the first chunk.
+
+    With `icy` set, plain HTTP streams are fetched by an IcyReader that asks
+    for in-band metadata and feeds ffmpeg through a pipe: StreamTitle changes
+    land in `titles` on the same clock as the ring, still on one connection.
+    `on_stop` runs once when the tap is stopped (e.g. to give back a host slot).
+    """
+
+    def __init__(self, ffmpeg: str, url: str, seconds: float = 600, max_bytes: int = 64 << 20, log: Optional[Callable[[str], None]] = None, stall_sec: float = 20, icy: bool = False,
+                 on_stop: Optional[Callable[[], None]] = None):
+        self.ffmpeg = ffmpeg
+        self.url = (url or "").strip()
+        self.seconds = float(seconds)
+        self.stall_sec = float(stall_sec)
+        self.ring = PacketRing(max_bytes)
+        self.log = log or (lambda msg: None)
+        self.sup = get_supervisor()
+        self.child = None
+        self.connects = 0
+        self.icy = bool(icy) and icy_capable(self.url)
+        self.titles = TitleLog()
+        self._reader = None
+        self._stopping = False
+        self._retry = 0
+        self._lock = threading.Lock()
+        self._on_stop = on_stop
+
+    @property
+    def running(self) -> bool:
+        return not self._stopping and self.child is not None
+
+    def start(self) -> None:
+        self._stopping = False
+        self._spawn()
+        threading.Thread(target=self._watch, name="tap-watch", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopping = True
+        with self._lock:
+            child, self.child = self.child, None
+            reader, self._reader = self._reader, None
+            on_stop, self._on_stop = self._on_stop, None
+        if reader: reader.stop()
+        if child: child.terminate()
+        if on_stop: on_stop()
+
+    def _spawn(self) -> None:
+        with self._lock:
+            if self._stopping: return
+            self.connects += 1
+            self._end_at_connect = self.ring.end
+            self.ring.discontinuity()
+            if self.icy:
+                self._spawn_icy()
+                return
+            self.child = self.sup.spawn(tap_cmd(self.ffmpeg, self.url), on_stdout_data=self.ring.write)
+            self.child.future.add_done_callback(self._on_exit)
+
+    def _spawn_icy(self) -> None:
+        # ffmpeg reads the pipe; the pump thread owns the write end. Either side
+        # ending takes the other down and the usual reconnect follows.
+        r, w = os.pipe()
+        reader = self._reader = IcyReader(self.url, self.titles, timeout=self.stall_sec or 20)
+        child = self.child = self.sup.spawn(tap_cmd(self.ffmpeg, "pipe:0"), stdin=r, on_stdout_data=self.ring.write)
+
+        def done(fut):
+            os.close(r)
+            reader.stop()
+        child.future.add_done_callback(done)
+        child.future.add_done_callback(self._on_exit)
+        threading.Thread(target=self._pump, args=(reader, w, child), name="tap-icy", daemon=True).start()
+
+    def _pump(self, reader: IcyReader, w: int, child) -> None:
+        def write(data):
+            if not reader.bytes_in - len(data) and self.connects == 1:
+                self.log(f"TAP: in-band metadata every {reader.metaint} bytes." if reader.metaint else "TAP: stream sends no in-band metadata.")
+            v = memoryview(data)
+            while len(v):
+                v = v[os.write(w, v):]
+        try:
+            reader.pump(write)
+        except OSError as e:
+            if not self._stopping and child.running:
+                if reader.answered and not reader.bytes_in:
+                    # Playlist, HTML or a server that won't talk to us: let ffmpeg open it.
+                    self.icy = False
+                    self.log(f"TAP: ICY ingest failed ({e}), connecting through ffmpeg.")
+                else:
+                    self.log(f"TAP: ICY connection ended ({e}).")
+        finally:
+            os.close(w)
+
+    def _on_exit(self, fut) -> None:
+        if self._stopping: return
+        res = fut.result()
+        # Back off only while connections deliver nothing.
+        self._retry = 0 if self.ring.end > self._end_at_connect else min(self._retry + 1, 4)
+        wait = [1, 1, 2, 4, 8][self._retry]
+        self.log(f"TAP: upstream ended (exit {res.returncode}), reconnecting in {wait}s...")
+        t = threading.Timer(wait, self._spawn)
+        t.daemon = True
+        t.start()
+
+    def _watch(self) -> None:
+        # Readers never wait on the upstream, so the tap does its own stall check.
+        last, since = self.ring.end, time.monotonic()
+        while not self._stopping:
+            time.sleep(1.0)
+            if self.ring.end != last:
+                last, since = self.ring.end, time.monotonic()
+                continue
+            child = self.child
+            if self.stall_sec > 0 and time.monotonic() - since > self.stall_sec and child and child.running:
+                self.log(f"TAP: no data for {self.stall_sec:.0f}s, reconnecting.")
+                child.terminate()
+                since = time.monotonic()
+
+    def buffered_seconds(self) -> float:
+        return min(self.seconds, self.ring.seconds_buffered())
+
+    def record_start(self) -> int:
+        """Ring offset to start recording from: `seconds` back, or as far as the ring reaches."""
+        return self.ring.offset_at(time.monotonic() - self.seconds)
+
+
+class TapServer:
+    """
+    Re-streams a StreamTap as MPEG-TS over HTTP on localhost, so players
+    (ffplay) and recorders listen without another upstream connection. Every
+    client reads the ring on its own thread; a player jumps back to the live
+    edge when it falls more than `max_lag` seconds behind, a recorder
+    (`record_url`) never skips. The tap never waits for either.
+    """
+
+    def __init__(self, tap: StreamTap, host: str = "127.0.0.1", port: int = 0, max_lag: float = 5.0):
+        self.tap = tap
+        self.max_lag = float(max_lag)
+        self.clients = 0
+        self._stopping = False
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _TapHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.tap_server = self
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def record_url(self) -> str:
+        return self.url + "record"
+
+    def start(self) -> None:
+        threading.Thread(target=self.httpd.serve_forever, name="tap-http", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopping = True
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def serve(self, send: Callable[[memoryview], None], skip: bool = True) -> None:
+        ring = self.tap.ring
+        pos = ring.offset_at(time.monotonic() - 1.0)
+        with self._lock: self.clients += 1
+        try:
+            while not self._stopping:
+                now = time.monotonic()
+                if skip and pos < ring.offset_at(now - self.max_lag):
+                    pos = ring.offset_at(now - 1.0)  # slow client: skip, don't hold anyone up
+                pos, _ = ring.copy_out(pos, send)
+        except OSError:
+            pass  # client went away
+        finally:
+            with self._lock: self.clients -= 1
+
+
+class _TapHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp2t")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.connection.settimeout(10)
+        self.server.tap_server.serve(self.wfile.write, skip=not self.path.startswith("/record"))
+
+    def log_message(self, fmt, *args):
+        pass
@@ -0,0 +1,88 @@
+"""
+UI update layer for the Tk app. Worker threads only hand over log lines
+and "latest value" updates; the Tk loop drains both once per frame, so a
+burst of lines is one Text insert and a progress bar updated ten times
+between frames is drawn once. RotatingLog keeps the full history on disk
+while the widget only holds the last few thousand lines.
+"""
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class UiBatcher:
+    """Thread-safe hand-off: log lines in order, updates coalesced per key (last one wins)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lines: List[str] = []
+        self._updates: Dict[str, Callable[[], None]] = {}
+        self.dropped = 0  # updates replaced before they were drawn
+
+    def log(self, line: str) -> None:
+        with self._lock:
+            self._lines.append(line)
+
+    def post(self, key: str, fn: Callable[[], None]) -> None:
+        with self._lock:
+            if self._updates.pop(key, None) is not None:
+                self.dropped += 1
+            self._updates[key] = fn  # re-inserted: runs in the order of the latest posts
+
+    def drain(self) -> Tuple[List[str], List[Callable[[], None]]]:
+        with self._lock:
+            lines, self._lines = self._lines, []
+            updates, self._updates = list(self._updates.values()), {}
+        return lines, updates
+
+
+class RotatingLog:
+    """
+    Appends lines to `<dir>/stroad.log`; past `max_bytes` the file becomes
+    stroad.log.1 (older ones shift up to `backups`, the oldest is removed).
+    """
+
+    def __init__(self, folder: str, max_bytes: int = 10 << 20, backups: int = 5, name: str = "stroad.log"):
+        self.path = os.path.join(folder, name)
+        self.max_bytes = max(1 << 16, int(max_bytes))
+        self.backups = max(0, int(backups))
+        os.makedirs(folder, exist_ok=True)
+        self._f = open(self.path, "a", encoding="utf-8")
+        self._size = self._f.tell()
+
+    def write(self, lines: List[str]) -> None:
+        if not lines:
+            return
+        data = "".join(line + "\n" for line in lines)
+        if self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._f.write(data)
+        self._f.flush()
+        self._size += len(data.encode("utf-8"))
+
+    def _rotate(self) -> None:
+        self._f.close()
+        if self.backups:
+            for n in range(self.backups - 1, 0, -1):
+                src = f"{self.path}.{n}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{n + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._f = open(self.path, "a", encoding="utf-8")
+        self._size = 0
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def open_log(folder: Optional[str], max_mb: int = 10, backups: int = 5) -> Optional[RotatingLog]:
+    """RotatingLog in `folder`, or None when logging to disk is off (empty / "off") or the folder isn't writable."""
+    folder = (folder or "").strip()
+    if not folder or folder.lower() == "off":
+        return None
+    try:
+        return RotatingLog(os.path.expanduser(folder), max_bytes=max_mb << 20, backups=backups)
+    except OSError:
+        return None
@@ -1,5 +1,7 @@
+import os
 import re
 import time
+import shutil
 import datetime
 
 def parse_time_string(time_str: str) -> int:
@@ -60,4 +62,32 @@ def fmt_title_range(start_dt: datetime.datetime, dur_seconds: int) -> str:
 
 def log_line(msg: str) -> str:
     ts = time.strftime("%H:%M:%S")
-    return f"[{ts}] {msg}"
\ No newline at end of file
+    return f"[{ts}] {msg}"
+
+def find_bin(name: str) -> str:
+    return shutil.which(name) or ""
+
+def pid_alive(pid: int) -> bool:
+    """True if a process with this id exists on this machine."""
+    if not pid or pid <= 0:
+        return False
+    if os.name == "nt":
+        # os.kill() would terminate the process on Windows; ask the kernel instead.
+        import ctypes
+        k32 = ctypes.windll.kernel32
+        h = k32.OpenProcess(0x1000, False, int(pid))  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not h:
+            return False
+        code = ctypes.c_ulong()
+        ok = k32.GetExitCodeProcess(h, ctypes.byref(code))
+        k32.CloseHandle(h)
+        return bool(ok) and code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,124 @@
+"""
+Waveform viewer: draws a chunk from its .peaks file (peaks.py) on a Tk
+canvas, so scrubbing an hour of audio never decodes it. Wheel zooms around
+the pointer, dragging pans, a click reports the time under the pointer.
+"""
+import os
+import tkinter as tk
+from typing import Callable, List, Optional, Tuple
+
+from .manifest import read_manifest
+from .peaks import Peaks
+from .utils import fmt_mmss
+
+_TICKS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600)
+
+
+def recent_chunks(folder: str, sessions: int = 30) -> List[dict]:
+    """Chunks with a peaks file from the newest `sessions` manifests in `folder`, newest first."""
+    try:
+        names = [e for e in os.scandir(folder) if e.name.endswith(".session.json")]
+    except OSError:
+        return []
+    names.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    out = []
+    for e in names[:sessions]:
+        try:
+            data = read_manifest(e.path)
+        except (OSError, ValueError):
+            continue
+        station = (data.get("station") or {}).get("preset_name") or ""
+        for c in reversed(data.get("chunks", [])):
+            if c.get("peaks_file"):
+                out.append(dict(c, station=station, audio=os.path.join(folder, c["output_file"]), peaks=os.path.join(folder, c["peaks_file"])))
+    return out
+
+
+class WaveformView(tk.Canvas):
+    def __init__(self, parent, palette: dict, on_seek: Optional[Callable[[float], None]] = None, **kw):
+        super().__init__(parent, bg=palette["field"], highlightthickness=0, **kw)
+        self.palette = palette
+        self.on_seek = on_seek
+        self.peaks: Optional[Peaks] = None
+        self.cues: List[dict] = []
+        self.silence: List[Tuple[float, float]] = []
+        self.t0, self.span = 0.0, 1.0
+        self.cursor: Optional[float] = None
+        self._drag = None
+        self.bind("<Configure>", lambda e: self.redraw())
+        self.bind("<MouseWheel>", lambda e: self._zoom(e.x, 0.8 if e.delta > 0 else 1.25))
+        self.bind("<Button-4>", lambda e: self._zoom(e.x, 0.8))
+        self.bind("<Button-5>", lambda e: self._zoom(e.x, 1.25))
+        self.bind("<ButtonPress-1>", self._press)
+        self.bind("<B1-Motion>", self._motion)
+        self.bind("<ButtonRelease-1>", self._release)
+
+    def load(self, peaks: Optional[Peaks], cues: Optional[List[dict]] = None, silence: Optional[List[Tuple[float, float]]] = None) -> None:
+        self.peaks, self.cues, self.silence = peaks, cues or [], silence or []
+        self.t0, self.span = 0.0, max(1.0, peaks.duration if peaks else 1.0)
+        self.cursor = None
+        self.redraw()
+
+    def time_at(self, x: float) -> float:
+        return self.t0 + self.span * x / max(1, self.winfo_width())
+
+    def _x(self, t: float) -> float:
+        return (t - self.t0) / self.span * self.winfo_width()
+
+    def _zoom(self, x: int, factor: float) -> None:
+        if not self.peaks: return
+        dur = max(1.0, self.peaks.duration)
+        t = self.time_at(x)
+        self.span = min(dur, max(2.0, self.span * factor))
+        self.t0 = min(max(0.0, t - self.span * x / max(1, self.winfo_width())), dur - self.span)
+        self.redraw()
+
+    def _press(self, e) -> None:
+        self._drag = (e.x, self.t0, False)
+
+    def _motion(self, e) -> None:
+        if not self._drag or not self.peaks: return
+        x0, t0, _ = self._drag
+        if abs(e.x - x0) < 3 and not self._drag[2]: return
+        self._drag = (x0, t0, True)
+        self.t0 = min(max(0.0, t0 - (e.x - x0) * self.span / max(1, self.winfo_width())), max(0.0, self.peaks.duration - self.span))
+        self.redraw()
+
+    def _release(self, e) -> None:
+        dragged = self._drag and self._drag[2]
+        self._drag = None
+        if dragged or not self.peaks: return
+        self.cursor = self.time_at(e.x)
+        self.redraw()
+        if self.on_seek: self.on_seek(self.cursor)
+
+    def redraw(self) -> None:
+        self.delete("all")
+        w, h = self.winfo_width(), self.winfo_height()
+        if w < 2 or h < 2: return
+        if not self.peaks:
+            self.create_text(w // 2, h // 2, text="No waveform", fill=self.palette["text"])
+            return
+        mid, amp = (h - 16) / 2, (h - 20) / 2 / 128.0
+        for a, b in self.silence:
+            if b > self.t0 and a < self.t0 + self.span:
+                self.create_rectangle(self._x(a), 0, self._x(b), h - 16, fill=self.palette["border"], outline="")
+        for x, (lo, hi) in enumerate(self.peaks.columns(self.t0, self.t0 + self.span, w)):
+            self.create_line(x, mid - hi * amp, x, mid - lo * amp + 1, fill=self.palette["accent"])
+        self.create_line(0, mid, w, mid, fill=self.palette["border"])
+        # Time axis: about one label per 100 px.
+        step = next((s for s in _TICKS if self.span / s <= w / 100), _TICKS[-1])
+        t = (int(self.t0) // step + 1) * step
+        while t < self.t0 + self.span:
+            x = self._x(t)
+            self.create_line(x, h - 16, x, h - 12, fill=self.palette["text"])
+            self.create_text(x, h - 6, text=fmt_mmss(t), fill=self.palette["text"], font=("TkDefaultFont", 8))
+            t += step
+        for c in self.cues:
+            if self.t0 <= c["offset"] < self.t0 + self.span:
+                x = self._x(c["offset"])
+                self.create_line(x, 0, x, h - 16, fill=self.palette["text"], dash=(2, 2))
+                self.create_text(x + 3, 3, text=c["title"], anchor="nw", fill=self.palette["text"], font=("TkDefaultFont", 8))
+        if self.cursor is not None:
+            x = self._x(self.cursor)
+            self.create_line(x, 0, x, h - 16, fill=self.palette["text"], width=2)